@@ -0,0 +1,171 @@
+"""
+Solve a directory of problems of one domain without the GUI.
+Prints one JSON line per problem as soon as it is solved.
+usage: python batch.py domain.pddl "problems/p*.pddl" [--workers N] [--timeout SECONDS] [--portfolio]
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import glob
+import json
+import signal
+import sys
+import time
+import traceback
+
+from antlr4 import CommonTokenStream, FileStream, ParseTreeWalker
+import pddlpy
+from pddlpy.pddl import DomainListener, ProblemListener
+from pddlpy.pddlLexer import pddlLexer
+from pddlpy.pddlParser import pddlParser
+
+import engine
+from export import is_noop
+from portfolio import DEFAULT_PORTFOLIO
+
+# set once per worker process by _init_worker
+_worker = {}
+
+
+class SolveTimeout(Exception):
+    pass
+
+
+def _walk(listener, file_path, rule):
+    stream = CommonTokenStream(pddlLexer(FileStream(file_path, encoding="utf-8")))
+    tree = getattr(pddlParser(stream), rule)()
+    ParseTreeWalker().walk(listener, tree)
+    return listener
+
+
+def parse_domain(domain_file_path):
+    """
+    :param domain_file_path: path to the domain pddl file
+    :return: the pddlpy DomainListener of the domain, it can be shared by many problems
+    """
+    return _walk(DomainListener(), domain_file_path, "domain")
+
+
+def parse_problem(domain, problem_file_path):
+    """
+    :param domain: output of parse_domain
+    :param problem_file_path: path to the problem pddl file
+    :return: pddlpy DomainProblem, without parsing the domain file again
+    """
+    domprob = pddlpy.DomainProblem.__new__(pddlpy.DomainProblem)
+    domprob.domain = domain
+    domprob.problem = _walk(ProblemListener(), problem_file_path, "problem")
+    binder = getattr(pddlpy.pddl, "StaticPrunedBinder", None)
+    if binder is not None:
+        domprob.binder = binder()
+    return domprob
+
+
+def _init_worker(domain, engine_name, extractor, timeout, stats, portfolio):
+    _worker.update(domain=domain, engine=engine_name, extractor=extractor, timeout=timeout, stats=stats,
+                   portfolio=portfolio)
+
+
+def _on_alarm(signum, frame):
+    raise SolveTimeout()
+
+
+def solve_problem(problem_file_path):
+    """
+    solve one problem in a worker process
+    :param problem_file_path: path to the problem pddl file
+    :return: json serializable dictionary of the result
+    """
+    result = {"problem": problem_file_path, "status": None, "plan_length": None,
+              "levels": None, "timings": {}, "stats": None, "winner": None}
+    timings = result["timings"]
+    timeout = _worker["timeout"]
+    if timeout and hasattr(signal, "SIGALRM"):
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    gp = engine.GraphPlanVis()
+    try:
+        start = time.perf_counter()
+        domprob = parse_problem(_worker["domain"], problem_file_path)
+        timings["parse"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        gp.create_problem_from_domprob(domprob, engine=_worker["engine"])
+        if _worker["stats"]:
+            gp.enable_instrumentation()
+        timings["compile"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        solve_result = gp.solve(extractor=_worker["extractor"],
+                                portfolio=DEFAULT_PORTFOLIO if _worker["portfolio"] else None)
+        timings["solve"] = time.perf_counter() - start
+
+        result["status"] = solve_result.status
+        result["winner"] = solve_result.winner
+        if solve_result.solved:
+            result["plan_length"] = sum(1 for level in solve_result.solution[0] for action in level
+                                        if not is_noop(action))
+    except SolveTimeout:
+        result["status"] = "timeout"
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = "".join(traceback.format_exception_only(type(e), e)).strip()
+    finally:
+        if timeout and hasattr(signal, "SIGALRM"):
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    if gp.graphplan is not None:
+        result["levels"] = len(gp.graphplan.graph.levels)
+    result["stats"] = gp.stats_report()
+    return result
+
+
+def run_batch(domain_file_path, problem_file_paths, workers=None, timeout=None,
+              engine_name="bitset", extractor="csp", stats=False, portfolio=False):
+    """
+    solve the problems in a process pool, the domain is parsed once and shared with the workers
+    :param workers: number of worker processes, None for the number of cpus
+    :param timeout: seconds allowed per problem, None for no limit
+    :param stats: add the per level statistics of instrumentation.Instrumentation to the results
+    :param portfolio: race portfolio.DEFAULT_PORTFOLIO instead of the extractor, the results
+                      tell which configuration won
+    :return: generator of result dictionaries, in order of completion
+    """
+    domain = parse_domain(domain_file_path)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(domain, engine_name, extractor, timeout, stats, portfolio)) as pool:
+        futures = {pool.submit(solve_problem, path): path for path in problem_file_paths}
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as e:
+                # the worker process itself died
+                yield {"problem": futures[future], "status": "error", "error": repr(e),
+                       "plan_length": None, "levels": None, "timings": {}, "stats": None, "winner": None}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("domain")
+    arg_parser.add_argument("problems", help="glob of problem files, quote it to avoid shell expansion")
+    arg_parser.add_argument("--workers", type=int, default=None)
+    arg_parser.add_argument("--timeout", type=float, default=None, help="seconds per problem")
+    arg_parser.add_argument("--engine", default="bitset", choices=list(engine.GRAPH_ENGINES))
+    arg_parser.add_argument("--extractor", default="csp", choices=list(engine.EXTRACTORS))
+    arg_parser.add_argument("--stats", action="store_true", help="include per level statistics")
+    arg_parser.add_argument("--portfolio", action="store_true",
+                            help="race the extraction configurations of portfolio.DEFAULT_PORTFOLIO")
+    args = arg_parser.parse_args()
+
+    problem_file_paths = sorted(glob.glob(args.problems))
+    if not problem_file_paths:
+        arg_parser.error(f"no problem files match {args.problems}")
+
+    for result in run_batch(args.domain, problem_file_paths, args.workers, args.timeout,
+                            args.engine, args.extractor, args.stats, args.portfolio):
+        sys.stdout.write(json.dumps(result) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,476 @@
+"""
+Benchmarks of the planning graph engines.
+usage: python benchmark.py [--levels N] [--solve] [--grounding] [--cache] [--extractors ...] domain.pddl problem.pddl [problem.pddl ...]
+       python benchmark.py --parse [--sizes N ...] domain.pddl
+       python benchmark.py --noops [--levels N] domain.pddl problem.pddl [problem.pddl ...]
+       python benchmark.py --memory [--levels N] [--engines ...] domain.pddl problem.pddl [problem.pddl ...]
+       python benchmark.py --mutex [--levels N] [--sizes N ...] domain.pddl
+       python benchmark.py --parallel [--levels N] [--sizes N ...] [--workers N ...] domain.pddl
+       python benchmark.py --relevance [--engines ...] [--extractors ...] domain.pddl problem.pddl [problem.pddl ...]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from aima3.planning import Action, expr
+import pddlpy
+
+import bitgraph
+import engine
+from benchmark_suite import generate_problem
+from cache import ProblemCache
+from compactlevel import level_bytes
+from grounding import ground_problem
+from nogoods import NogoodTable
+import parser
+from relevance import relevant_nodes
+
+
+def benchmark_expansion(domain_file_path, problem_file_path, engine_name, levels):
+    """
+    expand a planning graph and measure the time and peak memory of the expansion
+    :param domain_file_path: path to the domain pddl file
+    :param problem_file_path: path to the problem pddl file
+    :param engine_name: key of engine.GRAPH_ENGINES
+    :param levels: number of levels to expand, stops earlier if the graph levels off
+    :return: dictionary of the measurements
+    """
+    gp = engine.GraphPlanVis()
+    gp.create_problem(domain_file_path, problem_file_path, engine=engine_name)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(levels):
+        gp.expand_level()
+        if gp.graphplan.check_leveloff():
+            break
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    graph = gp.graphplan.graph
+    return {"problem": problem_file_path,
+            "engine": engine_name,
+            "levels": len(graph.levels),
+            "mutexes": sum(len(level.mutex) for level in graph.levels),
+            "seconds": elapsed,
+            "peak_kib": peak / 1024}
+
+
+def benchmark_solve(domain_file_path, problem_file_path, engine_name, subsumption, extractor="product"):
+    """
+    solve a problem and report the node count and nogood memo statistics of the extraction
+    :param subsumption: whether the nogood table prunes supersets of failing goal sets
+    :param extractor: one of engine.EXTRACTORS
+    :return: dictionary of the measurements
+    """
+    gp = engine.GraphPlanVis()
+    gp.create_problem(domain_file_path, problem_file_path, engine=engine_name)
+    gp.graphplan.nogoods = NogoodTable(subsumption=subsumption)
+
+    start = time.perf_counter()
+    solve_result = gp.solve(extractor=extractor)
+    elapsed = time.perf_counter() - start
+
+    result = {"problem": problem_file_path,
+              "extractor": extractor,
+              "memo": "subsumption" if subsumption else "exact",
+              "solved": solve_result.solved,
+              "extract_calls": gp.graphplan.extract_calls,
+              "extract_nodes": gp.graphplan.extract_nodes,
+              "seconds": elapsed}
+    result.update(gp.graphplan.nogoods.stats())
+    return result
+
+
+def print_expansion(args):
+    print(f"{'problem':<40}{'engine':<10}{'levels':>8}{'mutexes':>10}{'seconds':>10}{'peak KiB':>12}")
+    for problem in args.problems:
+        for engine_name in args.engines:
+            result = benchmark_expansion(args.domain, problem, engine_name, args.levels)
+            print(f"{result['problem']:<40}{result['engine']:<10}{result['levels']:>8}"
+                  f"{result['mutexes']:>10}{result['seconds']:>10.3f}{result['peak_kib']:>12.1f}")
+
+
+def print_solve(args):
+    print(f"{'problem':<40}{'extractor':<10}{'memo':<13}{'solved':>7}{'calls':>8}{'nodes':>9}"
+          f"{'lookups':>9}{'exact':>7}{'subsumed':>10}{'hit rate':>10}{'seconds':>10}")
+    for problem in args.problems:
+        for extractor in args.extractors:
+            for subsumption in (False, True):
+                result = benchmark_solve(args.domain, problem, args.engines[-1], subsumption, extractor)
+                print(f"{result['problem']:<40}{result['extractor']:<10}{result['memo']:<13}"
+                      f"{str(result['solved']):>7}{result['extract_calls']:>8}{result['extract_nodes']:>9}"
+                      f"{result['lookups']:>9}{result['exact_hits']:>7}{result['subsumed_hits']:>10}"
+                      f"{result['hit_rate']:>10.2%}{result['seconds']:>10.3f}")
+
+
+def benchmark_relevance(domain_file_path, problem_file_path, engine_name, extractors):
+    """
+    solve a problem, then extract again from the same graph with and without slicing it to
+    the goal relevant nodes, the graph of another solve could order its actions differently
+    :return: dictionary of the measurements, the extraction times are by extractor
+    """
+    gp = engine.GraphPlanVis()
+    gp.create_problem(domain_file_path, problem_file_path, engine=engine_name)
+    gp.solve(extractor="csp")
+    graph = gp.graphplan.graph
+    goals_pos, goals_neg = gp._goals()
+    relevant = relevant_nodes(graph, goals_pos, goals_neg)
+
+    result = {"problem": problem_file_path,
+              "engine": engine_name,
+              "levels": len(graph.levels),
+              "nodes": sum(len(level.current_state_pos) + len(level.current_state_neg) +
+                           len(level.current_action_links_pos) for level in graph.levels),
+              "relevant": sum(len(facts_pos) + len(facts_neg) + len(actions)
+                              for facts_pos, facts_neg, actions in relevant),
+              "seconds": {}}
+    for extractor in extractors:
+        for slice_relevant in (False, True):
+            gp.graphplan.nogoods = NogoodTable()
+            gp.graphplan.solution = []
+            gp.graphplan.slice_relevant = slice_relevant
+            start = time.perf_counter()
+            gp.graphplan.extract(goals_pos, goals_neg, -1, extractor)
+            result["seconds"][extractor, slice_relevant] = time.perf_counter() - start
+    return result
+
+
+def print_relevance(args):
+    print(f"{'problem':<40}{'engine':<10}{'levels':>7}{'nodes':>7}{'relevant':>9}"
+          + "".join(f"{extractor + ' s':>12}{'sliced s':>10}" for extractor in args.extractors))
+    for problem in args.problems:
+        for engine_name in args.engines:
+            result = benchmark_relevance(args.domain, problem, engine_name, args.extractors)
+            print(f"{result['problem']:<40}{result['engine']:<10}{result['levels']:>7}{result['nodes']:>7}"
+                  f"{result['relevant']:>9}"
+                  + "".join(f"{result['seconds'][extractor, False]:>12.3f}"
+                            f"{result['seconds'][extractor, True]:>10.3f}" for extractor in args.extractors))
+
+
+def print_grounding(args):
+    print(f"{'problem':<40}{'actions':>9}{'reachable':>11}{'facts':>7}{'reachable':>11}{'seconds':>10}")
+    for problem in args.problems:
+        stats = ground_problem(pddlpy.DomainProblem(args.domain, problem)).stats
+        print(f"{problem:<40}{stats['ground_actions']:>9}{stats['reachable_actions']:>11}"
+              f"{stats['ground_facts']:>7}{stats['reachable_facts']:>11}{stats['seconds']:>10.3f}")
+
+
+def benchmark_startup(domain_file_path, problem_file_path, engine_name, cache, repeat=5):
+    """
+    :param cache: ProblemCache used by create_problem
+    :param repeat: number of warm starts to average
+    :return: (cold start seconds, mean warm start seconds)
+    """
+    def create():
+        start = time.perf_counter()
+        engine.GraphPlanVis().create_problem(domain_file_path, problem_file_path,
+                                             engine=engine_name, cache=cache)
+        return time.perf_counter() - start
+
+    cold = create()
+    warm = sum(create() for _ in range(repeat)) / repeat
+    return cold, warm
+
+
+def print_startup(args):
+    print(f"{'problem':<40}{'engine':<10}{'cold ms':>10}{'warm ms':>10}{'speedup':>9}")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ProblemCache(cache_dir)
+        for problem in args.problems:
+            for engine_name in args.engines:
+                cold, warm = benchmark_startup(args.domain, problem, engine_name, cache)
+                print(f"{problem:<40}{engine_name:<10}{cold * 1000:>10.2f}{warm * 1000:>10.2f}"
+                      f"{cold / warm:>8.1f}x")
+
+
+def print_noops(args):
+    print(f"{'problem':<40}{'level':>6}{'actions':>9}{'no-ops':>8}{'explicit KiB':>14}{'implicit KiB':>14}{'saved':>8}")
+    for problem in args.problems:
+        graphs = {}
+        for engine_name in ("bitset", "implicit"):
+            gp = engine.GraphPlanVis()
+            gp.create_problem(args.domain, problem, engine=engine_name)
+            for _ in range(args.levels):
+                gp.expand_level()
+                if gp.graphplan.check_leveloff():
+                    break
+            graphs[engine_name] = gp.graphplan.graph
+        # the last level has no action layer yet
+        for level_num, (explicit, implicit) in enumerate(zip(graphs["bitset"].levels[:-1],
+                                                            graphs["implicit"].levels[:-1])):
+            explicit_bytes, implicit_bytes = level_bytes(explicit), level_bytes(implicit)
+            noops = len(explicit.noop_ids())
+            print(f"{problem:<40}{level_num:>6}{explicit.action_count():>9}{noops:>8}"
+                  f"{explicit_bytes / 1024:>14.1f}{implicit_bytes / 1024:>14.1f}"
+                  f"{1 - implicit_bytes / explicit_bytes:>8.1%}")
+
+
+def print_memory(args):
+    print(f"{'problem':<40}{'level':>6}" + "".join(f"{engine_name + ' KiB':>16}" for engine_name in args.engines))
+    for problem in args.problems:
+        reports = []
+        for engine_name in args.engines:
+            gp = engine.GraphPlanVis()
+            gp.create_problem(args.domain, problem, engine=engine_name)
+            for _ in range(args.levels):
+                gp.expand_level()
+                if gp.graphplan.check_leveloff():
+                    break
+            reports.append(gp.memory_report())
+        for level_num, sizes in enumerate(zip(*reports)):
+            print(f"{problem:<40}{level_num:>6}" + "".join(f"{size / 1024:>16.1f}" for size in sizes))
+
+
+def _time_best(function, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark_mutex(domain_file_path, n_blocks, levels):
+    """
+    time the mutex stage of every level of a generated problem three ways: aima3's pairwise
+    loop, the bitset loop of BitLevel and the numpy matrices of matrixmutex
+    :return: list of dictionaries of the measurements, one per level
+    """
+    with tempfile.TemporaryDirectory() as problem_dir:
+        problem_file_path = os.path.join(problem_dir, "problem.pddl")
+        with open(problem_file_path, "w") as f:
+            f.write(generate_problem(n_blocks, 0))
+        graphs = {}
+        for engine_name in ("aima", "bitset"):
+            gp = engine.GraphPlanVis()
+            gp.create_problem(domain_file_path, problem_file_path, engine=engine_name)
+            for _ in range(levels):
+                gp.expand_level()
+            graphs[engine_name] = gp.graphplan.graph
+
+    def aima_find_mutex(level):
+        level.mutex = []
+        level.find_mutex()
+
+    def bitset_find_mutex(level, min_actions):
+        graph.matrix_mutex_min_actions = min_actions
+        level.find_mutex()
+
+    graph = graphs["bitset"]
+    results = []
+    for level_num, (aima_level, level) in enumerate(zip(graphs["aima"].levels[:-1], graph.levels[:-1])):
+        results.append({"blocks": n_blocks,
+                        "level": level_num,
+                        "actions": level.action_count(),
+                        "pairwise": _time_best(lambda: aima_find_mutex(aima_level), repeat=1),
+                        "bitset": _time_best(lambda: bitset_find_mutex(level, None)),
+                        "matrix": _time_best(lambda: bitset_find_mutex(level, 0))})
+    graph.matrix_mutex_min_actions = bitgraph.MATRIX_MUTEX_MIN_ACTIONS
+    return results
+
+
+def print_mutex(args):
+    print(f"{'blocks':>7}{'level':>6}{'actions':>9}{'pairwise ms':>13}{'bitset ms':>11}{'matrix ms':>11}")
+    for n_blocks in args.sizes:
+        for result in benchmark_mutex(args.domain, n_blocks, args.levels):
+            print(f"{result['blocks']:>7}{result['level']:>6}{result['actions']:>9}"
+                  f"{result['pairwise'] * 1000:>13.2f}{result['bitset'] * 1000:>11.2f}"
+                  f"{result['matrix'] * 1000:>11.2f}")
+
+
+def level_data(level):
+    """
+    :return: everything a BitLevel finds when it's expanded, to compare two graphs
+    """
+    return (level.state_pos, level.state_neg, list(level.actions), level.action_mutex, level.fact_mutex,
+            level.noop_mutex_pos, level.noop_mutex_neg)
+
+
+def benchmark_parallel(domain_file_path, n_blocks, levels, workers_list, engine_name="bitset"):
+    """
+    expand a generated problem serially and with parallel.ParallelExpander pools of every size
+    :param workers_list: numbers of worker processes to time
+    :return: list of dictionaries of the measurements, the serial one first with 0 workers
+    """
+    with tempfile.TemporaryDirectory() as problem_dir:
+        problem_file_path = os.path.join(problem_dir, "problem.pddl")
+        with open(problem_file_path, "w") as f:
+            f.write(generate_problem(n_blocks, 0))
+        gp = engine.GraphPlanVis()
+        gp.create_problem(domain_file_path, problem_file_path, engine=engine_name)
+
+    results = []
+    serial = None
+    for workers in [0] + list(workers_list):
+        # every graph is built from the same ground problem, so the ids can be compared
+        gp.graphplan = engine.MyGraphPlan(gp.pddl, gp.negkb, engine=engine_name, ground=gp.ground)
+        if workers:
+            # split every level, the default threshold would leave the small ones serial
+            gp.enable_parallel(workers, min_actions=0)
+        try:
+            start = time.perf_counter()
+            for _ in range(levels):
+                gp.expand_level()
+            elapsed = time.perf_counter() - start
+        finally:
+            gp.disable_parallel()
+        graph = gp.graphplan.graph
+        data = [level_data(level) for level in graph.levels]
+        if serial is None:
+            serial = data
+        results.append({"blocks": n_blocks,
+                        "workers": workers,
+                        "actions": graph.levels[-2].action_count(),
+                        "seconds": elapsed,
+                        "same": data == serial})
+    return results
+
+
+def print_parallel(args):
+    print(f"{'blocks':>7}{'workers':>8}{'actions':>9}{'seconds':>10}{'speedup':>9}{'same':>6}")
+    for n_blocks in args.sizes:
+        results = benchmark_parallel(args.domain, n_blocks, args.levels, args.workers)
+        serial = results[0]["seconds"]
+        for result in results:
+            workers = result["workers"] or "serial"
+            print(f"{result['blocks']:>7}{workers:>8}{result['actions']:>9}{result['seconds']:>10.3f}"
+                  f"{serial / result['seconds']:>8.2f}x{str(result['same']):>6}")
+
+
+def _legacy_parse_pddl2expr(pddl_atom):
+    # the parser before the interned Terms, kept to compare against
+    pddl_list = list(eval(parser.string_handler(pddl_atom)))
+    expresion = str(pddl_list.pop(0))
+    expresion += _legacy_parse_list(pddl_list)
+    return expr(expresion)
+
+
+def _legacy_parse_list(value_list):
+    expresion = "("
+    for word in value_list:
+        expresion += parser.string_handler(word)
+        expresion += ", " if word != value_list[-1] else ""
+    expresion += ")"
+    return expresion
+
+
+def _legacy_parse(domprob):
+    inits = [_legacy_parse_pddl2expr(init) for init in domprob.initialstate()]
+    actions = []
+    for operator in domprob.domain.operators.values():
+        name = expr(parser.string_handler(operator.operator_name) +
+                    _legacy_parse_list(list(operator.variable_list.keys())))
+        actions.append(Action(name,
+                              [[_legacy_parse_pddl2expr(i) for i in operator.precondition_pos],
+                               [_legacy_parse_pddl2expr(i) for i in operator.precondition_neg]],
+                              [[_legacy_parse_pddl2expr(i) for i in operator.effect_pos],
+                               [_legacy_parse_pddl2expr(i) for i in operator.effect_neg]]))
+    goals = [_legacy_parse_pddl2expr(goal) for goal in domprob.goals()]
+    return inits, actions, goals
+
+
+def _parse(domprob):
+    inits = [parser.parse_pddl2expr(init) for init in domprob.initialstate()]
+    goals = [parser.parse_pddl2expr(goal) for goal in domprob.goals()]
+    return inits, parser.parse_pddl2actions(domprob), goals
+
+
+def benchmark_parse(domain_file_path, n_blocks, repeat=3):
+    """
+    time the conversion of a parsed generated problem to aima3 objects, with the
+    current parser and with the eval based one it replaced
+    :param n_blocks: size of the generated blocks-world problem
+    :return: dictionary of the measurements, the best of repeat runs
+    """
+    with tempfile.TemporaryDirectory() as problem_dir:
+        problem_file_path = os.path.join(problem_dir, "problem.pddl")
+        with open(problem_file_path, "w") as f:
+            f.write(generate_problem(n_blocks, 0))
+        domprob = pddlpy.DomainProblem(domain_file_path, problem_file_path)
+
+    result = {"blocks": n_blocks, "atoms": len(list(domprob.initialstate()))}
+    for name, parse in (("legacy", _legacy_parse), ("interned", _parse)):
+        best = float("inf")
+        for _ in range(repeat):
+            parser.clear_terms()
+            start = time.perf_counter()
+            inits, _, goals = parse(domprob)
+            best = min(best, time.perf_counter() - start)
+        result[name] = best
+        result[f"{name}_atoms"] = sorted(map(str, inits + goals))
+    result["same"] = result.pop("legacy_atoms") == result.pop("interned_atoms")
+    return result
+
+
+def print_parse(args):
+    print(f"{'blocks':>7}{'atoms':>8}{'legacy ms':>11}{'interned ms':>13}{'speedup':>9}{'same':>6}")
+    for n_blocks in args.sizes:
+        result = benchmark_parse(args.domain, n_blocks)
+        print(f"{n_blocks:>7}{result['atoms']:>8}{result['legacy'] * 1000:>11.2f}"
+              f"{result['interned'] * 1000:>13.2f}{result['legacy'] / result['interned']:>8.1f}x"
+              f"{str(result['same']):>6}")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("domain")
+    arg_parser.add_argument("problems", nargs="*")
+    arg_parser.add_argument("--levels", type=int, default=10)
+    arg_parser.add_argument("--engines", nargs="+", default=list(engine.GRAPH_ENGINES))
+    arg_parser.add_argument("--solve", action="store_true",
+                            help="solve the problems and report the nogood memo hit rates")
+    arg_parser.add_argument("--extractors", nargs="+", default=list(engine.EXTRACTORS))
+    arg_parser.add_argument("--grounding", action="store_true",
+                            help="report the ground action counts before and after reachability pruning")
+    arg_parser.add_argument("--cache", action="store_true",
+                            help="report cold and warm create_problem times with the problem cache")
+    arg_parser.add_argument("--noops", action="store_true",
+                            help="report the memory of every level with explicit and implicit no-ops")
+    arg_parser.add_argument("--memory", action="store_true",
+                            help="report the bytes held by every level with every engine")
+    arg_parser.add_argument("--mutex", action="store_true",
+                            help="time the pairwise, bitset and matrix mutex stages on generated problems")
+    arg_parser.add_argument("--parse", action="store_true",
+                            help="compare the parser against the eval based one on generated problems")
+    arg_parser.add_argument("--relevance", action="store_true",
+                            help="time extraction with and without slicing the graph to the goal relevant nodes")
+    arg_parser.add_argument("--parallel", action="store_true",
+                            help="time the expansion of generated problems with pools of every --workers size")
+    arg_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[50, 200, 1000],
+                            help="blocks of the problems generated for --parse, --mutex and --parallel")
+    args = arg_parser.parse_args()
+
+    if args.parse:
+        print_parse(args)
+        return
+    if args.mutex:
+        print_mutex(args)
+        return
+    if args.parallel:
+        print_parallel(args)
+        return
+    if not args.problems:
+        arg_parser.error("at least one problem file is required")
+    if args.noops:
+        print_noops(args)
+    elif args.memory:
+        print_memory(args)
+    elif args.relevance:
+        print_relevance(args)
+    elif args.cache:
+        print_startup(args)
+    elif args.grounding:
+        print_grounding(args)
+    elif args.solve:
+        print_solve(args)
+    else:
+        print_expansion(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Benchmark suite on generated blocks-world problems of increasing size.
+Times every phase of the pipeline separately, writes the results as JSON and
+compares them against a stored baseline.
+usage: python benchmark_suite.py [--sizes 3 4 5] [--seeds 0 1] [--output results.json]
+                                 [--baseline baseline.json] [--threshold 1.25]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import pddlpy
+
+import engine
+from export import is_noop
+
+DOMAIN_FILE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                "examples", "block-world", "domain.pddl")
+SCALAR_PHASES = ("parse", "grounding", "solve", "expansion", "extraction", "visualize")
+
+
+def random_towers(blocks, rng):
+    """
+    :return: list of towers, each a list of blocks from the bottom up
+    """
+    blocks = list(blocks)
+    rng.shuffle(blocks)
+    towers = []
+    for block in blocks:
+        if towers and rng.random() < 0.6:
+            rng.choice(towers).append(block)
+        else:
+            towers.append([block])
+    return towers
+
+
+def tower_facts(towers):
+    """
+    :return: set of the ON and ONTABLE facts of the towers, each a tuple of its predicate and blocks
+    """
+    facts = set()
+    for tower in towers:
+        facts.add(("ONTABLE", tower[0]))
+        facts.update(("ON", upper, lower) for lower, upper in zip(tower, tower[1:]))
+    return facts
+
+
+def goal_facts(towers, blocks):
+    """
+    :return: list of the goal facts of the towers, the ON facts or all blocks on the table
+             if there are none
+    """
+    goal = [("ON", upper, lower) for tower in towers for lower, upper in zip(tower, tower[1:])]
+    return goal or [("ONTABLE", block) for block in blocks]
+
+
+def generate_problem(n_blocks, seed):
+    """
+    generate a blocks-world problem for the domain in examples/block-world
+    :param n_blocks: number of blocks
+    :param seed: seed of the random towers of the initial state and of the goal
+    :return: the problem as a pddl string
+    """
+    rng = random.Random(seed)
+    blocks = [f"B{i}" for i in range(1, n_blocks + 1)]
+    init_towers = random_towers(blocks, rng)
+    init_facts = tower_facts(init_towers)
+    goal = goal_facts(random_towers(blocks, rng), blocks)
+    # a goal that already holds is solved at level 0 and benchmarks nothing
+    while init_facts.issuperset(goal) and n_blocks > 1:
+        goal = goal_facts(random_towers(blocks, rng), blocks)
+
+    init = ["(HANDEMPTY)"]
+    for tower in init_towers:
+        init.append(f"(ONTABLE {tower[0]})")
+        init += [f"(ON {upper} {lower})" for lower, upper in zip(tower, tower[1:])]
+        init.append(f"(CLEAR {tower[-1]})")
+    goal = [f"({' '.join(fact)})" for fact in goal]
+
+    return (f"(define (problem BLOCKS-{n_blocks}-{seed})\n"
+            f"(:domain BLOCKS)\n"
+            f"(:objects {' '.join(blocks)} - block)\n"
+            f"(:init {' '.join(init)})\n"
+            f"(:goal (and {' '.join(goal)}))\n"
+            f")\n")
+
+
+def timed_solve(gp, extractor):
+    """
+    time GraphPlanVis.solve, its expansion is timed per level by the instrumentation
+    :return: (budget.SolveResult, timings dictionary)
+    """
+    instrumentation = gp.enable_instrumentation()
+    start = time.perf_counter()
+    result = gp.solve(extractor=extractor)
+    solve_seconds = time.perf_counter() - start
+    gp.disable_instrumentation()
+
+    # the last level was created by the last expansion and has not been expanded itself
+    expansion_levels = [stats.expansion_seconds for stats in instrumentation.levels[:-1]]
+    timings = {"solve": solve_seconds,
+               "expansion_levels": expansion_levels,
+               "expansion": sum(expansion_levels)}
+    # goal tests, level off checks and extraction
+    timings["extraction"] = solve_seconds - timings["expansion"]
+    return result, timings
+
+
+def benchmark_problem(problem_file_path, engine_name, extractor, visualize=True):
+    """
+    :return: dictionary of the result and the timings of every phase
+    """
+    timings = {}
+    start = time.perf_counter()
+    domprob = pddlpy.DomainProblem(DOMAIN_FILE_PATH, problem_file_path)
+    timings["parse"] = time.perf_counter() - start
+
+    gp = engine.GraphPlanVis()
+    start = time.perf_counter()
+    gp.create_problem_from_domprob(domprob, engine=engine_name)
+    timings["grounding"] = time.perf_counter() - start
+
+    solve_result, solve_timings = timed_solve(gp, extractor)
+    timings.update(solve_timings)
+
+    if visualize:
+        fig, ax = plt.subplots()
+        start = time.perf_counter()
+        gp.visualize(ax)
+        timings["visualize"] = time.perf_counter() - start
+        plt.close(fig)
+
+    plan_length = None
+    if solve_result.solved:
+        plan_length = sum(1 for level in solve_result.solution[0] for action in level
+                          if not is_noop(action))
+    return {"status": solve_result.status,
+            "levels": len(gp.graphplan.graph.levels),
+            "plan_length": plan_length,
+            "timings": timings}
+
+
+def run_suite(sizes, seeds, engine_name="bitset", extractor="csp", visualize=True):
+    """
+    :param sizes: numbers of blocks of the generated problems
+    :param seeds: seeds of the generated problems, one problem per size and seed
+    :return: json serializable report
+    """
+    report = {"meta": {"python": platform.python_version(),
+                       "machine": platform.machine(),
+                       "engine": engine_name,
+                       "extractor": extractor},
+              "results": {}}
+    with tempfile.TemporaryDirectory() as problem_dir:
+        for n_blocks in sizes:
+            for seed in seeds:
+                name = f"blocks-{n_blocks}-{seed}"
+                problem_file_path = os.path.join(problem_dir, f"{name}.pddl")
+                with open(problem_file_path, "w") as f:
+                    f.write(generate_problem(n_blocks, seed))
+                result = benchmark_problem(problem_file_path, engine_name, extractor, visualize)
+                result.update(blocks=n_blocks, seed=seed)
+                report["results"][name] = result
+                yield name, result
+    return report
+
+
+def compare(report, baseline, threshold, min_seconds):
+    """
+    :param threshold: a phase regressed if it takes more than threshold times the baseline
+    :param min_seconds: differences smaller than this are noise and never regressions
+    :return: list of (problem, phase, baseline seconds, current seconds)
+    """
+    regressions = []
+    for name, result in report["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            continue
+        for phase in SCALAR_PHASES:
+            current = result["timings"].get(phase)
+            previous = base["timings"].get(phase)
+            if current is None or previous is None:
+                continue
+            if current > previous * threshold and current - previous > min_seconds:
+                regressions.append((name, phase, previous, current))
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--sizes", type=int, nargs="+", default=[3, 4, 5, 6])
+    arg_parser.add_argument("--seeds", type=int, nargs="+", default=[0, 1, 2])
+    arg_parser.add_argument("--engine", default="bitset", choices=list(engine.GRAPH_ENGINES))
+    arg_parser.add_argument("--extractor", default="csp", choices=list(engine.EXTRACTORS))
+    arg_parser.add_argument("--no-visualize", action="store_true")
+    arg_parser.add_argument("--output", default="benchmark_results.json")
+    arg_parser.add_argument("--baseline", help="results file of a previous run to compare against")
+    arg_parser.add_argument("--threshold", type=float, default=1.25)
+    # timings of a few milliseconds vary by more than the threshold from run to run
+    arg_parser.add_argument("--min-seconds", type=float, default=0.05,
+                            help="slowdowns smaller than this are noise, never regressions")
+    args = arg_parser.parse_args()
+
+    print(f"{'problem':<16}{'status':<13}{'levels':>7}{'plan':>6}"
+          + "".join(f"{phase:>12}" for phase in SCALAR_PHASES))
+    suite = run_suite(args.sizes, args.seeds, args.engine, args.extractor, not args.no_visualize)
+    while True:
+        try:
+            name, result = next(suite)
+        except StopIteration as stop:
+            report = stop.value
+            break
+        timings = result["timings"]
+        print(f"{name:<16}{result['status']:<13}{result['levels']:>7}{str(result['plan_length']):>6}"
+              + "".join(f"{timings.get(phase, float('nan')):>12.4f}" for phase in SCALAR_PHASES))
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold, args.min_seconds)
+        for name, phase, previous, current in regressions:
+            print(f"REGRESSION {name} {phase}: {previous:.4f}s -> {current:.4f}s "
+                  f"({current / previous:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions over {args.threshold}x of {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,614 @@
+from array import array
+import itertools
+
+from aima3.planning import Expr, FolKB
+
+try:
+    import matrixmutex
+except ImportError:
+    matrixmutex = None
+
+
+POS_PERSISTENCE = "pos"
+NEG_PERSISTENCE = "neg"
+
+# action layers at least this big find their mutexes with matrixmutex, when numpy is there
+MATRIX_MUTEX_MIN_ACTIONS = 300
+
+LINK_VIEWS = ("current_action_links_pos", "current_action_links_neg",
+              "current_state_links_pos", "current_state_links_neg",
+              "next_action_links", "next_state_links_pos", "next_state_links_neg")
+
+
+def iter_bits(bitset):
+    """
+    yields the indexes of the set bits of an integer, lowest first
+    :param bitset: a non negative int used as a bitset
+    """
+    while bitset:
+        low_bit = bitset & -bitset
+        yield low_bit.bit_length() - 1
+        bitset ^= low_bit
+
+
+class SymbolTable:
+    """
+    Two way mapping between aima3 Expr objects and dense integer ids.
+    Ids are given in order of first appearance.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.symbols = []
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def intern(self, symbol):
+        symbol_id = self.ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = len(self.symbols)
+            self.ids[symbol] = symbol_id
+            self.symbols.append(symbol)
+        return symbol_id
+
+
+class GroundAction:
+    """
+    A fully instantiated action, its preconditions and effects are tuples of fact ids.
+    """
+    __slots__ = ("expr", "persistence", "pre_pos", "pre_neg", "add", "delete",
+                 "pre_pos_mask", "pre_neg_mask", "add_mask", "delete_mask")
+
+    def __init__(self, expr, pre_pos, pre_neg, add, delete, persistence=None):
+        self.expr = expr
+        self.persistence = persistence
+        self.pre_pos = tuple(pre_pos)
+        self.pre_neg = tuple(pre_neg)
+        self.add = tuple(add)
+        self.delete = tuple(delete)
+        self.pre_pos_mask = _mask(self.pre_pos)
+        self.pre_neg_mask = _mask(self.pre_neg)
+        self.add_mask = _mask(self.add)
+        self.delete_mask = _mask(self.delete)
+
+    @property
+    def effects(self):
+        return self.add + self.delete
+
+    @property
+    def fact(self):
+        """
+        the fact id a persistence action carries over
+        """
+        return (self.pre_pos or self.pre_neg)[0]
+
+
+def _mask(fact_ids):
+    bitset = 0
+    for fact_id in fact_ids:
+        bitset |= 1 << fact_id
+    return bitset
+
+
+def ground_actions(actions, objects, facts):
+    """
+    instantiate the aima3 action schemas the same way aima3's Level.build does,
+    every permutation of the objects is bound to the action arguments.
+    :param actions: list of aima3 Action objects
+    :param objects: the objects of the problem
+    :param facts: SymbolTable used to give ids to the ground facts
+    :return: list of GroundAction
+    """
+    ground = []
+    seen = set()
+    objects = sorted(objects, key=str)
+    for action in actions:
+        for arg in itertools.permutations(objects, len(action.args)):
+            arg = tuple(symbol if not symbol.op.islower() else value
+                        for symbol, value in zip(action.args, arg))
+            name = action.substitute(Expr(action.name, *action.args), arg)
+            if name in seen:
+                continue
+            seen.add(name)
+            ground.append(GroundAction(name,
+                                       _ground_clauses(action, action.precond_pos, arg, facts),
+                                       _ground_clauses(action, action.precond_neg, arg, facts),
+                                       _ground_clauses(action, action.effect_add, arg, facts),
+                                       _ground_clauses(action, action.effect_rem, arg, facts)))
+    return ground
+
+
+def _ground_clauses(action, clauses, arg, facts):
+    return [facts.intern(action.substitute(clause, arg)) for clause in clauses]
+
+
+class MutexView:
+    """
+    Read only view of a BitLevel's mutexes that behaves like aima3's Level.mutex,
+    a collection of sets of Expr, but answers `set([a, b]) in mutex` in constant time.
+    """
+
+    def __init__(self, level):
+        self.level = level
+
+    def __contains__(self, pair):
+        pair = list(pair)
+        if not pair or len(pair) > 2:
+            return False
+        first, second = pair[0], pair[-1]
+        graph = self.level.graph
+
+        action_ids = graph.action_ids
+        if first in action_ids and second in action_ids:
+            return self.level.is_action_mutex(action_ids[first], action_ids[second])
+
+        fact_ids = graph.facts.ids
+        if first in fact_ids and second in fact_ids:
+            return self.level.is_fact_mutex(fact_ids[first], fact_ids[second])
+        return False
+
+    def __iter__(self):
+        level = self.level
+        graph = level.graph
+        for i, mutex in enumerate(level.action_mutex):
+            for j in iter_bits(mutex >> i):
+                yield {graph.actions[level.actions[i]].expr,
+                       graph.actions[level.actions[i + j]].expr}
+
+        for kind, noop_mutex in ((POS_PERSISTENCE, level.noop_mutex_pos), (NEG_PERSISTENCE, level.noop_mutex_neg)):
+            for fact_id, mutex in noop_mutex.items():
+                noop = graph.actions[graph.persistence(fact_id, kind)].expr
+                for i in iter_bits(mutex):
+                    yield {noop, graph.actions[level.actions[i]].expr}
+        if graph.implicit_noops and level.built:
+            for fact_id in iter_bits(level.state_pos & level.state_neg):
+                yield {graph.actions[graph.persistence(fact_id, POS_PERSISTENCE)].expr,
+                       graph.actions[graph.persistence(fact_id, NEG_PERSISTENCE)].expr}
+
+        symbols = graph.facts.symbols
+        for fact_id, mutex in level.fact_mutex.items():
+            for other in iter_bits(mutex >> fact_id):
+                yield {symbols[fact_id], symbols[fact_id + other]}
+
+    def __len__(self):
+        level = self.level
+        count = sum(bin(mutex >> i).count("1") for i, mutex in enumerate(level.action_mutex))
+        for noop_mutex in (level.noop_mutex_pos, level.noop_mutex_neg):
+            count += sum(bin(mutex).count("1") for mutex in noop_mutex.values())
+        if level.graph.implicit_noops and level.built:
+            count += bin(level.state_pos & level.state_neg).count("1")
+        count += sum(bin(mutex >> fact_id).count("1") for fact_id, mutex in level.fact_mutex.items())
+        return count
+
+
+def _link_view(name):
+    def getter(self):
+        if self._views is None:
+            self._views = self._decode_links()
+        return self._views[name]
+    return property(getter)
+
+
+class BitLevel:
+    """
+    A level of the planning graph stored with integer ids.
+    The states are bitsets over fact ids, the action layer is an array of action ids
+    and the action mutexes are bitsets over the positions in that array.
+    When the graph has implicit no-ops they are left out of the action layer, a no-op
+    is there for every fact of the state and its mutexes with the real actions are kept
+    per fact in noop_mutex_pos and noop_mutex_neg.
+    The aima3 Level attributes are exposed as read only views.
+    """
+
+    def __init__(self, graph, state_pos, state_neg):
+        self.graph = graph
+        self.state_pos = state_pos
+        self.state_neg = state_neg
+        self.actions = array("l")
+        self.action_index = {}
+        self.action_mutex = []
+        self.fact_mutex = {}
+        # fact id -> bitset of the positions of the actions mutex with its no-op
+        self.noop_mutex_pos = {}
+        self.noop_mutex_neg = {}
+        # the action layer is only there once the level is built
+        self.built = False
+        self._views = None
+        self._states = None
+        self._poskb = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # the decoded views are rebuilt on demand
+        state.update(_views=None, _states=None, _poskb=None)
+        return state
+
+    def build(self):
+        graph = self.graph
+        actions = [] if graph.implicit_noops else self.noop_ids()
+
+        parallel = graph.parallel
+        if parallel is not None and len(graph.ground_action_ids) >= parallel.min_actions:
+            actions += parallel.applicable(graph, self.state_pos)
+        else:
+            for action_id in graph.ground_action_ids:
+                action = graph.actions[action_id]
+                if action.pre_pos_mask & ~self.state_pos == 0 and action.pre_neg_mask & self.state_pos == 0:
+                    actions.append(action_id)
+
+        self.actions = array("l", actions)
+        self.action_index = {action_id: i for i, action_id in enumerate(actions)}
+        self.built = True
+        self._views = None
+        self.find_mutex()
+
+    def find_mutex(self):
+        """
+        same rules as aima3's Level.find_mutex: inconsistent effects, interference,
+        competing needs and inconsistent support, computed with bitsets.
+        """
+        graph = self.graph
+        layer = [graph.actions[action_id] for action_id in self.actions]
+        parallel = graph.parallel
+        min_actions = graph.matrix_mutex_min_actions
+        if parallel is not None and len(layer) >= parallel.min_actions:
+            (self.action_mutex, self.noop_mutex_pos, self.noop_mutex_neg,
+             self.fact_mutex) = matrixmutex.find_mutex(graph, self.actions, self.state_pos, self.state_neg,
+                                                       parallel.mutex_product)
+            return
+        if matrixmutex is not None and min_actions is not None and len(layer) >= min_actions:
+            (self.action_mutex, self.noop_mutex_pos, self.noop_mutex_neg,
+             self.fact_mutex) = matrixmutex.find_mutex(graph, self.actions, self.state_pos, self.state_neg)
+            return
+
+        needs_pos, needs_neg, adds, deletes = {}, {}, {}, {}
+        for i, action in enumerate(layer):
+            bit = 1 << i
+            for fact_id in action.pre_pos:
+                needs_pos[fact_id] = needs_pos.get(fact_id, 0) | bit
+            for fact_id in action.pre_neg:
+                needs_neg[fact_id] = needs_neg.get(fact_id, 0) | bit
+            for fact_id in action.add:
+                adds[fact_id] = adds.get(fact_id, 0) | bit
+            for fact_id in action.delete:
+                deletes[fact_id] = deletes.get(fact_id, 0) | bit
+
+        action_mutex = []
+        for action in layer:
+            mutex = 0
+            for fact_id in action.add:
+                mutex |= deletes.get(fact_id, 0) | needs_neg.get(fact_id, 0)
+            for fact_id in action.delete:
+                mutex |= adds.get(fact_id, 0) | needs_pos.get(fact_id, 0)
+            for fact_id in action.pre_pos:
+                mutex |= deletes.get(fact_id, 0) | needs_neg.get(fact_id, 0)
+            for fact_id in action.pre_neg:
+                mutex |= adds.get(fact_id, 0) | needs_pos.get(fact_id, 0)
+            action_mutex.append(mutex)
+        self.action_mutex = action_mutex
+
+        noop_mutex_pos, noop_mutex_neg = {}, {}
+        if graph.implicit_noops:
+            # the same rules, a no-op needs and adds its fact or needs and deletes its absence
+            for fact_id in iter_bits(self.state_pos):
+                mutex = deletes.get(fact_id, 0) | needs_neg.get(fact_id, 0)
+                if mutex:
+                    noop_mutex_pos[fact_id] = mutex
+            for fact_id in iter_bits(self.state_neg):
+                mutex = adds.get(fact_id, 0) | needs_pos.get(fact_id, 0)
+                if mutex:
+                    noop_mutex_neg[fact_id] = mutex
+        self.noop_mutex_pos = noop_mutex_pos
+        self.noop_mutex_neg = noop_mutex_neg
+
+        # Inconsistent support, between the single effect of two mutex actions
+        single_effect = 0
+        effect = {}
+        for i, action in enumerate(layer):
+            effects = action.effects
+            if len(effects) == 1:
+                single_effect |= 1 << i
+                effect[i] = effects[0]
+
+        fact_mutex = {}
+        for i in iter_bits(single_effect):
+            for j in iter_bits((action_mutex[i] & single_effect) >> i):
+                first, second = effect[i], effect[i + j]
+                fact_mutex[first] = fact_mutex.get(first, 0) | (1 << second)
+                fact_mutex[second] = fact_mutex.get(second, 0) | (1 << first)
+        # a no-op's single effect is its fact
+        for noop_mutex in (noop_mutex_pos, noop_mutex_neg):
+            for first, mutex in noop_mutex.items():
+                for i in iter_bits(mutex & single_effect):
+                    second = effect[i]
+                    fact_mutex[first] = fact_mutex.get(first, 0) | (1 << second)
+                    fact_mutex[second] = fact_mutex.get(second, 0) | (1 << first)
+        if graph.implicit_noops:
+            # the two no-ops of a fact that is both true and false
+            for fact_id in iter_bits(self.state_pos & self.state_neg):
+                fact_mutex[fact_id] = fact_mutex.get(fact_id, 0) | (1 << fact_id)
+        self.fact_mutex = fact_mutex
+
+    def perform_actions(self):
+        state_pos = 0
+        state_neg = 0
+        if self.graph.implicit_noops:
+            state_pos = self.state_pos
+            state_neg = self.state_neg
+        for action_id in self.actions:
+            action = self.graph.actions[action_id]
+            state_pos |= action.add_mask
+            state_neg |= action.delete_mask
+        return BitLevel(self.graph, state_pos, state_neg)
+
+    def noop_ids(self):
+        """
+        :return: list of the action ids of the no-ops of the level's facts
+        """
+        graph = self.graph
+        noops = [graph.persistence(fact_id, POS_PERSISTENCE) for fact_id in iter_bits(self.state_pos)]
+        noops += [graph.persistence(fact_id, NEG_PERSISTENCE) for fact_id in iter_bits(self.state_neg)]
+        return noops
+
+    def action_ids(self):
+        """
+        :return: list of the ids of the whole action layer, no-ops first
+        """
+        if self.graph.implicit_noops and self.built:
+            return self.noop_ids() + list(self.actions)
+        return list(self.actions)
+
+    def action_count(self):
+        count = len(self.actions)
+        if self.graph.implicit_noops and self.built:
+            count += bin(self.state_pos).count("1") + bin(self.state_neg).count("1")
+        return count
+
+    def _has_noop(self, noop):
+        if not self.built:
+            return False
+        state = self.state_pos if noop.persistence == POS_PERSISTENCE else self.state_neg
+        return bool(state >> noop.fact & 1)
+
+    def _is_noop_mutex(self, noop, other, other_id):
+        if not self._has_noop(noop):
+            return False
+        if other.persistence is not None:
+            # no-ops are only mutex with the opposite no-op of their fact
+            return (other.persistence != noop.persistence and other.fact == noop.fact and
+                    self._has_noop(other))
+        position = self.action_index.get(other_id)
+        if position is None:
+            return False
+        noop_mutex = self.noop_mutex_pos if noop.persistence == POS_PERSISTENCE else self.noop_mutex_neg
+        return bool(noop_mutex.get(noop.fact, 0) >> position & 1)
+
+    def is_action_mutex(self, first_id, second_id):
+        if self.graph.implicit_noops:
+            first_action = self.graph.actions[first_id]
+            second_action = self.graph.actions[second_id]
+            if first_action.persistence is not None:
+                return self._is_noop_mutex(first_action, second_action, second_id)
+            if second_action.persistence is not None:
+                return self._is_noop_mutex(second_action, first_action, first_id)
+        first = self.action_index.get(first_id)
+        second = self.action_index.get(second_id)
+        if first is None or second is None:
+            return False
+        return bool(self.action_mutex[first] >> second & 1)
+
+    def is_fact_mutex(self, first_id, second_id):
+        return bool(self.fact_mutex.get(first_id, 0) >> second_id & 1)
+
+    @property
+    def mutex(self):
+        return MutexView(self)
+
+    @property
+    def current_state_pos(self):
+        return self._decode_states()[0]
+
+    @property
+    def current_state_neg(self):
+        return self._decode_states()[1]
+
+    @property
+    def views_decoded(self):
+        return self._views is not None
+
+    def release_views(self):
+        """
+        drop the decoded views, they are rebuilt on demand
+        """
+        self._views = None
+        self._states = None
+        self._poskb = None
+
+    @property
+    def poskb(self):
+        if self._poskb is None:
+            self._poskb = FolKB(self.current_state_pos)
+        return self._poskb
+
+    current_action_links_pos = _link_view("current_action_links_pos")
+    current_action_links_neg = _link_view("current_action_links_neg")
+    current_state_links_pos = _link_view("current_state_links_pos")
+    current_state_links_neg = _link_view("current_state_links_neg")
+    next_action_links = _link_view("next_action_links")
+    next_state_links_pos = _link_view("next_state_links_pos")
+    next_state_links_neg = _link_view("next_state_links_neg")
+
+    def _decode_states(self):
+        if self._states is None:
+            symbols = self.graph.facts.symbols
+            self._states = ([symbols[i] for i in iter_bits(self.state_pos)],
+                            [symbols[i] for i in iter_bits(self.state_neg)])
+        return self._states
+
+    def _decode_links(self):
+        """
+        build the aima3 style link dictionaries of this level, keyed by Expr
+        """
+        symbols = self.graph.facts.symbols
+        views = {name: {} for name in LINK_VIEWS}
+        for action_id in self.action_ids():
+            action = self.graph.actions[action_id]
+            name = action.expr
+            pre_pos = [symbols[i] for i in action.pre_pos]
+            pre_neg = [symbols[i] for i in action.pre_neg]
+            add = [symbols[i] for i in action.add]
+            delete = [symbols[i] for i in action.delete]
+
+            if action.persistence != NEG_PERSISTENCE:
+                views["current_action_links_pos"][name] = pre_pos
+            if action.persistence != POS_PERSISTENCE:
+                views["current_action_links_neg"][name] = pre_neg
+            views["next_action_links"][name] = add + delete
+
+            for fact in pre_pos:
+                views["current_state_links_pos"].setdefault(fact, []).append(name)
+            for fact in pre_neg:
+                views["current_state_links_neg"].setdefault(fact, []).append(name)
+            for fact in add:
+                views["next_state_links_pos"].setdefault(fact, []).append(name)
+            for fact in delete:
+                views["next_state_links_neg"].setdefault(fact, []).append(name)
+        return views
+
+
+class BitGraph:
+    """
+    Drop in replacement for aima3's Graph.
+    Every ground fact and action gets an integer id, the actions are grounded once
+    and the levels and mutexes are stored as bitsets.
+    """
+    # keep the no-ops out of the action layers, see ImplicitNoopGraph
+    implicit_noops = False
+    # smallest action layer whose mutexes are found with numpy matrices, None for never
+    matrix_mutex_min_actions = MATRIX_MUTEX_MIN_ACTIONS
+
+    def __init__(self, pddl, negkb, ground=None):
+        """
+        :param pddl: aima3 PDDL object
+        :param negkb: FolKB of the negative initial state
+        :param ground: optional grounding.GroundProblem, its ground action table is used
+                       instead of instantiating the aima3 actions with every object
+        """
+        self.pddl = pddl
+        self.objects = set(arg for clause in pddl.kb.clauses + negkb.clauses for arg in clause.args)
+        self.facts = SymbolTable() if ground is None else ground.facts
+
+        if ground is None:
+            state_pos = _mask(self.facts.intern(clause) for clause in pddl.kb.clauses)
+        else:
+            # the initial facts were interned first by the grounding
+            state_pos = ground.init
+        state_neg = _mask(self.facts.intern(clause) for clause in negkb.clauses)
+
+        self.actions = []
+        self.action_ids = {}
+        self._persistence = {}
+        if ground is None:
+            ground_table = ground_actions(pddl.actions, self.objects, self.facts)
+        else:
+            ground_table = ground.actions
+        for action in ground_table:
+            self._add_action(action)
+        self.ground_action_ids = list(range(len(self.actions)))
+        # matrixmutex.IncidenceTable of the actions, created on first use
+        self.incidence = None
+        # parallel.ParallelExpander the levels are expanded with, None to expand serially
+        self.parallel = None
+
+        self.levels = [BitLevel(self, state_pos, state_neg)]
+
+    def __call__(self):
+        self.expand_graph()
+
+    def __getstate__(self):
+        # the aima3 PDDL object holds the goal test closure, the owner sets it back on load
+        state = self.__dict__.copy()
+        state["pddl"] = None
+        state["incidence"] = None
+        state["parallel"] = None
+        return state
+
+    def _add_action(self, action):
+        action_id = len(self.actions)
+        self.actions.append(action)
+        self.action_ids[action.expr] = action_id
+        return action_id
+
+    def persistence(self, fact_id, kind):
+        """
+        :param fact_id: id of the persisted fact
+        :param kind: POS_PERSISTENCE or NEG_PERSISTENCE
+        :return: the action id of the no-op, created on first use
+        """
+        key = (fact_id, kind)
+        action_id = self._persistence.get(key)
+        if action_id is None:
+            clause = self.facts.symbols[fact_id]
+            if kind == POS_PERSISTENCE:
+                action = GroundAction(Expr('Persistence', clause), [fact_id], [], [fact_id], [],
+                                      persistence=kind)
+            else:
+                not_expr = Expr('not' + clause.op, clause.args)
+                action = GroundAction(Expr('Persistence', not_expr), [], [fact_id], [], [fact_id],
+                                      persistence=kind)
+            action_id = self._add_action(action)
+            self._persistence[key] = action_id
+        return action_id
+
+    def expand_graph(self):
+        last_level = self.levels[-1]
+        last_level.build()
+        self.levels.append(last_level.perform_actions())
+
+    def goal_ids(self, goals):
+        """
+        :return: list of the fact ids of the goals, None if any of them is not a known fact
+        """
+        fact_ids = self.facts.ids
+        ids = []
+        for goal in goals:
+            fact_id = fact_ids.get(goal)
+            if fact_id is None:
+                return None
+            ids.append(fact_id)
+        return ids
+
+    def goals_hold(self, goals, index):
+        """
+        :return: True if every goal is a fact of the level's positive state
+        """
+        ids = self.goal_ids(goals)
+        return ids is not None and _mask(ids) & ~self.levels[index].state_pos == 0
+
+    def non_mutex_goals(self, goals, index):
+        fact_mutex = self.levels[index].fact_mutex
+        fact_ids = self.facts.ids
+        ids = [fact_ids[goal] for goal in goals if goal in fact_ids]
+        goal_mask = repeated = 0
+        for fact_id in ids:
+            bit = 1 << fact_id
+            if goal_mask & bit:
+                repeated |= bit
+            goal_mask |= bit
+        for fact_id in ids:
+            bit = 1 << fact_id
+            # a fact is only checked against itself when it is a goal twice, like aima3's pairs
+            if fact_mutex.get(fact_id, 0) & (goal_mask & ~bit | repeated & bit):
+                return False
+        return True
+
+
+class ImplicitNoopGraph(BitGraph):
+    """
+    BitGraph whose levels don't store their no-ops.
+    No-ops are most of every action layer, here they are derived from the facts of the
+    level, a level only stores the mutexes between no-ops and real actions, as one
+    bitset per fact. The decoded views, mutexes and plans are the same as BitGraph's.
+    """
+    implicit_noops = True
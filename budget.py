@@ -0,0 +1,142 @@
+import os
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# budget limits, also the status of a SolveResult that ran out of one
+TIME = "time"
+LEVELS = "levels"
+NODES = "nodes"
+MEMORY = "memory"
+
+# memory is sampled every this many extraction nodes, reading it is a system call
+MEMORY_CHECK_INTERVAL = 256
+
+
+def current_memory():
+    """
+    :return: resident memory of the process in bytes, None if it can't be measured
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    if resource is None:
+        return None
+    # peak and not current, the best there is without /proc
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class BudgetExceeded(Exception):
+    def __init__(self, limit):
+        super().__init__(f"{limit} budget exceeded")
+        self.limit = limit
+
+
+class Budget:
+    """
+    Limits of one GraphPlanVis.solve call, None means unlimited.
+    Extraction charges it for every node it explores and the solve loop checks it before
+    every expansion, either raises BudgetExceeded once a limit is hit. A level that
+    started expanding is always finished, so a run can overshoot the time and memory
+    limits by one expansion.
+    """
+
+    def __init__(self, seconds=None, max_levels=None, max_nodes=None, max_memory=None):
+        """
+        :param seconds: wall clock time of the whole solve
+        :param max_levels: number of levels the graph may be expanded to, not counting the first
+        :param max_nodes: number of extraction nodes explored
+        :param max_memory: resident memory of the process in bytes
+        """
+        self.seconds = seconds
+        self.max_levels = max_levels
+        self.max_nodes = max_nodes
+        self.max_memory = max_memory
+        self.start()
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.deadline = None if self.seconds is None else self.started + self.seconds
+        self.nodes = 0
+        self.peak_memory = None
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def _check_memory(self):
+        if self.max_memory is None:
+            return
+        memory = current_memory()
+        if memory is None:
+            return
+        self.peak_memory = max(self.peak_memory or 0, memory)
+        if memory > self.max_memory:
+            raise BudgetExceeded(MEMORY)
+
+    def charge(self, nodes=1):
+        """
+        count explored extraction nodes and check the node, time and memory limits
+        """
+        before = self.nodes
+        self.nodes += nodes
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            raise BudgetExceeded(NODES)
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise BudgetExceeded(TIME)
+        if before // MEMORY_CHECK_INTERVAL != self.nodes // MEMORY_CHECK_INTERVAL:
+            self._check_memory()
+
+    def check_expansion(self, levels):
+        """
+        check the limits before expanding the graph
+        :param levels: number of levels the graph has now
+        """
+        if self.max_levels is not None and levels - 1 >= self.max_levels:
+            raise BudgetExceeded(LEVELS)
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise BudgetExceeded(TIME)
+        self._check_memory()
+
+
+class SolveResult:
+    """
+    Outcome of GraphPlanVis.solve.
+    status is "solved", "no_solution" when the graph leveled off or nothing could be
+    extracted without expanding, or the budget limit that was hit.
+    """
+    __slots__ = ("status", "solution", "levels", "nodes", "seconds", "peak_memory", "winner")
+
+    def __init__(self, status, solution, levels, nodes, seconds, peak_memory=None, winner=None):
+        self.status = status
+        self.solution = solution
+        self.levels = levels
+        self.nodes = nodes
+        self.seconds = seconds
+        self.peak_memory = peak_memory
+        # name of the portfolio.ExtractionConfig that found the solution
+        self.winner = winner
+
+    @property
+    def solved(self):
+        return self.status == "solved"
+
+    @property
+    def limit(self):
+        """
+        :return: the budget limit that stopped the solve, None if it ran to the end
+        """
+        return None if self.status in ("solved", "no_solution") else self.status
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name != "solution"}
+
+    def __repr__(self):
+        return (f"SolveResult(status={self.status!r}, levels={self.levels}, nodes={self.nodes}, "
+                f"seconds={self.seconds:.3f})")
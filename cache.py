@@ -0,0 +1,129 @@
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+
+CACHE_VERSION = 4
+MAGIC = b"GPVCACHE"
+HEADER = struct.Struct("<8sI")
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "graphplan-visual")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def problem_key(domain_file_path, problem_file_path, *extra):
+    """
+    :param domain_file_path: path to the domain pddl file
+    :param problem_file_path: path to the problem pddl file
+    :param extra: other strings the cached content depends on, like the engine name
+    :return: hex digest of the content of both files and the extras
+    """
+    digest = hashlib.sha256()
+    for path in (domain_file_path, problem_file_path):
+        with open(path, "rb") as f:
+            content = f.read()
+        digest.update(struct.pack("<Q", len(content)))
+        digest.update(content)
+    for item in extra:
+        digest.update(str(item).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ProblemCache:
+    """
+    Directory of compiled problems keyed by content hash.
+    Every entry is a file holding a versioned header and a pickled payload, read through mmap.
+    When the directory grows over max_bytes the least recently used entries are removed.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.gpv")
+
+    def load(self, key):
+        """
+        :param key: output of problem_key
+        :return: the stored payload, None if it is missing or of another format version
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                magic, version = HEADER.unpack_from(mapped)
+                if magic != MAGIC or version != CACHE_VERSION:
+                    raise ValueError(f"stale cache entry {path}")
+                with memoryview(mapped) as view:
+                    payload = pickle.loads(view[HEADER.size:])
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (ValueError, struct.error, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            self.misses += 1
+            self._remove(path)
+            return None
+
+        # mark as recently used for the eviction
+        os.utime(path)
+        self.hits += 1
+        return payload
+
+    def store(self, key, payload):
+        """
+        write the payload atomically and evict old entries if the cache is too big
+        :param key: output of problem_key
+        :param payload: picklable object
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        data = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(HEADER.pack(MAGIC, CACHE_VERSION))
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        self.evict()
+
+    def evict(self):
+        """
+        remove the least recently used entries until the cache fits in max_bytes
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".gpv"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        if not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".gpv"):
+                self._remove(os.path.join(self.cache_dir, name))
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
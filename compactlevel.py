@@ -0,0 +1,197 @@
+"""
+Compact planning graph levels and memory accounting.
+An aima3 Level keeps its links as dicts of lists and its mutexes as a list of sets, tens
+of bytes per link and hundreds per mutex. Once a level is expanded it doesn't change, so
+CompactLevel stores the same data as flat integer arrays of symbol ids: the links in
+compressed sparse row form and the mutexes as sorted pair keys. Read only dict like views
+decode them on access, so drawing and extraction use it like the Level it replaces.
+The nodes are packed sorted by name, the order of a Level comes from iterating sets and
+changes from run to run.
+"""
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+import sys
+
+# 32 bit ids, a graph has far fewer symbols
+ID_TYPE = "i"
+
+
+def _pair_key(first, second):
+    if first > second:
+        first, second = second, first
+    return first << 32 | second
+
+
+class LinkMap(Mapping):
+    """
+    Read only dict from a symbol to the list of symbols it links to.
+    The lists are one flat array of ids cut by offsets, the keys are kept in name order and
+    found by a binary search over their sorted ids.
+    """
+    __slots__ = ("_symbols", "_keys", "_sorted_keys", "_sorted_rows", "_indptr", "_indices")
+
+    def __init__(self, links, symbols):
+        """
+        :param links: dict from a symbol to a list of symbols
+        :param symbols: bitgraph.SymbolTable shared by the levels of the graph
+        """
+        self._symbols = symbols
+        self._keys = array(ID_TYPE)
+        self._indptr = array(ID_TYPE, [0])
+        self._indices = array(ID_TYPE)
+        for key in sorted(links, key=str):
+            self._keys.append(symbols.intern(key))
+            self._indices.extend(symbols.intern(value) for value in sorted(links[key], key=str))
+            self._indptr.append(len(self._indices))
+        rows = sorted(range(len(self._keys)), key=self._keys.__getitem__)
+        self._sorted_keys = array(ID_TYPE, [self._keys[row] for row in rows])
+        self._sorted_rows = array(ID_TYPE, rows)
+
+    def _row(self, key):
+        key_id = self._symbols.ids.get(key)
+        if key_id is None:
+            return None
+        position = bisect_left(self._sorted_keys, key_id)
+        if position == len(self._sorted_keys) or self._sorted_keys[position] != key_id:
+            return None
+        return self._sorted_rows[position]
+
+    def __getitem__(self, key):
+        links = self.get(key)
+        if links is None:
+            raise KeyError(key)
+        return links
+
+    def get(self, key, default=None):
+        row = self._row(key)
+        if row is None:
+            return default
+        symbols = self._symbols.symbols
+        return [symbols[value] for value in self._indices[self._indptr[row]:self._indptr[row + 1]]]
+
+    def __contains__(self, key):
+        return self._row(key) is not None
+
+    def __iter__(self):
+        symbols = self._symbols.symbols
+        return (symbols[key] for key in self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def nbytes(self):
+        return sys.getsizeof(self) + sum(sys.getsizeof(ids) for ids in (
+            self._keys, self._sorted_keys, self._sorted_rows, self._indptr, self._indices))
+
+
+class MutexPairs:
+    """
+    Read only list of the mutex pairs of a level, iterated as sets like aima3's.
+    A pair is tested by a binary search over the sorted keys of the pairs.
+    """
+    __slots__ = ("_symbols", "_firsts", "_seconds", "_keys")
+
+    def __init__(self, mutex, symbols):
+        """
+        :param mutex: list of sets of one or two symbols
+        :param symbols: bitgraph.SymbolTable shared by the levels of the graph
+        """
+        self._symbols = symbols
+        self._firsts = array(ID_TYPE)
+        self._seconds = array(ID_TYPE)
+        for pair in mutex:
+            ids = [symbols.intern(symbol) for symbol in pair]
+            self._firsts.append(ids[0])
+            self._seconds.append(ids[-1])
+        self._keys = array("q", sorted(map(_pair_key, self._firsts, self._seconds)))
+
+    def __contains__(self, pair):
+        if len(pair) == 2:
+            first, second = pair
+        elif len(pair) == 1:
+            first = second = next(iter(pair))
+        else:
+            return False
+        ids = self._symbols.ids
+        first, second = ids.get(first), ids.get(second)
+        if first is None or second is None:
+            return False
+        key = _pair_key(first, second)
+        position = bisect_left(self._keys, key)
+        return position < len(self._keys) and self._keys[position] == key
+
+    def __iter__(self):
+        symbols = self._symbols.symbols
+        for first, second in zip(self._firsts, self._seconds):
+            yield {symbols[first], symbols[second]}
+
+    def __len__(self):
+        return len(self._firsts)
+
+    def nbytes(self):
+        return sys.getsizeof(self) + sum(sys.getsizeof(ids) for ids in (self._firsts, self._seconds, self._keys))
+
+
+class CompactLevel:
+    """
+    An expanded aima3 Level in flat arrays, with the same attributes read only.
+    """
+    __slots__ = ("current_state_pos", "current_state_neg", "current_action_links_pos",
+                 "current_action_links_neg", "current_state_links_pos", "current_state_links_neg",
+                 "next_action_links", "next_state_links_pos", "next_state_links_neg", "mutex")
+
+    def __init__(self, level, symbols):
+        """
+        :param level: aima3 Level whose actions and mutexes were found
+        :param symbols: bitgraph.SymbolTable shared by the levels of the graph
+        """
+        self.current_state_pos = tuple(sorted(level.current_state_pos, key=str))
+        self.current_state_neg = tuple(sorted(level.current_state_neg, key=str))
+        self.current_action_links_pos = LinkMap(level.current_action_links_pos, symbols)
+        self.current_action_links_neg = LinkMap(level.current_action_links_neg, symbols)
+        self.current_state_links_pos = LinkMap(level.current_state_links_pos, symbols)
+        self.current_state_links_neg = LinkMap(level.current_state_links_neg, symbols)
+        self.next_action_links = LinkMap(level.next_action_links, symbols)
+        self.next_state_links_pos = LinkMap(level.next_state_links_pos, symbols)
+        self.next_state_links_neg = LinkMap(level.next_state_links_neg, symbols)
+        self.mutex = MutexPairs(level.mutex, symbols)
+
+    def nbytes(self):
+        """
+        :return: bytes held by the level, the symbols shared with the graph are not counted
+        """
+        return (sys.getsizeof(self) + sys.getsizeof(self.current_state_pos) +
+                sys.getsizeof(self.current_state_neg) +
+                sum(getattr(self, name).nbytes() for name in self.__slots__[2:]))
+
+
+def _container_bytes(value):
+    # dicts, lists and sets of symbols, without the symbols
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        return size + sum(_container_bytes(links) for links in value.values())
+    if isinstance(value, (list, tuple)):
+        return size + sum(_container_bytes(item) for item in value if isinstance(item, (list, set, dict)))
+    return size
+
+
+def level_bytes(level):
+    """
+    memory held by a level of any engine, the symbols, actions and facts shared with the
+    rest of the graph are not counted, nor are the views a bitgraph.BitLevel decodes
+    :param level: aima3 Level, CompactLevel or bitgraph.BitLevel
+    :return: number of bytes
+    """
+    if isinstance(level, CompactLevel):
+        return level.nbytes()
+    if hasattr(level, "state_pos"):
+        size = sys.getsizeof(level.actions) + sys.getsizeof(level.action_index)
+        size += sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in level.action_index.items())
+        size += sys.getsizeof(level.action_mutex) + sum(map(sys.getsizeof, level.action_mutex))
+        for bitsets in (level.fact_mutex, level.noop_mutex_pos, level.noop_mutex_neg):
+            size += sys.getsizeof(bitsets)
+            size += sum(sys.getsizeof(key) + sys.getsizeof(value) for key, value in bitsets.items())
+        return size
+    return sys.getsizeof(level) + sum(_container_bytes(value) for value in vars(level).values()
+                                      if isinstance(value, (list, tuple, dict)))
@@ -1,8 +1,124 @@
+import math
+import threading
+import time
+
 import pddlpy
 from aima3.planning import *
 import matplotlib.pyplot as plt
 import networkx as nx
+from bitgraph import BitGraph, ImplicitNoopGraph, SymbolTable
+from compactlevel import CompactLevel, level_bytes
+from nogoods import NogoodTable
+from extraction import BackjumpingExtractor
+from grounding import ground_problem
+from cache import problem_key
+from instrumentation import Instrumentation
+from renderer import CollectionRenderer
+from spatial import GridIndex
+from budget import Budget, BudgetExceeded, SolveResult
+from export import export_graph, level_elements, node_id, is_noop
+from parser import to_pddl_aima_obj, make_goal_test, compile_goals, clear_terms
+from portfolio import race
+from relevance import SlicedGraph, relevant_nodes
+
+try:
+    from parallel import ParallelExpander, MIN_PARALLEL_ACTIONS
+except ImportError:
+    ParallelExpander = None
+    MIN_PARALLEL_ACTIONS = None
+
+
+class IndexedGraph(Graph):
+    """
+    aima3's Graph with hashed lookups for the goal tests.
+    The fact set and the mutex index of a level are built on first use, so a goal test
+    costs time in the number of goals and not in the size of the level.
+    """
+
+    def __init__(self, pddl, negkb):
+        super().__init__(pddl, negkb)
+        # level number -> frozenset of facts
+        self._fact_sets = {}
+        # level number -> (number of mutexes when indexed, index)
+        self._mutex_indexes = {}
+
+    def fact_set(self, index):
+        """
+        :return: frozenset of the positive facts of the level, they don't change once it exists
+        """
+        level_num = index % len(self.levels)
+        facts = self._fact_sets.get(level_num)
+        if facts is None:
+            facts = self._fact_sets[level_num] = frozenset(self.levels[level_num].current_state_pos)
+        return facts
+
+    def mutex_index(self, index):
+        """
+        :return: (dictionary from each action or fact to the set of its mutex partners,
+                  set of the facts mutex with themselves)
+        """
+        level_num = index % len(self.levels)
+        mutex = self.levels[level_num].mutex
+        # the mutexes of a level are only found when it is expanded
+        cached = self._mutex_indexes.get(level_num)
+        if cached is not None and cached[0] == len(mutex):
+            return cached[1]
+
+        partners, self_mutex = {}, set()
+        for pair in mutex:
+            if len(pair) == 2:
+                first, second = pair
+                partners.setdefault(first, set()).add(second)
+                partners.setdefault(second, set()).add(first)
+            else:
+                self_mutex.update(pair)
+        self._mutex_indexes[level_num] = (len(mutex), (partners, self_mutex))
+        return partners, self_mutex
+
+    def goals_hold(self, goals, index):
+        """
+        :return: True if every goal is a fact of the level's positive state
+        """
+        facts = self.fact_set(index)
+        return all(goal in facts for goal in goals)
+
+    def non_mutex_goals(self, goals, index):
+        partners, self_mutex = self.mutex_index(index)
+        goal_set = set(goals)
+        for goal in goal_set:
+            goal_partners = partners.get(goal)
+            if goal_partners is not None and not goal_partners.isdisjoint(goal_set):
+                return False
+        # a fact is only checked against itself when it is a goal twice, like aima3's pairs
+        if self_mutex and len(goal_set) != len(goals):
+            seen = set()
+            for goal in goals:
+                if goal in seen and goal in self_mutex:
+                    return False
+                seen.add(goal)
+        return True
+
+
+class CompactGraph(IndexedGraph):
+    """
+    IndexedGraph whose levels are turned into compactlevel.CompactLevels once expanded,
+    only the last level is an aima3 Level.
+    """
+
+    def __init__(self, pddl, negkb):
+        super().__init__(pddl, negkb)
+        # ids of the facts and actions of every level
+        self.symbols = SymbolTable()
 
+    def expand_graph(self):
+        super().expand_graph()
+        self.levels[-2] = CompactLevel(self.levels[-2], self.symbols)
+
+
+GRAPH_ENGINES = {"aima": IndexedGraph, "bitset": BitGraph, "implicit": ImplicitNoopGraph,
+                 "compact": CompactGraph}
+EXTRACTORS = ("product", "csp")
+GOAL_ORDERS = ("given", "reversed", "fewest_supporters", "most_supporters")
 
 class MyGraphPlan:
     """
@@ -11,12 +127,76 @@ class MyGraphPlan:
     Returns solution for the planning problem
     """
 
-    def __init__(self, pddl, negkb):
-        self.graph = Graph(pddl, negkb)
-        self.nogoods = []
+    def __init__(self, pddl, negkb, engine="aima", subsumption=True, ground=None):
+        """
+        :param pddl: aima3 PDDL object
+        :param negkb: FolKB of the negative initial state
+        :param engine: name of the planning graph implementation, a key of GRAPH_ENGINES
+        :param subsumption: prune supersets of failing goal sets, not only exact matches
+        :param ground: optional grounding.GroundProblem consumed by the bitset engines
+        """
+        if engine not in GRAPH_ENGINES:
+            raise ValueError(f"Unknown planning graph engine '{engine}', "
+                             f"expected one of {list(GRAPH_ENGINES)}")
+        if ground is None:
+            self.graph = GRAPH_ENGINES[engine](pddl, negkb)
+        else:
+            self.graph = GRAPH_ENGINES[engine](pddl, negkb, ground=ground)
+        self.nogoods = NogoodTable(subsumption=subsumption)
+        self.extract_calls = 0
+        self.extract_nodes = 0
+        self.extractor_stats = {}
+        self.instrumentation = None
+        # budget.Budget of the running solve, charged for every extraction node
+        self.budget = None
+        # order extraction tries the goals and their supporters in, see order_goals and order_supporters
+        self.goal_order = "given"
+        self.noops_first = None
+        # extract from the slice of the graph relevant to the goals, see relevance.SlicedGraph
+        self.slice_relevant = True
         self.solution = []
         self.pos = None
 
+    def expand_graph(self):
+        """
+        expand the planning graph by one level, timing it when instrumentation is attached
+        """
+        if self.instrumentation is None:
+            self.graph.expand_graph()
+            return
+        start = time.perf_counter()
+        self.graph.expand_graph()
+        self.instrumentation.record_expansion(self.graph, time.perf_counter() - start)
+
+    def goals_reachable(self, goals_pos, goals_neg, index=-1):
+        """
+        :return: True if the positive goals hold at the level and no two goals are mutex there
+        """
+        return (self.graph.goals_hold(goals_pos, index) and
+                self.graph.non_mutex_goals(goals_pos + goals_neg, index))
+
+    def order_goals(self, goals, links):
+        """
+        :param goals: list of goals of a level
+        :param links: the level's next_state_links_pos or next_state_links_neg
+        :return: the goals in the order of goal_order, one of GOAL_ORDERS
+        """
+        if self.goal_order == "reversed":
+            return goals[::-1]
+        if self.goal_order == "fewest_supporters":
+            return sorted(goals, key=lambda goal: len(links.get(goal, ())))
+        if self.goal_order == "most_supporters":
+            return sorted(goals, key=lambda goal: -len(links.get(goal, ())))
+        return goals
+
+    def order_supporters(self, supporters):
+        """
+        :return: the supporting actions of a goal, no-ops first or last when noops_first is set
+        """
+        if self.noops_first is None:
+            return supporters
+        return sorted(supporters, key=lambda action: is_noop(action) != self.noops_first)
+
     def check_leveloff(self):
         first_check = (set(self.graph.levels[-1].current_state_pos) ==
                        set(self.graph.levels[-2].current_state_pos))
@@ -26,35 +206,57 @@ class MyGraphPlan:
         if first_check and second_check:
             return True
 
-    def extract_solution(self, goals_pos, goals_neg, index):
-        level = self.graph.levels[index]
-        if not self.graph.non_mutex_goals(goals_pos+goals_neg, index):
-            self.nogoods.append((level, goals_pos, goals_neg))
+    def extract_solution(self, goals_pos, goals_neg, index, graph=None):
+        """
+        :param graph: graph to extract from, see extraction_graph, None for the whole graph
+        """
+        if graph is None:
+            graph = self.graph
+        self.extract_calls += 1
+        level_num = len(graph.levels) + index
+        instrumentation = self.instrumentation
+        if instrumentation is not None:
+            instrumentation.count_extraction(level_num)
+        if not graph.non_mutex_goals(goals_pos+goals_neg, index):
+            self.nogoods.add(level_num, goals_pos, goals_neg)
             return False
+        if level_num == 0:
+            # nothing to extract from, the goals hold in the initial state or not at all,
+            # an empty plan like extract_solution_csp's
+            return [[]] if graph.goals_hold(goals_pos, 0) else False
 
-        level = self.graph.levels[index-1]
+        level = graph.levels[index-1]
 
         # Create all combinations of actions that satisfy the goal
         actions = []
-        for goal in goals_pos:
-            actions.append(level.next_state_links_pos[goal])
+        for goal in self.order_goals(goals_pos, level.next_state_links_pos):
+            actions.append(self.order_supporters(level.next_state_links_pos[goal]))
 
-        for goal in goals_neg:
-            actions.append(level.next_state_links_neg[goal])
+        for goal in self.order_goals(goals_neg, level.next_state_links_neg):
+            actions.append(self.order_supporters(level.next_state_links_neg[goal]))
 
+        if self.budget is not None:
+            # charged before the combinations are built, there may be too many to hold
+            self.budget.charge(math.prod(len(supporters) for supporters in actions))
         all_actions = list(itertools.product(*actions))
+        self.extract_nodes += len(all_actions)
 
         # Filter out the action combinations which contain mutexes
         non_mutex_actions = []
-        for action_tuple in all_actions:
-            action_pairs = itertools.combinations(list(set(action_tuple)), 2)
-            non_mutex_actions.append(list(set(action_tuple)))
+        for i, action_tuple in enumerate(all_actions):
+            if self.budget is not None and not i % 1024:
+                self.budget.charge(0)
+            # duplicates dropped keeping the order of the goals
+            action_list = list(dict.fromkeys(action_tuple))
+            action_pairs = itertools.combinations(action_list, 2)
+            non_mutex_actions.append(action_list)
             for pair in action_pairs:
                 if set(pair) in level.mutex:
                     non_mutex_actions.pop(-1)
                     break
 
         if not non_mutex_actions:
+            self.nogoods.add(level_num, goals_pos, goals_neg)
             return False
 
         # Recursion
@@ -64,29 +266,35 @@ class MyGraphPlan:
 
                 new_goals_pos = []
                 new_goals_neg = []
-                for act in set(action_list):
+                for act in action_list:
                     if act in level.current_action_links_pos:
                         new_goals_pos = new_goals_pos + level.current_action_links_pos[act]
 
-                for act in set(action_list):
+                for act in action_list:
                     if act in level.current_action_links_neg:
                         new_goals_neg = new_goals_neg + level.current_action_links_neg[act]
 
-                if abs(index)+1 == len(self.graph.levels):
-                    if all(goal in self.graph.levels[0].current_state_pos for goal in new_goals_pos):
+                if abs(index)+1 == len(graph.levels):
+                    if graph.goals_hold(new_goals_pos, 0):
                         return True
                     else:
-                        return False
-                elif (level, new_goals_pos, new_goals_neg) in self.nogoods:
-                    return False
+                        self.solution.pop()
+                        if instrumentation is not None:
+                            instrumentation.count_backtrack(level_num)
+                elif self.nogoods.is_nogood(level_num - 1, new_goals_pos, new_goals_neg):
+                    self.solution.pop()
+                    if instrumentation is not None:
+                        instrumentation.count_nogood_hit(level_num - 1)
                 else:
-                    success = self.extract_solution(new_goals_pos, new_goals_neg, index-1)
+                    success = self.extract_solution(new_goals_pos, new_goals_neg, index-1, graph)
                     if success and index == -1:
                         break
                     elif success and index != -1:
                         return True
                     else:
                         self.solution.pop()
+                        if instrumentation is not None:
+                            instrumentation.count_backtrack(level_num)
 
 
 
@@ -105,68 +313,344 @@ class MyGraphPlan:
                 solution[num] = item
 
             return solution
+
+        self.nogoods.add(level_num, goals_pos, goals_neg)
         return False
 
+    def extract_solution_csp(self, goals_pos, goals_neg, index, graph=None):
+        """
+        extract a solution by assigning supporters goal by goal with backjumping,
+        see extraction.BackjumpingExtractor
+        :param graph: graph to extract from, see extraction_graph, None for the whole graph
+        :return: same format as extract_solution, a list holding one level ordered solution
+        """
+        extractor = BackjumpingExtractor(self, graph)
+        plan = extractor.extract(goals_pos, goals_neg, len(self.graph.levels) + index)
+        self.extract_nodes += extractor.nodes
+        self.extractor_stats = extractor.stats()
+        if plan is None:
+            return False
+        return [plan]
+
+    def iter_solutions(self, goals_pos, goals_neg, index=-1, max_plans=None):
+        """
+        lazily yields the distinct plans achieving the goals at the level, one at a time
+        :param index: index of the level of the goals
+        :param max_plans: stop after this many plans, None for all of them
+        :return: generator of plans, each a list of action lists from the first level
+        """
+        extractor = BackjumpingExtractor(self, self.extraction_graph(goals_pos, goals_neg, index))
+        seen = set()
+        for plan in extractor.iter_plans(goals_pos, goals_neg, len(self.graph.levels) + index):
+            key = plan_key(plan)
+            if key in seen:
+                continue
+            seen.add(key)
+            self.extractor_stats = extractor.stats()
+            yield plan
+            if max_plans is not None and len(seen) >= max_plans:
+                return
+
+    def extraction_graph(self, goals_pos, goals_neg, index=-1):
+        """
+        :param index: index of the level of the goals
+        :return: the graph sliced to the nodes relevant to the goals if slice_relevant is set,
+                 see relevance.SlicedGraph, else the whole graph
+        """
+        if not self.slice_relevant:
+            return self.graph
+        return SlicedGraph(self.graph, goals_pos, goals_neg, index)
+
+    def extract(self, goals_pos, goals_neg, index, extractor="product", graph=None):
+        """
+        :param extractor: "product" for extract_solution or "csp" for extract_solution_csp
+        :param graph: graph to extract from, None for the extraction_graph of the goals
+        """
+        if graph is None:
+            graph = self.extraction_graph(goals_pos, goals_neg, index)
+        if extractor == "product":
+            return self.extract_solution(goals_pos, goals_neg, index, graph)
+        if extractor == "csp":
+            return self.extract_solution_csp(goals_pos, goals_neg, index, graph)
+        raise ValueError(f"Unknown extractor '{extractor}', expected one of {list(EXTRACTORS)}")
+
+def plan_key(plan):
+    """
+    canonical hashable form of a plan, the order of the actions inside a level is ignored
+    :param plan: list of action lists, one per level
+    """
+    return tuple(frozenset(actions) for actions in plan)
+
+
 class GraphPlanVis:
     def __init__(self):
         self.domprob = None
+        # (positive goals, negative goals) of the problem, parsed once
+        self.goals = None
         self.pddl = None
         self.negkb = FolKB([])
         self.graphplan = None
-        self.nx_graph = nx.DiGraph()
+        self.ground = None
+        self.cache = None
+        self.cache_key = None
+        self.instrumentation = None
+        # parallel.ParallelExpander the bitset engines expand with, None for serial expansion
+        self.parallel = None
+        self.renderer = CollectionRenderer()
+        # held while the planning graph is expanded, so another thread can draw it safely
+        self.graph_lock = threading.RLock()
+        # (first, last) nx levels to draw, (None, count) for the last count levels, None for all
+        self.level_window = None
+        self.show_noops = True
+        # draw only the nodes relevant to the goals, see relevance.relevant_nodes
+        self.relevant_only = False
+        self._reset_nx_graph()
         self.is_ready = False
 
     def visualize(self, ax=None, for_qt=True):
 
-        self.nx_graph = nx.DiGraph()
-        self._create_nx_graph()
-        self.draw_graph(len(self.graphplan.graph.levels), ax=ax)
+        self._update_nx_graph()
+        self.draw_graph(ax=ax)
         if for_qt:
             return ax
         else:
             plt.show()
 
-    def create_problem(self, domain_file_path, problem_file_path):
-
-        self.domprob = pddlpy.DomainProblem(domain_file_path, problem_file_path)
+    def create_problem(self, domain_file_path, problem_file_path, engine="aima", cache=None):
+        """
+        parse the pddl files and create the planning graph
+        :param domain_file_path: path to the domain pddl file
+        :param problem_file_path: path to the problem pddl file
+        :param engine: planning graph implementation, "aima", "bitset", "implicit" or "compact".
+                       The bitset engines are fed by the grounding compiler.
+        :param cache: optional cache.ProblemCache, the parsed and compiled problem is
+                      loaded from it when the same files were seen before
+        """
+        # the atoms of the previous problem are not shared with this one, nor kept alive
+        clear_terms()
+        payload = None
+        if cache is not None:
+            self.cache = cache
+            self.cache_key = problem_key(domain_file_path, problem_file_path, engine)
+            payload = cache.load(self.cache_key)
+
+        if payload is None:
+            self.create_problem_from_domprob(pddlpy.DomainProblem(domain_file_path, problem_file_path),
+                                             engine=engine)
+            if cache is not None:
+                self.save_to_cache(with_graph=False)
+            return
+
+        self.domprob = payload["domprob"]
+        self.goals = compile_goals(self.domprob)
+        self.pddl = PDDL(payload["init"], payload["actions"], make_goal_test(self.domprob))
+        self.ground = payload["ground"]
+        self.negkb = FolKB([])
+        self.graphplan = MyGraphPlan(self.pddl, self.negkb, engine=engine, ground=self.ground)
+        if payload["graph"] is not None:
+            payload["graph"].pddl = self.pddl
+            self.graphplan.graph = payload["graph"]
+        self._attach_instrumentation()
+        self._attach_parallel()
+        self._reset_nx_graph()
+        self.is_ready = True
 
+    def create_problem_from_domprob(self, domprob, engine="aima"):
+        """
+        create the planning graph of an already parsed problem
+        :param domprob: pddlpy DomainProblem
+        :param engine: planning graph implementation, a key of GRAPH_ENGINES
+        """
+        clear_terms()
+        self.domprob = domprob
+        self.goals = compile_goals(self.domprob)
         self.pddl = to_pddl_aima_obj(self.domprob)
         # self.pddl = three_block_tower()
+        grounded = issubclass(GRAPH_ENGINES.get(engine, IndexedGraph), BitGraph)
+        self.ground = ground_problem(self.domprob) if grounded else None
         self.negkb = FolKB([])
-        self.graphplan = MyGraphPlan(self.pddl, self.negkb)
-        self.nx_graph = nx.DiGraph()
+        self.graphplan = MyGraphPlan(self.pddl, self.negkb, engine=engine, ground=self.ground)
+        self._attach_instrumentation()
+        self._attach_parallel()
+        self._reset_nx_graph()
         self.is_ready = True
 
+    def enable_instrumentation(self, callbacks=()):
+        """
+        start recording per level statistics, see instrumentation.Instrumentation
+        :param callbacks: functions called with (event, LevelStats) on every record
+        :return: the Instrumentation object
+        """
+        self.instrumentation = Instrumentation(callbacks)
+        self._attach_instrumentation()
+        return self.instrumentation
+
+    def disable_instrumentation(self):
+        self.instrumentation = None
+        if self.graphplan is not None:
+            self.graphplan.instrumentation = None
+
+    def stats_report(self):
+        """
+        :return: the per level statistics, None if instrumentation is disabled
+        """
+        if self.instrumentation is None:
+            return None
+        return self.instrumentation.report()
+
+    def memory_report(self):
+        """
+        :return: list of the bytes held by every level of the planning graph, see
+                 compactlevel.level_bytes
+        """
+        with self.graph_lock:
+            return [level_bytes(level) for level in self.graphplan.graph.levels]
+
+    def _attach_instrumentation(self):
+        if self.graphplan is None or self.instrumentation is None:
+            return
+        self.instrumentation.reset()
+        self.graphplan.instrumentation = self.instrumentation
+        self.instrumentation.record_initial(self.graphplan.graph)
+
+    def enable_parallel(self, workers, min_actions=MIN_PARALLEL_ACTIONS):
+        """
+        expand the levels of the bitset engines over a process pool, the graph is the same
+        as the serial one. The aima engine is always expanded serially.
+        :param workers: number of worker processes
+        :param min_actions: smallest action layer, or ground action table, split over the workers
+        :return: the parallel.ParallelExpander
+        """
+        if ParallelExpander is None:
+            raise ValueError("parallel expansion needs numpy")
+        self.disable_parallel()
+        self.parallel = ParallelExpander(workers, min_actions)
+        self._attach_parallel()
+        return self.parallel
+
+    def disable_parallel(self):
+        if self.parallel is None:
+            return
+        self.parallel.close()
+        self.parallel = None
+        if self.graphplan is not None and isinstance(self.graphplan.graph, BitGraph):
+            self.graphplan.graph.parallel = None
+
+    def _attach_parallel(self):
+        if self.graphplan is None or not isinstance(self.graphplan.graph, BitGraph):
+            return
+        self.graphplan.graph.parallel = self.parallel
+
+    def save_to_cache(self, with_graph=True):
+        """
+        store the compiled problem in the cache given to create_problem
+        :param with_graph: also store the expanded levels, only the bitset engine supports it
+        """
+        if self.cache is None:
+            raise ValueError("create_problem was called without a cache")
+        graph = self.graphplan.graph if with_graph and isinstance(self.graphplan.graph, BitGraph) else None
+        self.cache.store(self.cache_key, {"domprob": self.domprob,
+                                          "init": self.pddl.kb.clauses,
+                                          "actions": self.pddl.actions,
+                                          "ground": self.ground,
+                                          "graph": graph})
 
     def expand_level(self):
-        self.graphplan.graph.expand_graph()
+        with self.graph_lock:
+            self.graphplan.expand_graph()
 
-    def solve(self, with_expanding=True):
+    def export(self, path, fmt=None, include_mutexes=False, include_noops=True):
+        """
+        write the planning graph to a file without drawing it, see export.export_graph
+        """
+        with self.graph_lock:
+            export_graph(self.graphplan.graph, path, fmt, include_mutexes, include_noops)
 
-        # TODO address this
-        # [expr('On(A, B)'), expr('On(B, C)')]
-        goals_pos = [parse_pddl2expr(i) for i in list(self.domprob.goals())]
-        goals_neg = []
+    def solve(self, with_expanding=True, extractor="product", budget=None, portfolio=None):
+        """
+        expand the graph until a solution is extracted, the graph levels off or the budget runs out
+        :param with_expanding: if False only try to extract from the current graph
+        :param extractor: solution extraction routine, one of EXTRACTORS
+        :param budget: budget.Budget limiting the run, None for no limits
+        :param portfolio: sequence of portfolio.ExtractionConfig raced in forked processes at
+                          every level instead of running the extractor, see portfolio.race
+        :return: budget.SolveResult, its solution is the list of level ordered solutions,
+                 empty if none was found. Its winner is the name of the configuration that
+                 found the solution of a portfolio.
+        """
 
-        while True:
-            self.graphplan.solution = []
-            if (self.pddl.goal_test_func(self.graphplan.graph.levels[-1].poskb)and
-                    self.graphplan.graph.non_mutex_goals(goals_pos + goals_neg, -1)):
-                solution = self.graphplan.extract_solution(goals_pos, goals_neg, -1)
-                if solution:
+        goals_pos, goals_neg = self._goals()
+        if budget is None:
+            budget = Budget()
+        budget.start()
+        self.graphplan.budget = budget
+        status = "no_solution"
+        solution = []
+        winner = None
+
+        try:
+            while True:
+                self.graphplan.solution = []
+                if self.graphplan.goals_reachable(goals_pos, goals_neg, -1):
+                    if portfolio is None:
+                        solution = self.graphplan.extract(goals_pos, goals_neg, -1, extractor)
+                    else:
+                        solution, winner = race(self.graphplan, goals_pos, goals_neg, portfolio)
+                    if solution:
+                        status = "solved"
+                        break
+                    solution = []
+
+                if not with_expanding:
+                    break
+
+                # a level is expanded whole or not at all, so the graph stays drawable
+                budget.check_expansion(len(self.graphplan.graph.levels))
+                self.expand_level()
+                if len(self.graphplan.graph.levels) >= 2 and self.graphplan.check_leveloff():
                     break
+        except BudgetExceeded as e:
+            status = e.limit
+            solution = []
+            self.graphplan.solution = []
+        finally:
+            self.graphplan.budget = None
+
+        return SolveResult(status, solution, len(self.graphplan.graph.levels), budget.nodes,
+                           budget.elapsed(), budget.peak_memory, None if winner is None else winner.name)
+
+    def iter_solutions(self, with_expanding=True, max_plans=None):
+        """
+        expand the graph like solve, but yield the plans of the first level that has
+        any, one at a time as soon as each is found
+        :param with_expanding: if False only try to extract from the current graph
+        :param max_plans: stop after this many plans, None for all of them
+        :return: generator of plans, each a list of action lists from the first level
+        """
+        goals_pos, goals_neg = self._goals()
 
+        while True:
+            if self.graphplan.goals_reachable(goals_pos, goals_neg, -1):
+                found = False
+                for plan in self.graphplan.iter_solutions(goals_pos, goals_neg, -1, max_plans):
+                    found = True
+                    yield plan
+                if found:
+                    return
 
             if not with_expanding:
-                return []
+                return
 
-            self.graphplan.graph.expand_graph()
+            self.expand_level()
             if len(self.graphplan.graph.levels) >= 2 and self.graphplan.check_leveloff():
-                solution = []
-                break
-
+                return
 
-        return solution
+    def _goals(self):
+        """
+        :return: (positive goals, negative goals) as lists, compiled once per problem
+        """
+        goals_pos, goals_neg = self.goals
+        return list(goals_pos), list(goals_neg)
 
     def _create_nx_graph(self):
         """
@@ -174,11 +658,39 @@ class GraphPlanVis:
         :param graphplan: an aima3 graphplan object
         :return: networkx graph
         """
+        self._reset_nx_graph()
+        self._update_nx_graph()
+
+    def _reset_nx_graph(self):
         self.nx_graph = nx.DiGraph()
+        # number of planning graph levels already added to nx_graph
+        self._nx_levels = 0
+        # nodes of every nx level in insertion order, {"action": [...], "state": [...]}
+        self._level_nodes = []
+        # level index -> (node counts, positions) of the cached layout
+        self._level_layout = {}
+        # level index -> drawing of the levels in the level window, see _level_drawing
+        self._level_drawings = {}
+        self.pos = {}
+        # level index -> mutex partners, see mutex_index
+        self._mutex_index = {}
+        # positions of the drawn nodes for hit testing, kept in sync with self.pos
+        self.node_index = GridIndex()
+        # (number of levels, node ids) of the goal relevant nodes
+        self._relevant = None
+
+    def _update_nx_graph(self):
+        """
+        add to the networkx graph only the levels that were expanded since the last call
+        """
         levels = self.graphplan.graph.levels
-
-        for i in range(len(levels)):
+        # the previous last level had no action layer when it was added, add it again
+        for i in range(max(self._nx_levels - 1, 0), len(levels)):
             self._add_level_to_nx_graph(levels[i], i + 1)
+        if self.relevant_only and self._nx_levels != len(levels):
+            # the goals moved to the new last level, what is relevant changed everywhere
+            self._drop_drawings()
+        self._nx_levels = len(levels)
 
     def _add_level_to_nx_graph(self, level, level_num):
         """
@@ -188,53 +700,14 @@ class GraphPlanVis:
         :param nx_graph:
         :return:
         """
-        # add current state nodes if they dont exist
-        if level_num == 1:
-            for state in level.current_state_pos:
-                self._add_node("pos_state", state, 0)
-            for state in level.current_state_neg:
-                self._add_node("neg_state", state, 0)
-
-        # add action nodes
-        for action, links in level.current_action_links_pos.items():
-            self._create_nx_graph_links(action, "action", links, "pos_state", level_num)
-
-        for action, links in level.current_action_links_neg.items():
-            self._create_nx_graph_links(action, "action", links, "neg_state", level_num)
-
-        # add next state nodes
-        for state, links in level.current_state_links_pos.items():
-            self._create_nx_graph_links(state, "pos_state", links, "action", level_num)
-        for state, links in level.current_state_links_neg.items():
-            self._create_nx_graph_links(state, "neg_state", links, "action", level_num)
-
-        # add next state nodes
-        for state, links in level.next_state_links_pos.items():
-            self._create_nx_graph_links(state, "pos_state", links, "action", level_num)
-        for state, links in level.next_state_links_neg.items():
-            self._create_nx_graph_links(state, "neg_state", links, "action", level_num)
-
-    def _create_nx_graph_links(self, node_name, node_type, links, links_type, level_num, **kwargs):
-        """
-        Helper function to create the nx graph. Is used for transforming
-        level.()_links_() to the nx_graph
-        :param node_name: name of the method for the node
-        :param node_type: type of the node ("action", "pos_state", "neg_state")
-        :param links: an array of links from the function
-        :param links_type: their type
-        :param level_num: the index of the level currently working on
-        :param kwargs: ?
-        """
-        action_node_name = self._add_node(node_type, node_name, level_num)
-        if node_type == "action":
-            level_num -= 1
-
-        for link in links:
-            link_node_name = self._create_node_name(links_type, link, level_num)
-            # TODO check why there is here non created nodes
-            if link_node_name not in self.nx_graph.nodes:
-                self._add_node(links_type, link, level_num)
-            self._add_edge(link_node_name, action_node_name, level_num)
+        for element in level_elements(level, level_num):
+            if element[0] == "node":
+                _, node_type, name, node_level = element
+                if node_id(node_type, name, node_level) not in self.nx_graph:
+                    self._add_node(node_type, name, node_level)
+            else:
+                _, source, target = element
+                self._add_edge(node_id(*source), node_id(*target), level_num)
 
     def _add_node(self, node_type, state_name, level_num, **kwargs):
         """
@@ -245,6 +718,10 @@ class GraphPlanVis:
         """
         node_name = self._create_node_name(node_type, state_name, level_num)
         name_change = str(state_name).replace("Persistence","P")
+        if node_name not in self.nx_graph:
+            while len(self._level_nodes) <= level_num:
+                self._level_nodes.append({"action": [], "state": []})
+            self._level_nodes[level_num]["action" if node_type == "action" else "state"].append(node_name)
 
         self.nx_graph.add_node(node_name, name=state_name, node_type=node_type,
                           level_num=level_num,display_name=name_change)
@@ -254,55 +731,168 @@ class GraphPlanVis:
         self.nx_graph.add_edge(node1, node2)
 
     def _create_node_name(self, node_type, name, level_num):
-        name_change = str(name).replace("Persistence","P")
-        return f"{level_num}_{name_change}_{node_type}"
-
-    def draw_graph(self, max_level, ax=None):
-
-        nodes_to_draw = [node for node in self.nx_graph.nodes if self.is_to_draw(node)]
-        edges_to_draw = [edge for edge in self.nx_graph.edges if edge[0] in nodes_to_draw and edge[1] in nodes_to_draw]
-        labels_to_draw = {node: self.nx_graph.nodes[node]["display_name"] for node in self.nx_graph.nodes if node in nodes_to_draw}
-        # iterate over nodes
-        nodes_array = []
-        for node in self.nx_graph.nodes:
-            node_level = self.nx_graph.nodes[node]["level_num"]
-
-            # add new level when discovered
-            if len(nodes_array) <= node_level:
-                nodes_array.append({"action": [], "state": []})
-
-            # if node is to draw append it to the array
-            if node in nodes_to_draw:
-                if self.nx_graph.nodes[node]["node_type"] == "action":
-                    nodes_array[node_level]["action"].append(node)
-                else:
-                    nodes_array[node_level]["state"].append(node)
+        return node_id(node_type, name, level_num)
 
-        pos = self.graphplan_layout(nodes_array, max_level)
-        self.pos = pos
-        # nx.draw_networkx_nodes(self.nx_graph, pos, nodes_to_draw)
-        self._draw_nx_nodes(nodes_array,pos, ax=ax)
-        nx.draw_networkx_edges(self.nx_graph, pos, edges_to_draw, ax=ax)
-        nx.draw_networkx_labels(self.nx_graph, pos, labels=labels_to_draw,ax=ax)
-        # nx.draw(self.nx_graph, pos, node_size=300, node_color='#ffaaaa', with_labels=True)
-        # plt.show()
+    def draw_graph(self, ax=None):
+        """
+        draw the levels of the level window, see visible_levels
+        """
+        first, last = self.visible_levels()
+        drawings = {level_num: self._level_drawing(level_num) for level_num in range(first, last + 1)}
+        # free the levels that left the window
+        for level_num in list(self._level_drawings):
+            if level_num not in drawings:
+                del self._level_drawings[level_num]
+
+        nodes_by_type = {"pos_state": [], "neg_state": [], "action": []}
+        edges_to_draw = []
+        labels_to_draw = {}
+        for drawing in drawings.values():
+            for node_type, nodes in drawing["nodes_by_type"].items():
+                nodes_by_type[node_type].extend(nodes)
+            edges_to_draw.extend((source, target) for source, target, source_level in drawing["edges"]
+                                 if source_level >= first)
+            labels_to_draw.update(drawing["labels"])
+
+        pos = self._cached_layout({level_num: drawing["layout_nodes"] for level_num, drawing in drawings.items()})
+        self.renderer.draw(ax, pos, nodes_by_type, edges_to_draw, labels_to_draw)
+
+    def _level_drawing(self, level_num):
+        """
+        nodes, incoming edges and labels to draw for one nx level, built when the level
+        comes into the level window and kept while it stays there
+        :return: dictionary with "layout_nodes" in the form of a graphplan_layout level,
+                 "nodes_by_type", "edges" as (source, target, source level) and "labels"
+        """
+        level_nodes = self._level_nodes[level_num]
+        nx_nodes = self.nx_graph.nodes
+        key = (len(level_nodes["action"]), len(level_nodes["state"]),
+               sum(self.nx_graph.in_degree(node) for nodes in level_nodes.values() for node in nodes))
+        drawing = self._level_drawings.get(level_num)
+        if drawing is not None and drawing["key"] == key:
+            return drawing
+
+        layout_nodes = {node_type: [node for node in nodes if self.is_to_draw(node)]
+                        for node_type, nodes in level_nodes.items()}
+        nodes_by_type = {"pos_state": [], "neg_state": [], "action": []}
+        edges = []
+        labels = {}
+        for nodes in layout_nodes.values():
+            for node in nodes:
+                nodes_by_type[nx_nodes[node]["node_type"]].append(node)
+                labels[node] = nx_nodes[node]["display_name"]
+                edges.extend((source, node, nx_nodes[source]["level_num"])
+                             for source in self.nx_graph.predecessors(node)
+                             if self.is_to_draw(source))
+
+        drawing = {"key": key, "layout_nodes": layout_nodes, "nodes_by_type": nodes_by_type,
+                   "edges": edges, "labels": labels}
+        self._level_drawings[level_num] = drawing
+        return drawing
+
+    def visible_levels(self):
+        """
+        :return: (first, last) nx levels of the level window, clamped to the graph
+        """
+        last_level = len(self._level_nodes) - 1
+        if self.level_window is None:
+            return 0, last_level
+        first, last = self.level_window
+        if first is None:
+            # the last levels, following the expansion
+            first, last = last_level - last + 1, last_level
+        return max(first, 0), min(last, last_level)
+
+    def set_level_window(self, first=None, last=None):
+        """
+        draw only the nx levels from first to last, both included, None for all the levels
+        """
+        if first is None and last is None:
+            self.level_window = None
+            return
+        self.level_window = (first or 0, math.inf if last is None else last)
+
+    def show_last_levels(self, count):
+        """
+        draw only the last count levels, the window moves along when the graph is expanded
+        """
+        self.level_window = (None, count)
+
+    def show_levels_around(self, node, radius=1):
+        """
+        draw only the levels within radius of the level of a node
+        """
+        level_num = self.nx_graph.nodes[node]["level_num"]
+        self.level_window = (level_num - radius, level_num + radius)
+
+    def scroll_levels(self, delta):
+        """
+        move the level window by delta levels, keeping its size
+        """
+        first, last = self.visible_levels()
+        last_level = len(self._level_nodes) - 1
+        delta = max(-first, min(delta, last_level - last))
+        self.level_window = (first + delta, last + delta)
 
     def draw_graph_mutexes(self, ax, nx_nodes=None):
+        """
+        draw the mutexes between the given nodes as dashed red lines
+        :param nx_nodes: drawn nodes of nx_graph, all the drawn action nodes if not given
+        :return: list of the mutex node pairs
+        """
         if not nx_nodes:
-            nx_nodes = [node for node in self.nx_graph.nodes.keys()
+            nx_nodes = [node for node in self.pos
                         if self.nx_graph.nodes[node]["node_type"]=="action"]
 
-        nodes_pairs = list(itertools.combinations(nx_nodes, 2))
+        # only the mutexes of each level are looked at, not every pair of nodes
+        nodes_by_level = {}
+        for node in nx_nodes:
+            node_data = self.nx_graph.nodes[node]
+            nodes_by_level.setdefault(node_data["level_num"], {})[node_data["name"]] = node
 
         mutex_pairs = []
-        for nodes_pair in nodes_pairs:
-            if self.is_nx_graph_mutex(nodes_pair[0], nodes_pair[1]):
-                mutex_pairs.append(nodes_pair)
-
-        nx.draw_networkx_edges(self.nx_graph, self.pos, mutex_pairs, ax=ax,
-                               style="dashed", edge_color="red")
+        for level_num, nodes_by_name in nodes_by_level.items():
+            mutex_index = self.mutex_index(level_num - 1)
+            done = set()
+            for name, node in nodes_by_name.items():
+                for other in mutex_index.get(name, ()):
+                    other_node = nodes_by_name.get(other)
+                    if other_node is not None and other_node not in done:
+                        mutex_pairs.append((node, other_node))
+                done.add(node)
+
+        self.renderer.draw_mutexes(ax, self.pos, mutex_pairs)
         return mutex_pairs
 
+    def mutex_index(self, level_index):
+        """
+        :param level_index: index of the level in the planning graph
+        :return: dictionary from each action or fact of the level to the set of its mutex partners
+        """
+        graph = self.graphplan.graph
+        levels = graph.levels
+        if not -len(levels) <= level_index < len(levels):
+            return {}
+        if hasattr(graph, "mutex_index"):
+            return graph.mutex_index(level_index)[0]
+
+        mutex_index = self._mutex_index.get(level_index)
+        if mutex_index is not None:
+            return mutex_index
+
+        # bitset levels test pairs without an index but can't list a node's partners
+        mutex_index = {}
+        for mutex in levels[level_index].mutex:
+            if len(mutex) != 2:
+                continue
+            first, second = mutex
+            mutex_index.setdefault(first, set()).add(second)
+            mutex_index.setdefault(second, set()).add(first)
+        # the mutexes of the last level are only found when it is expanded
+        if 0 <= level_index < len(levels) - 1:
+            self._mutex_index[level_index] = mutex_index
+        return mutex_index
+
     def is_nx_graph_mutex(self,node1, node2):
 
         node_1_data = self.nx_graph.nodes[node1]
@@ -311,33 +901,82 @@ class GraphPlanVis:
         if node_1_data["level_num"] != node_2_data["level_num"]:
             return False
 
-        current_level = self.graphplan.graph.levels[node_1_data["level_num"]-1]
+        mutex_index = self.mutex_index(node_1_data["level_num"] - 1)
+        return node_2_data["name"] in mutex_index.get(node_1_data["name"], ())
 
-        for mut in current_level.mutex:
-            if len(mut) != 2:
+    def _cached_layout(self, nodes_by_level):
+        """
+        position the nodes level by level, a level keeps its positions as long as its nodes
+        don't change, the positions of levels that aren't given are dropped
+        :param nodes_by_level: level index -> level nodes, in the form of a graphplan_layout level
+        :return: position dictionary of the given levels' nodes
+        """
+        for level_index in list(self._level_layout):
+            if level_index not in nodes_by_level:
+                self._drop_layout(level_index)
+
+        for level_index, level_nodes in nodes_by_level.items():
+            key = (len(level_nodes["action"]), len(level_nodes["state"]))
+            cached = self._level_layout.get(level_index)
+            if cached is not None and cached[0] == key:
                 continue
-            mut = list(mut)
-
-            if ((node_1_data["name"] == mut[0] and node_2_data["name"] == mut[1]) or
-                (node_1_data["name"] == mut[1] and node_2_data["name"] == mut[0])):
-                return True
-
-        return False
-
-
-    def _draw_nx_nodes(self, nodes_array, pos, ax=None):
-        for node_array in nodes_array:
+            if cached is not None:
+                self._drop_layout(level_index)
+            positions = self.level_layout(level_index, level_nodes)
+            self._level_layout[level_index] = (key, positions)
+            self.pos.update(positions)
+            for node, (x, y) in positions.items():
+                self.node_index.insert(node, x, y)
+        return self.pos
+
+    def _drop_layout(self, level_index):
+        _, positions = self._level_layout.pop(level_index)
+        for node in positions:
+            self.pos.pop(node, None)
+            self.node_index.remove(node)
+
+    def nearest_node(self, x, y, x_scale=1.0, y_scale=1.0, max_distance=None):
+        """
+        :param x, y: point in data coordinates
+        :param x_scale, y_scale: data units per distance unit, e.g. per pixel of the current zoom
+        :param max_distance: in scaled units, None for no limit
+        :return: the nearest drawn node, None if there is none
+        """
+        return self.node_index.nearest(x, y, x_scale, y_scale, max_distance)[0]
 
-            pos_state_nodes = [node for node in node_array["state"]
-                               if self.nx_graph.nodes[node]["node_type"] == "pos_state"]
-            neg_state_nodes = [node for node in node_array["state"]
-                               if self.nx_graph.nodes[node]["node_type"] == "neg_state"]
+    def nodes_within(self, x, y, radius, x_scale=1.0, y_scale=1.0):
+        """
+        :return: the drawn nodes within radius of the point, nearest first
+        """
+        return self.node_index.within(x, y, radius, x_scale, y_scale)
 
-            nx.draw_networkx_nodes(self.nx_graph, pos, pos_state_nodes,node_color="green",ax=ax)
-            nx.draw_networkx_nodes(self.nx_graph, pos, neg_state_nodes, node_color="red",ax=ax)
+    def describe_node(self, node):
+        """
+        :return: printable name, level and mutex partners of a node of nx_graph
+        """
+        node_data = self.nx_graph.nodes[node]
+        partners = sorted(str(partner) for partner in
+                          self.mutex_index(node_data["level_num"] - 1).get(node_data["name"], ()))
+        description = f"{node_data['name']}\nlevel {node_data['level_num']}, {node_data['node_type']}"
+        if partners:
+            description += "\nmutex with:\n  " + "\n  ".join(partners)
+        return description
 
-            # draw action nodes
-            nx.draw_networkx_nodes(self.nx_graph, pos, node_array["action"],node_shape="s",ax=ax)
+    @staticmethod
+    def level_layout(level_index, level_nodes):
+        """
+        graphplan positions of the nodes of one level, x is the level index and the
+        actions sit half way between their level and the previous one
+        :param level_index: index of the level
+        :param level_nodes: dictionary of the form {"action": [...], "state": [...]}
+        :return: position dictionary of the level's nodes
+        """
+        pos = {}
+        for node_type, nodes in level_nodes.items():
+            x = level_index - 0.5 if node_type == "action" else level_index
+            for node_index, node in enumerate(nodes):
+                pos[node] = (x, node_index / len(nodes))
+        return pos
 
     @staticmethod
     def graphplan_layout(nodes_array, max_level):
@@ -356,28 +995,37 @@ class GraphPlanVis:
         pos = {}
         # create positions
         for level_index in range(len(nodes_array)):
-            for node_type, nodes in nodes_array[level_index].items():
-                for node_index in range(len(nodes)):
-                    node = nodes[node_index]
-
-                    if node_type == "action":
-                        pos[node] = ((level_index-0.5)/max_level, node_index/len(nodes_array[level_index][node_type]))
-                    else:
-                        pos[node] = ((level_index)/max_level, node_index/len(nodes_array[level_index][node_type]))
+            for node, (x, y) in GraphPlanVis.level_layout(level_index, nodes_array[level_index]).items():
+                pos[node] = (x / max_level, y)
 
         return pos
 
     @staticmethod
     def format_solution(solution_array):
+        """
+        :param solution_array: budget.SolveResult of solve, or its list of level ordered solutions
+        :return: printable string of the first solution
+        """
+        if isinstance(solution_array, SolveResult):
+            solution_array = solution_array.solution
         if not solution_array:
             return "No solution found!"
+        return GraphPlanVis.format_plan(solution_array[0])
+
+    @staticmethod
+    def format_plan(plan):
+        """
+        :param plan: a single plan, list of action lists from the first level
+        :return: printable string of the plan
+        """
+        if plan is None:
+            return "No solution found!"
         solution_string = "Solution found and is of the following:\n"
         level = 1
-        solution_array = solution_array[0]
-        for solution_level in solution_array:
+        for solution_level in plan:
             solution_string += f"{level}:"
             for action in solution_level:
-                if "P-" in str(action):
+                if is_noop(action):
                     continue
 
                 solution_string += str(action)
@@ -392,84 +1040,51 @@ class GraphPlanVis:
     def is_to_draw(self, node):
         """
         determines if to draw a node or not
-        :param node:
+        :param node: node of nx_graph
         :return:
         """
-        # if "Persistence" in node:
-        #     return False
-        return True
-
-# ------parser-----------------------------------------------------------------------------------
-def to_pddl_aima_obj(domprob):
-    """
-    create a PDDL object to insert to the GraphPlan object.
-    :param domprob:  pddlpy object outputted from DomainProblem
-    :return: PDDL object
-    """
-    # Creat init of plan
-    inits = []
-    for init in list(domprob.initialstate()):
-        inits.append(parse_pddl2expr(init))
-
-    def goal_test(kb):
-        required = [expr(i) for i in list(domprob.goals())]
-        # required = [expr('on(a, b)'), expr('on(b, c)')]
-        return all([parse_pddl2expr(q) in kb.clauses for q in required])
-
-    return PDDL(inits, parse_pddl2actions(domprob), goal_test)
-    # Create the actions
-
-def parse_pddl2actions(domprob):
-    """
-    from pddlpy object return a list of Action classes from aima3
-    :param domprob:
-    :return:
-    """
-    action_list = []
-    for operator_name, operator in domprob.domain.operators.items():
-
-        precond_pos = [parse_pddl2expr(i) for i in operator.precondition_pos]
-        precond_neg = [parse_pddl2expr(i) for i in operator.precondition_neg]
-        effect_add = [parse_pddl2expr(i) for i in operator.effect_pos]
-        effect_rem = [parse_pddl2expr(i) for i in operator.effect_neg]
-        action_list.append(Action(parse_action_name(operator),
-                                  [precond_pos, precond_neg],
-                                  [effect_add, effect_rem]))
-
-    return action_list
-
-
-def parse_pddl2expr(pddl_atom):
-    """
-
-    :param pddl_tuple: given a tuple of the form ("name", "value","value2)
-                       will return aima3 expr() of the tuple
-    :return:
-    """
-    pddl_list = list(eval(string_handler(pddl_atom)))
-    expresion = str(pddl_list.pop(0))
-    expresion += parse_list(pddl_list)
-    return expr(expresion)
-
-def parse_action_name(operator):
-
-
-    expresion = string_handler(operator.operator_name)
-    expresion += parse_list(list(operator.variable_list.keys()))
-    return expr(expresion)
+        if self.relevant_only and node not in self.relevant_node_ids():
+            return False
+        return self.show_noops or not is_noop(self.nx_graph.nodes[node]["name"])
 
-def parse_list(value_list):
-    expresion = "("
-    for word in value_list:
-        expresion += string_handler(word)
-        expresion += ", " if word != value_list[-1] else ""
+    def set_show_noops(self, show):
+        """
+        draw the no-op actions or hide them, their nodes stay in nx_graph
+        """
+        if show == self.show_noops:
+            return
+        self.show_noops = show
+        self._drop_drawings()
 
-    expresion += ")"
-    return expresion
+    def set_relevant_only(self, relevant_only):
+        """
+        draw only the nodes relevant to the goals at the last level or every node,
+        the others stay in nx_graph
+        """
+        if relevant_only == self.relevant_only:
+            return
+        self.relevant_only = relevant_only
+        self._drop_drawings()
 
-def string_handler(string_type_object):
-    string_type_object = str(string_type_object)
-    string_type_object = string_type_object.replace("-", "")
-    string_type_object = string_type_object.replace("?", "")
-    string_type_object = string_type_object.lower()
-    return string_type_object
+    def relevant_node_ids(self):
+        """
+        :return: set of the nx_graph nodes relevant to the goals at the last level
+        """
+        levels = self.graphplan.graph.levels
+        if self._relevant is None or self._relevant[0] != len(levels):
+            goals_pos, goals_neg = self.goals
+            node_ids = set()
+            for index, (facts_pos, facts_neg, actions) in enumerate(
+                    relevant_nodes(self.graphplan.graph, goals_pos, goals_neg)):
+                node_ids.update(node_id("pos_state", fact, index) for fact in facts_pos)
+                node_ids.update(node_id("neg_state", fact, index) for fact in facts_neg)
+                # the actions of a level are drawn in the next nx level
+                node_ids.update(node_id("action", action, index + 1) for action in actions)
+            self._relevant = (len(levels), node_ids)
+        return self._relevant[1]
+
+    def _drop_drawings(self):
+        # the drawn nodes of every level change
+        self._level_drawings = {}
+        for level_index in list(self._level_layout):
+            self._drop_layout(level_index)
@@ -0,0 +1,314 @@
+"""
+Export a planning graph to a file without matplotlib or networkx.
+Levels are streamed straight from graphplan.graph.levels, at most two levels are held
+in memory at a time, so the memory use does not grow with the depth of the graph.
+usage: python export.py domain.pddl problem.pddl out.{json,jsonl,graphml,svg}
+                        [--levels N] [--engine bitset] [--mutexes] [--no-noops]
+"""
+import argparse
+import json
+from xml.sax.saxutils import escape, quoteattr
+
+from instrumentation import level_counts
+
+FORMATS = ("json", "jsonl", "graphml", "svg")
+FORMAT_VERSION = 1
+
+# svg geometry, in pixels
+SVG_LEVEL_SPACING = 240
+SVG_NODE_SPACING = 22
+SVG_MARGIN = 40
+SVG_COLORS = {"pos_state": "green", "neg_state": "red", "action": "#1f78b4"}
+
+
+def node_id(node_type, name, level_num):
+    """
+    :return: the name of the node in GraphPlanVis.nx_graph
+    """
+    name_change = str(name).replace("Persistence", "P")
+    return f"{level_num}_{name_change}_{node_type}"
+
+
+def is_noop(name):
+    return getattr(name, "op", None) == "Persistence"
+
+
+def level_elements(level, level_num):
+    """
+    the nodes and edges a planning graph level adds to the visualization, the same ones
+    GraphPlanVis._add_level_to_nx_graph adds to nx_graph
+    :param level: aima3 Level or bitgraph.BitLevel
+    :param level_num: index of the level plus one, the nx level of its actions
+    :return: generator of ("node", node_type, name, level_num) and
+             ("edge", source node, target node) where a node is (node_type, name, level_num),
+             a node may be yielded more than once
+    """
+    if level_num == 1:
+        for state in level.current_state_pos:
+            yield "node", "pos_state", state, 0
+        for state in level.current_state_neg:
+            yield "node", "neg_state", state, 0
+
+    links_of = (
+        (level.current_action_links_pos, "action", "pos_state"),
+        (level.current_action_links_neg, "action", "neg_state"),
+        (level.current_state_links_pos, "pos_state", "action"),
+        (level.current_state_links_neg, "neg_state", "action"),
+        (level.next_state_links_pos, "pos_state", "action"),
+        (level.next_state_links_neg, "neg_state", "action"),
+    )
+    for links_dict, node_type, links_type in links_of:
+        for name, links in links_dict.items():
+            node = (node_type, name, level_num)
+            yield ("node",) + node
+            # the preconditions of an action are in the previous level
+            links_level = level_num - 1 if node_type == "action" else level_num
+            for link in links:
+                link_node = (links_type, link, links_level)
+                yield ("node",) + link_node
+                yield "edge", link_node, node
+
+
+class LevelStream:
+    """
+    Turns planning graph levels into complete visualization levels one at a time.
+    A visualization level can still gain nodes while the next planning graph level is
+    read, so it is only handed out after that, and then forgotten.
+    """
+
+    def __init__(self, graph, include_mutexes=False, include_noops=True):
+        self.graph = graph
+        self.include_mutexes = include_mutexes
+        self.include_noops = include_noops
+
+    def _keep(self, name):
+        return self.include_noops or not is_noop(name)
+
+    def __iter__(self):
+        """
+        :return: generator of dictionaries with "level", "action" and "state" lists of
+                 (node id, node_type, display name) in insertion order, "edges" ending in the level
+                 as (source id, target id) and "mutexes" as (node id, node id)
+        """
+        pending = {}
+        # str of an Expr is recursive and slow, cached for the level being read
+        names = {}
+
+        def ident(node_type, name, level_num):
+            label = names.get(name)
+            if label is None:
+                label = names[name] = str(name).replace("Persistence", "P")
+            return f"{level_num}_{label}_{node_type}"
+
+        def pending_level(level_num):
+            if level_num not in pending:
+                pending[level_num] = {"level": level_num, "action": [], "state": [], "edges": [],
+                                      "mutexes": [], "ids": set(), "edge_ids": set(), "by_name": {}}
+            return pending[level_num]
+
+        def finish(level_num):
+            done = pending.pop(level_num)
+            if self.include_mutexes and level_num > 0:
+                done["mutexes"] = self._mutexes(self.graph.levels[level_num - 1], done["by_name"])
+            del done["ids"], done["edge_ids"], done["by_name"]
+            return done
+
+        levels = self.graph.levels
+        for index, level in enumerate(levels):
+            level_num = index + 1
+            names.clear()
+            # decoding a bitgraph.BitLevel caches aima3 style views, don't keep the ones decoded here
+            release = not getattr(level, "views_decoded", True)
+            for element in level_elements(level, level_num):
+                if element[0] == "node":
+                    _, node_type, name, num = element
+                    if not self._keep(name):
+                        continue
+                    current = pending_level(num)
+                    nid = ident(node_type, name, num)
+                    if nid in current["ids"]:
+                        continue
+                    current["ids"].add(nid)
+                    current["by_name"].setdefault(name, []).append(nid)
+                    current["action" if node_type == "action" else "state"].append((nid, node_type, names[name]))
+                else:
+                    _, source, target = element
+                    if not (self._keep(source[1]) and self._keep(target[1])):
+                        continue
+                    current = pending_level(target[2])
+                    edge = (ident(*source), ident(*target))
+                    if edge not in current["edge_ids"]:
+                        current["edge_ids"].add(edge)
+                        current["edges"].append(edge)
+
+            if release:
+                level.release_views()
+
+            # the next levels only add nodes from level_num on
+            for num in sorted(pending):
+                if num < level_num:
+                    yield finish(num)
+        for num in sorted(pending):
+            yield finish(num)
+
+    @staticmethod
+    def _mutexes(level, by_name):
+        mutexes = []
+        for mutex in level.mutex:
+            if len(mutex) != 2:
+                continue
+            first, second = mutex
+            for first_id in by_name.get(first, ()):
+                for second_id in by_name.get(second, ()):
+                    # an action and a state can share a name, only pair nodes of a kind
+                    if first_id.endswith("_action") == second_id.endswith("_action"):
+                        mutexes.append((first_id, second_id))
+        return mutexes
+
+
+def level_layout(level_num, level):
+    """
+    :return: dictionary from node id to its position, same as GraphPlanVis.level_layout
+    """
+    pos = {}
+    for node_type in ("action", "state"):
+        nodes = level[node_type]
+        x = level_num - 0.5 if node_type == "action" else level_num
+        for node_index, (nid, _, _) in enumerate(nodes):
+            pos[nid] = (x, node_index / len(nodes))
+    return pos
+
+
+def _nodes(level):
+    return level["action"] + level["state"]
+
+
+def write_jsonl(stream, f):
+    f.write(json.dumps({"format": "graphplan-jsonl", "version": FORMAT_VERSION}) + "\n")
+    for level in stream:
+        f.write(json.dumps(_level_record(level)) + "\n")
+
+
+def write_json(stream, f):
+    f.write(f'{{"format":"graphplan-json","version":{FORMAT_VERSION},"levels":[')
+    for i, level in enumerate(stream):
+        if i:
+            f.write(",")
+        f.write(json.dumps(_level_record(level), separators=(",", ":")))
+    f.write("]}\n")
+
+
+def _level_record(level):
+    return {"level": level["level"],
+            "nodes": [{"id": nid, "type": node_type, "name": label} for nid, node_type, label in _nodes(level)],
+            "edges": level["edges"],
+            "mutexes": level["mutexes"]}
+
+
+def write_graphml(stream, f):
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+            '<key id="type" for="node" attr.name="node_type" attr.type="string"/>\n'
+            '<key id="name" for="node" attr.name="display_name" attr.type="string"/>\n'
+            '<key id="level" for="node" attr.name="level_num" attr.type="int"/>\n'
+            '<key id="kind" for="edge" attr.name="kind" attr.type="string"/>\n'
+            '<graph id="graphplan" edgedefault="directed">\n')
+    for level in stream:
+        for nid, node_type, label in _nodes(level):
+            f.write(f'<node id={quoteattr(nid)}><data key="type">{node_type}</data>'
+                    f'<data key="name">{escape(label)}</data>'
+                    f'<data key="level">{level["level"]}</data></node>\n')
+        for source, target in level["edges"]:
+            f.write(f'<edge source={quoteattr(source)} target={quoteattr(target)}>'
+                    f'<data key="kind">link</data></edge>\n')
+        for first, second in level["mutexes"]:
+            f.write(f'<edge source={quoteattr(first)} target={quoteattr(second)}>'
+                    f'<data key="kind">mutex</data></edge>\n')
+    f.write('</graph>\n</graphml>\n')
+
+
+def write_svg(stream, f):
+    graph = stream.graph
+    # the tallest level decides the height, counted without building any level
+    tallest = 1
+    for level in graph.levels:
+        facts, actions, _ = level_counts(level)
+        tallest = max(tallest, facts, actions)
+    width = 2 * SVG_MARGIN + len(graph.levels) * SVG_LEVEL_SPACING
+    height = 2 * SVG_MARGIN + tallest * SVG_NODE_SPACING
+
+    def point(x, y):
+        return SVG_MARGIN + x * SVG_LEVEL_SPACING, SVG_MARGIN + y * (height - 2 * SVG_MARGIN)
+
+    f.write(f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+            f'viewBox="0 0 {width} {height}" font-family="sans-serif" font-size="9">\n')
+    # the positions of the previous level, for the edges coming from it
+    previous = {}
+    for level in stream:
+        positions = level_layout(level["level"], level)
+        positions.update(previous)
+        f.write('<g stroke="black" stroke-width="0.5">\n')
+        for source, target in level["edges"]:
+            if source in positions and target in positions:
+                (x1, y1), (x2, y2) = point(*positions[source]), point(*positions[target])
+                f.write(f'<line x1="{x1:.1f}" y1="{y1:.1f}" x2="{x2:.1f}" y2="{y2:.1f}"/>\n')
+        f.write('</g>\n<g stroke="red" stroke-width="0.8" stroke-dasharray="4,3">\n')
+        for first, second in level["mutexes"]:
+            (x1, y1), (x2, y2) = point(*positions[first]), point(*positions[second])
+            f.write(f'<line x1="{x1:.1f}" y1="{y1:.1f}" x2="{x2:.1f}" y2="{y2:.1f}"/>\n')
+        f.write('</g>\n')
+        for nid, node_type, label in _nodes(level):
+            x, y = point(*positions[nid])
+            color = SVG_COLORS[node_type]
+            if node_type == "action":
+                f.write(f'<rect x="{x - 6:.1f}" y="{y - 6:.1f}" width="12" height="12" fill="{color}"/>')
+            else:
+                f.write(f'<circle cx="{x:.1f}" cy="{y:.1f}" r="6" fill="{color}"/>')
+            f.write(f'<text x="{x + 8:.1f}" y="{y + 3:.1f}">{escape(label)}</text>\n')
+        previous = {nid: positions[nid] for nid, _, _ in _nodes(level)}
+    f.write('</svg>\n')
+
+
+WRITERS = {"json": write_json, "jsonl": write_jsonl, "graphml": write_graphml, "svg": write_svg}
+
+
+def export_graph(graph, path, fmt=None, include_mutexes=False, include_noops=True):
+    """
+    :param graph: planning graph, aima3 Graph or bitgraph.BitGraph
+    :param path: output file path
+    :param fmt: one of FORMATS, taken from the file extension if not given
+    :param include_mutexes: also write the mutexes of every level
+    :param include_noops: write the Persistence actions
+    """
+    if fmt is None:
+        fmt = path.rsplit(".", 1)[-1].lower()
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {list(FORMATS)}")
+    stream = LevelStream(graph, include_mutexes, include_noops)
+    with open(path, "w", encoding="utf-8") as f:
+        WRITERS[fmt](stream, f)
+
+
+def main():
+    import engine
+
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("domain")
+    arg_parser.add_argument("problem")
+    arg_parser.add_argument("output")
+    arg_parser.add_argument("--format", choices=FORMATS, help="taken from the output extension if not given")
+    arg_parser.add_argument("--levels", type=int, default=1, help="number of levels to expand")
+    arg_parser.add_argument("--engine", default="bitset", choices=list(engine.GRAPH_ENGINES))
+    arg_parser.add_argument("--mutexes", action="store_true", help="include the mutexes")
+    arg_parser.add_argument("--no-noops", action="store_true", help="leave out the Persistence actions")
+    args = arg_parser.parse_args()
+
+    gp = engine.GraphPlanVis()
+    gp.create_problem(args.domain, args.problem, engine=args.engine)
+    for _ in range(args.levels):
+        gp.expand_level()
+    export_graph(gp.graphplan.graph, args.output, args.format, args.mutexes, not args.no_noops)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+
+class BackjumpingExtractor:
+    """
+    Solution extraction as a constraint satisfaction problem.
+    At each level the goals are variables and their supporting actions are the values.
+    Goals are assigned one at a time, most constrained goal first, mutexes are checked
+    against the partial assignment and a dead end jumps back to the goal that caused it
+    (conflict-directed backjumping).
+    Failing goal sets are shared with the planner's nogood table.
+    """
+
+    def __init__(self, graphplan, graph=None):
+        """
+        :param graphplan: MyGraphPlan whose nogoods are used
+        :param graph: graph to extract from, None for the graph of graphplan
+        """
+        self.graphplan = graphplan
+        self.graph = graphplan.graph if graph is None else graph
+        self.nogoods = graphplan.nogoods
+        self.nodes = 0
+        self.backjumps = 0
+        self._mutex_tests = {}
+
+    def extract(self, goals_pos, goals_neg, level_num):
+        """
+        :param goals_pos: positive goals at the level
+        :param goals_neg: negative goals at the level
+        :param level_num: index of the level counted from the first level
+        :return: list of action lists, one per level from the first, or None
+        """
+        return next(self.iter_plans(goals_pos, goals_neg, level_num), None)
+
+    def iter_plans(self, goals_pos, goals_neg, level_num):
+        """
+        lazily yields every plan achieving the goals at the level,
+        a goal set is recorded as a nogood once its search is exhausted without a plan
+        :param goals_pos: positive goals at the level
+        :param goals_neg: negative goals at the level
+        :param level_num: index of the level counted from the first level
+        :return: generator of lists of action lists, one per level from the first
+        """
+        self.graphplan.extract_calls += 1
+        instrumentation = self.graphplan.instrumentation
+        if instrumentation is not None:
+            instrumentation.count_extraction(level_num)
+        levels = self.graph.levels
+        if level_num == 0:
+            if self.graph.goals_hold(goals_pos, 0):
+                yield []
+            return
+
+        if self.nogoods.is_nogood(level_num, goals_pos, goals_neg):
+            if instrumentation is not None:
+                instrumentation.count_nogood_hit(level_num)
+            return
+
+        if not self.graph.non_mutex_goals(goals_pos + goals_neg, level_num - len(levels)):
+            self.nogoods.add(level_num, goals_pos, goals_neg)
+            return
+
+        level = levels[level_num - 1]
+        order_goals, order_supporters = self.graphplan.order_goals, self.graphplan.order_supporters
+        variables = {}
+        for goal in order_goals(goals_pos, level.next_state_links_pos):
+            variables[("pos", goal)] = order_supporters(level.next_state_links_pos.get(goal, []))
+        for goal in order_goals(goals_neg, level.next_state_links_neg):
+            variables[("neg", goal)] = order_supporters(level.next_state_links_neg.get(goal, []))
+
+        conflicts = yield from self._assign(level, level_num, variables, {}, [])
+        if conflicts is not None:
+            self.nogoods.add(level_num, goals_pos, goals_neg)
+
+    def _assign(self, level, level_num, variables, assignment, order):
+        """
+        assign a supporter to the next goal and recurse
+        :param variables: goal variable -> list of supporting actions
+        :param assignment: goal variable -> chosen action
+        :param order: the assigned goal variables, in assignment order
+        :return: generator of plans, returning None if a plan was yielded and
+                 otherwise the conflict set of goal variables
+        """
+        if len(assignment) == len(variables):
+            return (yield from self._descend(level, level_num, assignment, order))
+
+        variable, values, conflicts = self._most_constrained(level_num, variables, assignment, order)
+        chosen = set(assignment.values())
+        # reusing an action that is already in the plan adds no new preconditions
+        values.sort(key=lambda action: action not in chosen)
+
+        found = False
+        budget = self.graphplan.budget
+        for action in values:
+            self.nodes += 1
+            if budget is not None:
+                budget.charge()
+            assignment[variable] = action
+            order.append(variable)
+            child_conflicts = yield from self._assign(level, level_num, variables, assignment, order)
+            order.pop()
+            del assignment[variable]
+
+            if child_conflicts is None:
+                found = True
+                continue
+
+            if self.graphplan.instrumentation is not None:
+                self.graphplan.instrumentation.count_backtrack(level_num)
+            if not found and variable not in child_conflicts:
+                self.backjumps += 1
+                return child_conflicts
+            conflicts |= child_conflicts - {variable}
+
+        return None if found else conflicts
+
+    def _most_constrained(self, level_num, variables, assignment, order):
+        """
+        pick the unassigned goal with the fewest supporters that are consistent
+        with the partial assignment
+        :return: (variable, consistent supporters, assigned goals that removed the others)
+        """
+        is_mutex = self._mutex_test(level_num)
+        best = None
+        for variable, supporters in variables.items():
+            if variable in assignment:
+                continue
+            values = []
+            conflicts = set()
+            for action in supporters:
+                culprit = next((assigned for assigned in order
+                                if action != assignment[assigned] and
+                                is_mutex(action, assignment[assigned])), None)
+                if culprit is None:
+                    values.append(action)
+                else:
+                    conflicts.add(culprit)
+            if best is None or len(values) < len(best[1]):
+                best = (variable, values, conflicts)
+                if not values:
+                    break
+        return best
+
+    def _descend(self, level, level_num, assignment, order):
+        actions = list(dict.fromkeys(assignment.values()))
+        new_goals_pos = []
+        new_goals_neg = []
+        for action in actions:
+            new_goals_pos += level.current_action_links_pos.get(action, [])
+            new_goals_neg += level.current_action_links_neg.get(action, [])
+
+        found = False
+        for plan in self.iter_plans(list(dict.fromkeys(new_goals_pos)), list(dict.fromkeys(new_goals_neg)),
+                                    level_num - 1):
+            found = True
+            yield plan + [actions]
+        return None if found else set(order)
+
+    def _mutex_test(self, level_num):
+        """
+        :return: function telling if two actions of the level's action layer are mutex
+        """
+        is_mutex = self._mutex_tests.get(level_num)
+        if is_mutex is None:
+            if hasattr(self.graph, "mutex_index"):
+                # aima3 and compact levels keep a list of pairs, the graph indexes it once
+                partners, _ = self.graph.mutex_index(level_num - 1)
+                is_mutex = lambda first, second: second in partners.get(first, ())
+            else:
+                mutex = self.graph.levels[level_num - 1].mutex
+                is_mutex = lambda first, second: {first, second} in mutex
+            self._mutex_tests[level_num] = is_mutex
+        return is_mutex
+
+    def stats(self):
+        return {"nodes": self.nodes, "backjumps": self.backjumps}
@@ -0,0 +1,136 @@
+import itertools
+import time
+
+from bitgraph import GroundAction, SymbolTable
+from parser import parse_action_name, parse_pddl2expr
+
+
+class GroundProblem:
+    """
+    Compact ground action table of a pddl problem.
+    Facts are given ids by the `facts` SymbolTable, the initial state facts first, and
+    `init` is the bitset of the initial state that BitGraph starts from.
+    """
+
+    def __init__(self, facts, actions, init, stats):
+        self.facts = facts
+        self.actions = actions
+        self.init = init
+        self.stats = stats
+
+
+def objects_by_type(domprob):
+    """
+    :param domprob: pddlpy DomainProblem
+    :return: dictionary from type name to the objects of that type or of one of its subtypes
+    """
+    parents = dict(getattr(domprob.domain, "types", None) or {})
+    by_type = {}
+    for obj, obj_type in domprob.worldobjects().items():
+        while obj_type is not None:
+            by_type.setdefault(obj_type, []).append(obj)
+            obj_type = parents.get(obj_type)
+        by_type.setdefault("object", []).append(obj)
+    return by_type
+
+
+def typed_bindings(operator, by_type):
+    """
+    yields every binding of the operator's parameters to objects of the right type.
+    Like aima3's grounding, two parameters are never bound to the same object.
+    :param operator: lifted pddlpy Operator
+    :param by_type: output of objects_by_type
+    :return: generator of dictionaries from variable name to object
+    """
+    variables = list(operator.variable_list.keys())
+    candidates = [sorted(by_type.get(operator.variable_list[var] or "object", []))
+                  for var in variables]
+    for values in itertools.product(*candidates):
+        if len(set(values)) == len(values):
+            yield dict(zip(variables, values))
+
+
+def ground_problem(domprob):
+    """
+    ground the operators of the problem once and drop the ground actions that are
+    not reachable from the initial state when delete effects are ignored
+    :param domprob: pddlpy DomainProblem
+    :return: GroundProblem
+    """
+    start = time.perf_counter()
+    facts = SymbolTable()
+    init_ids = [facts.intern(parse_pddl2expr(atom)) for atom in domprob.initialstate()]
+
+    def ground_atoms(atoms, binding):
+        return [facts.intern(parse_pddl2expr([binding.get(term, term) for term in atom.predicate]))
+                for atom in atoms]
+
+    by_type = objects_by_type(domprob)
+    actions = []
+    for operator_name, operator in domprob.domain.operators.items():
+        for binding in typed_bindings(operator, by_type):
+            name = parse_action_name(operator, binding)
+            actions.append(GroundAction(name,
+                                        ground_atoms(operator.precondition_pos, binding),
+                                        ground_atoms(operator.precondition_neg, binding),
+                                        ground_atoms(operator.effect_pos, binding),
+                                        ground_atoms(operator.effect_neg, binding)))
+
+    reachable_actions = relaxed_reachability(actions, init_ids, len(facts))
+
+    # re-number the facts so that only the reachable problem is kept
+    compact = SymbolTable()
+    for fact_id in init_ids:
+        compact.intern(facts.symbols[fact_id])
+    # bitset of the initial state, its facts are the first ids
+    init = (1 << len(compact)) - 1
+
+    def remap(fact_ids):
+        return [compact.intern(facts.symbols[fact_id]) for fact_id in fact_ids]
+
+    compact_actions = [GroundAction(action.expr, remap(action.pre_pos), remap(action.pre_neg),
+                                    remap(action.add), remap(action.delete))
+                       for action in reachable_actions]
+
+    stats = {"ground_actions": len(actions),
+             "reachable_actions": len(compact_actions),
+             "ground_facts": len(facts),
+             "reachable_facts": len(compact),
+             "seconds": time.perf_counter() - start}
+    return GroundProblem(compact, compact_actions, init, stats)
+
+
+def relaxed_reachability(actions, init_ids, fact_count):
+    """
+    forward reachability ignoring delete effects and negative preconditions
+    :param actions: list of GroundAction
+    :param init_ids: ids of the initial facts
+    :param fact_count: number of fact ids
+    :return: the reachable actions in their original order
+    """
+    needed_by = [[] for _ in range(fact_count)]
+    missing = []
+    for action_index, action in enumerate(actions):
+        preconditions = set(action.pre_pos)
+        missing.append(len(preconditions))
+        for fact_id in preconditions:
+            needed_by[fact_id].append(action_index)
+
+    reached = set()
+    queue = list(init_ids)
+    applicable = [action_index for action_index, count in enumerate(missing) if count == 0]
+    while queue or applicable:
+        if applicable:
+            queue.extend(actions[applicable.pop()].add)
+            continue
+
+        fact_id = queue.pop()
+        if fact_id in reached:
+            continue
+        reached.add(fact_id)
+        for action_index in needed_by[fact_id]:
+            missing[action_index] -= 1
+            if missing[action_index] == 0:
+                applicable.append(action_index)
+
+    return [action for action_index, action in enumerate(actions) if missing[action_index] == 0]
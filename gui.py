@@ -1,12 +1,18 @@
 import sys
+import threading
+import time
 import matplotlib
 matplotlib.use('Qt5Agg')
 import engine
+from cache import ProblemCache
 from PyQt5 import QtCore, QtGui, QtWidgets
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg, NavigationToolbar2QT as NavigationToolbar
 from matplotlib.figure import Figure
 import matplotlib.pyplot as plt
 DEBUG = True
+# how close to a node, in pixels, the mouse has to be to hover or click it
+HOVER_PIXELS = 12
+CLICK_PIXELS = 25
 
 
 class MplCanvas(FigureCanvasQTAgg):
@@ -19,11 +25,75 @@ class MplCanvas(FigureCanvasQTAgg):
 
 
 
+class SolveCancelled(Exception):
+    pass
+
+
+class SolveWorker(QtCore.QObject):
+    """
+    Runs GraphPlanVis.iter_solutions in a QThread.
+    Progress comes from the instrumentation callbacks of the GraphPlanVis, which are also
+    where a cancel request is noticed, so cancelling takes effect at the next extraction
+    step or once the level being expanded is done.
+    """
+    # number of levels in the graph
+    level_expanded = QtCore.pyqtSignal(int)
+    # number of levels, extraction nodes explored
+    progress = QtCore.pyqtSignal(int, int)
+    # "solved", "no_solution", "cancelled" or "error", and the plan or the error message
+    done = QtCore.pyqtSignal(str, object)
+
+    PROGRESS_INTERVAL = 0.1
+
+    def __init__(self, gp, with_expanding):
+        super(SolveWorker, self).__init__()
+        self.gp = gp
+        self.with_expanding = with_expanding
+        self.extraction_nodes = 0
+        self._cancel = threading.Event()
+        self._last_progress = 0.0
+
+    def cancel(self):
+        self._cancel.set()
+
+    def _on_event(self, event, stats):
+        if self._cancel.is_set():
+            raise SolveCancelled()
+        levels = len(self.gp.graphplan.graph.levels)
+        if event == "expand":
+            self.level_expanded.emit(levels)
+        elif event == "extract":
+            self.extraction_nodes += 1
+
+        now = time.perf_counter()
+        if now - self._last_progress >= self.PROGRESS_INTERVAL:
+            self._last_progress = now
+            self.progress.emit(levels, self.extraction_nodes)
+
+    def run(self):
+        if self.gp.instrumentation is None:
+            self.gp.enable_instrumentation()
+        callbacks = self.gp.instrumentation.callbacks
+        callbacks.append(self._on_event)
+        try:
+            plan = next(self.gp.iter_solutions(with_expanding=self.with_expanding, max_plans=1), None)
+        except SolveCancelled:
+            self.done.emit("cancelled", None)
+            return
+        except Exception as e:
+            self.done.emit("error", str(e))
+            return
+        finally:
+            callbacks.remove(self._on_event)
+        self.done.emit("solved" if plan is not None else "no_solution", plan)
+
+
 class MainWindow(QtWidgets.QMainWindow):
 
     def __init__(self, *args, **kwargs):
         super(MainWindow, self).__init__(*args, **kwargs)
         self.gp = engine.GraphPlanVis()
+        self.problem_cache = ProblemCache()
 
         self.fig_width = 5
         self.fig_height = 4
@@ -41,22 +111,61 @@ class MainWindow(QtWidgets.QMainWindow):
         self._construct_top_menu()
         self._construct_main_menu()
         cid = self.mpl.figure.canvas.mpl_connect('button_press_event', self._onclick)
+        self.mpl.figure.canvas.mpl_connect('motion_notify_event', self._onhover)
+        self.hovered_node = None
+
+        self.mutex_mode = False
+        self.first_action = None
+        self.second_action = None
+        self.solve_thread = None
+        self.solve_worker = None
 
         self.show()
         if DEBUG:
             self._try_start_graph_plan()
             self.action_expand_level()
 
-        self.mutex_mode = False
-        self.first_action = None
-        self.second_action = None
+    def _pixel_scale(self):
+        """
+        :return: data units per pixel on the x and y axis at the current zoom
+        """
+        (x0, y0), (x1, y1) = self.mpl.axes.transData.inverted().transform([(0, 0), (1, 1)])
+        return abs(x1 - x0), abs(y1 - y0)
+
+    def _node_at(self, event, max_pixels):
+        if not self.gp.is_ready or event.inaxes is not self.mpl.axes:
+            return None
+        x_scale, y_scale = self._pixel_scale()
+        return self.gp.nearest_node(event.xdata, event.ydata, x_scale, y_scale, max_pixels)
+
+    def _onhover(self, event):
+        node = self._node_at(event, HOVER_PIXELS)
+        if node == self.hovered_node:
+            return
+        self.hovered_node = node
+        if node is None:
+            QtWidgets.QToolTip.hideText()
+        else:
+            QtWidgets.QToolTip.showText(QtGui.QCursor.pos(), self.gp.describe_node(node), self.mpl)
 
     def _onclick(self, event):
+        if self.solve_thread is not None:
+            # the view is locked like the View menu while solving
+            return
+        if event.dblclick and not self.mutex_mode:
+            # zoom the level window in on the levels around the node
+            node = self._node_at(event, CLICK_PIXELS)
+            if node is not None:
+                self.gp.show_levels_around(node)
+                self._refresh_graph_view()
+            return
         if not self.mutex_mode:
             return
 
-        clicked = min(self.gp.pos.items(), key=
-        lambda x: pow(x[1][0]-event.xdata, 2) + pow(x[1][1]-event.ydata, 2))
+        node = self._node_at(event, CLICK_PIXELS)
+        if node is None:
+            return
+        clicked = (node, self.gp.pos[node])
 
         # print(clicked)
         # print('%s click: button=%d, x=%d, y=%d, xdata=%f, ydata=%f' %
@@ -110,9 +219,28 @@ class MainWindow(QtWidgets.QMainWindow):
         # Create toolbar, passing canvas as first parament, parent (self, the MainWindow) as second.
         toolbar = NavigationToolbar(self.mpl, self)
 
+        # per level statistics next to the graph
+        self.stats_panel = QtWidgets.QPlainTextEdit()
+        self.stats_panel.setReadOnly(True)
+        self.stats_panel.setFont(QtGui.QFontDatabase.systemFont(QtGui.QFontDatabase.FixedFont))
+        self.stats_panel.setMaximumWidth(420)
+
+        graph_layout = QtWidgets.QHBoxLayout()
+        graph_layout.addWidget(self.mpl, stretch=1)
+        graph_layout.addWidget(self.stats_panel)
+
         layout = QtWidgets.QVBoxLayout()
         layout.addWidget(toolbar)
-        layout.addWidget(self.mpl)
+        layout.addLayout(graph_layout)
+
+        # progress of a background solve
+        self.progress_label = QtWidgets.QLabel()
+        self.cancel_button = QtWidgets.QPushButton("Cancel")
+        self.cancel_button.clicked.connect(self.action_cancel_solve)
+        self.cancel_button.setShortcut(QtCore.Qt.Key_Escape)
+        self.cancel_button.setVisible(False)
+        self.statusBar().addWidget(self.progress_label, 1)
+        self.statusBar().addPermanentWidget(self.cancel_button)
 
         # Create a placeholder widget to hold our toolbar and canvas.
         widget = QtWidgets.QWidget()
@@ -124,6 +252,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.file_menu = QtWidgets.QMenu('&File', self)
         self.file_menu.addAction('&Load Domain', lambda: self.file_load_pddl("domain"))
         self.file_menu.addAction('&Load problem', lambda: self.file_load_pddl("problem"))
+        self.export_action = self.file_menu.addAction('&Export graph...', self.file_export_graph)
 
         self.file_menu.addAction('&Quit', self.file_quit,
                                  QtCore.Qt.CTRL + QtCore.Qt.Key_Q)
@@ -149,6 +278,21 @@ class MainWindow(QtWidgets.QMainWindow):
         self.view_menu = QtWidgets.QMenu('&View', self)
         self.view_menu.addAction('&Show mutexes', self.view_mutexes,
                                  QtCore.Qt.CTRL + QtCore.Qt.Key_M)
+        self.view_menu.addAction('Show s&tats', self.view_stats,
+                                 QtCore.Qt.CTRL + QtCore.Qt.Key_T)
+        self.view_menu.addAction('Show &no-ops', self.show_no_ops,
+                                 QtCore.Qt.CTRL + QtCore.Qt.Key_N)
+        self.view_menu.addAction('Relevant to &goals only', self.show_relevant_only,
+                                 QtCore.Qt.CTRL + QtCore.Qt.Key_G)
+        self.view_menu.addSeparator()
+        self.view_menu.addAction('Show &all levels', self.view_all_levels,
+                                 QtCore.Qt.CTRL + QtCore.Qt.Key_A)
+        self.view_menu.addAction('Show &last levels...', self.view_last_levels,
+                                 QtCore.Qt.CTRL + QtCore.Qt.Key_L)
+        self.view_menu.addAction('Scroll levels left', lambda: self.view_scroll_levels(-1),
+                                 QtCore.Qt.ALT + QtCore.Qt.Key_Left)
+        self.view_menu.addAction('Scroll levels right', lambda: self.view_scroll_levels(1),
+                                 QtCore.Qt.ALT + QtCore.Qt.Key_Right)
         self.menuBar().addMenu(self.view_menu)
         self.view_menu.setDisabled(True)
 
@@ -160,6 +304,7 @@ class MainWindow(QtWidgets.QMainWindow):
         self.help_menu.addAction('&About', self.about)
 
     def closeEvent(self, ce):
+        self._stop_solving()
         self.file_quit()
 
     def file_quit(self):
@@ -175,6 +320,20 @@ class MainWindow(QtWidgets.QMainWindow):
         if self.problem_file_path and self.domain_file_path:
             self._try_start_graph_plan()
 
+    def file_export_graph(self):
+        if not self.gp.is_ready:
+            return
+        file_path, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Export planning graph", "graph.svg",
+            "SVG (*.svg);;GraphML (*.graphml);;JSON (*.json);;JSON Lines (*.jsonl)")
+        if not file_path:
+            return
+        try:
+            self.gp.export(file_path, include_mutexes=self.mutex_mode)
+        except Exception as e:
+            error_dialog = QtWidgets.QErrorMessage()
+            error_dialog.showMessage(str(e))
+
     def about(self):
         # TODO this
         QtWidgets.QMessageBox.about(self, "About", "e")
@@ -186,26 +345,86 @@ class MainWindow(QtWidgets.QMainWindow):
         self._refresh_graph_view()
 
     def action_solve(self):
-        if not self.gp.is_ready:
-            return
-        solution = self.gp.solve(with_expanding=False)
-        solution_string = self.gp.format_solution(solution)
-        ms = QtWidgets.QMessageBox()
-        ms.setText(solution_string)
-        ms.exec_()
+        self._start_solving(with_expanding=False)
 
     def action_expand_and_solve(self):
-        if not self.gp.is_ready:
+        self._start_solving(with_expanding=True)
+
+    def action_cancel_solve(self):
+        if self.solve_worker is not None:
+            self.solve_worker.cancel()
+            self.progress_label.setText("Cancelling...")
+
+    def _start_solving(self, with_expanding):
+        if not self.gp.is_ready or self.solve_thread is not None:
+            return
+        self.solve_thread = QtCore.QThread()
+        self.solve_worker = SolveWorker(self.gp, with_expanding)
+        self.solve_worker.moveToThread(self.solve_thread)
+        self.solve_thread.started.connect(self.solve_worker.run)
+        # signals of a worker that was stopped may still be queued, the handlers ignore them
+        worker = self.solve_worker
+        worker.level_expanded.connect(lambda levels: self._on_level_expanded(worker, levels))
+        worker.progress.connect(lambda levels, nodes: self._on_solve_progress(worker, levels, nodes))
+        worker.done.connect(lambda status, result: self._on_solve_done(worker, status, result))
+
+        # a blocking refresh would wait for the whole expansion and export releases the
+        # level views extraction reads, only the progress refreshes run meanwhile
+        self.action_menu.setDisabled(True)
+        self.view_menu.setDisabled(True)
+        self.export_action.setDisabled(True)
+        self.cancel_button.setVisible(True)
+        self.progress_label.setText("Solving...")
+        self.solve_thread.start()
+
+    def _stop_solving(self):
+        """
+        cancel a running solve and wait for its thread to end
+        """
+        if self.solve_thread is None:
             return
-        solution = self.gp.solve()
+        self.solve_worker.cancel()
+        self.solve_thread.quit()
+        self.solve_thread.wait()
+        self.solve_thread = None
+        self.solve_worker = None
+        self.action_menu.setDisabled(not self.gp.is_ready)
+        self.view_menu.setDisabled(not self.gp.is_ready)
+        self.export_action.setDisabled(False)
+        self.cancel_button.setVisible(False)
+        self.progress_label.clear()
+
+    def _on_level_expanded(self, worker, levels):
+        if worker is not self.solve_worker:
+            return
+        self.progress_label.setText(f"Level {levels - 1} expanded")
+        self._refresh_graph_view(blocking=False)
+
+    def _on_solve_progress(self, worker, levels, extraction_nodes):
+        if worker is not self.solve_worker:
+            return
+        self.progress_label.setText(f"Level {levels - 1}, {extraction_nodes} extraction nodes explored")
+        self._refresh_stats()
+
+    def _on_solve_done(self, worker, status, result):
+        if worker is not self.solve_worker:
+            return
+        self._stop_solving()
         self._refresh_graph_view()
-        solution_string = self.gp.format_solution(solution)
+
+        if status == "cancelled":
+            return
+        if status == "error":
+            solution_string = f"Solving failed:\n{result}"
+        else:
+            solution_string = self.gp.format_plan(result)
         ms = QtWidgets.QMessageBox()
         ms.setText(solution_string)
         ms.exec_()
 
     def action_reset_graph(self):
 
+        self._stop_solving()
         self.gp = engine.GraphPlanVis()
         self._set_empty_plot()
         self._try_start_graph_plan()
@@ -213,15 +432,49 @@ class MainWindow(QtWidgets.QMainWindow):
     def view_mutexes(self):
         if not self.gp.is_ready:
             return
-        # self.gp.draw_graph_mutexes(self.mpl.axes)
         self.mutex_mode = not self.mutex_mode
+        self._refresh_graph_view()
+
+    def view_stats(self):
+        self.stats_panel.setVisible(not self.stats_panel.isVisible())
+
+    def view_all_levels(self):
+        self.gp.set_level_window()
+        if self.gp.is_ready:
+            self._refresh_graph_view()
+
+    def view_last_levels(self):
+        count, ok = QtWidgets.QInputDialog.getInt(self, "Show last levels", "Number of levels:", 3, 1)
+        if not ok:
+            return
+        self.gp.show_last_levels(count)
+        if self.gp.is_ready:
+            self._refresh_graph_view()
+
+    def view_scroll_levels(self, delta):
+        if not self.gp.is_ready:
+            return
+        self.gp.scroll_levels(delta)
+        self._refresh_graph_view()
 
     def show_no_ops(self):
-        raise  NotImplementedError
+        if not self.gp.is_ready:
+            return
+        self.gp.set_show_noops(not self.gp.show_noops)
+        self._refresh_graph_view()
+
+    def show_relevant_only(self):
+        if not self.gp.is_ready:
+            return
+        self.gp.set_relevant_only(not self.gp.relevant_only)
+        self._refresh_graph_view()
 
     def _try_start_graph_plan(self):
+        self._stop_solving()
         try:
-            self.gp.create_problem(self.domain_file_path, self.problem_file_path)
+            self.gp.create_problem(self.domain_file_path, self.problem_file_path,
+                                   cache=self.problem_cache)
+            self.gp.enable_instrumentation()
             self.action_menu.setDisabled(False)
             self.view_menu.setDisabled(False)
 
@@ -249,11 +502,28 @@ class MainWindow(QtWidgets.QMainWindow):
         self.mpl.figure.canvas.draw()
         self.mpl.figure.canvas.flush_events()
 
-    def _refresh_graph_view(self):
-        self.mpl.axes.cla()
-        ax = self.gp.visualize(self.mpl.axes)
-        # self.mpl.axes[0] = ax
+    def _refresh_graph_view(self, blocking=True):
+        """
+        :param blocking: if False and a background solve is expanding the graph, skip this refresh
+        """
+        if not self.gp.graph_lock.acquire(blocking=blocking):
+            return
+        try:
+            self.mpl.axes.cla()
+            ax = self.gp.visualize(self.mpl.axes)
+            # self.mpl.axes[0] = ax
+            if self.mutex_mode:
+                self.gp.draw_graph_mutexes(self.mpl.axes)
+        finally:
+            self.gp.graph_lock.release()
         self._refresh_figure()
+        self._refresh_stats()
+
+    def _refresh_stats(self):
+        if self.gp.instrumentation is None:
+            self.stats_panel.clear()
+            return
+        self.stats_panel.setPlainText(self.gp.instrumentation.format())
 
 
 app = QtWidgets.QApplication(sys.argv)
@@ -0,0 +1,123 @@
+import time
+
+
+class LevelStats:
+    """
+    Counters of one level of the planning graph.
+    facts are the state facts of the level, actions and mutexes belong to the action layer
+    that leaves the level and only exist once the graph was expanded past it.
+    """
+    __slots__ = ("level", "facts", "actions", "mutexes", "expansion_seconds",
+                 "extraction_calls", "backtracks", "nogood_hits")
+
+    def __init__(self, level):
+        self.level = level
+        self.facts = 0
+        self.actions = 0
+        self.mutexes = 0
+        self.expansion_seconds = 0.0
+        self.extraction_calls = 0
+        self.backtracks = 0
+        self.nogood_hits = 0
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def level_counts(level):
+    """
+    :param level: aima3 Level or bitgraph.BitLevel
+    :return: (facts, actions, mutexes) of the level
+    """
+    if hasattr(level, "state_pos"):
+        facts = bin(level.state_pos).count("1") + bin(level.state_neg).count("1")
+        actions = level.action_count()
+    else:
+        facts = len(level.current_state_pos) + len(level.current_state_neg)
+        actions = len(set(level.current_action_links_pos) | set(level.current_action_links_neg))
+    return facts, actions, len(level.mutex)
+
+
+class Instrumentation:
+    """
+    Per level statistics of a planning run.
+    MyGraphPlan only calls into it when one is attached, so a run without it pays nothing.
+    Callbacks are called with (event, LevelStats) after every record, event is one of
+    "expand", "extract", "backtrack" and "nogood".
+    """
+
+    def __init__(self, callbacks=()):
+        self.callbacks = list(callbacks)
+        self.levels = []
+        self.started = time.perf_counter()
+
+    def reset(self):
+        self.levels = []
+        self.started = time.perf_counter()
+
+    def add_callback(self, callback):
+        self.callbacks.append(callback)
+
+    def level(self, level_num):
+        while len(self.levels) <= level_num:
+            self.levels.append(LevelStats(len(self.levels)))
+        return self.levels[level_num]
+
+    def _notify(self, event, stats):
+        for callback in self.callbacks:
+            callback(event, stats)
+
+    def record_expansion(self, graph, seconds):
+        """
+        record the action layer that was just built and the level it created
+        :param graph: the planning graph right after expand_graph
+        :param seconds: time expand_graph took
+        """
+        built = len(graph.levels) - 2
+        stats = self.level(built)
+        stats.facts, stats.actions, stats.mutexes = level_counts(graph.levels[built])
+        stats.expansion_seconds = seconds
+
+        new_stats = self.level(built + 1)
+        new_stats.facts = level_counts(graph.levels[-1])[0]
+        self._notify("expand", stats)
+
+    def record_initial(self, graph):
+        self.level(0).facts = level_counts(graph.levels[0])[0]
+
+    def count_extraction(self, level_num):
+        stats = self.level(level_num)
+        stats.extraction_calls += 1
+        self._notify("extract", stats)
+
+    def count_backtrack(self, level_num):
+        stats = self.level(level_num)
+        stats.backtracks += 1
+        self._notify("backtrack", stats)
+
+    def count_nogood_hit(self, level_num):
+        stats = self.level(level_num)
+        stats.nogood_hits += 1
+        self._notify("nogood", stats)
+
+    def report(self):
+        """
+        :return: json serializable dictionary with the per level stats and their totals
+        """
+        levels = [stats.as_dict() for stats in self.levels]
+        totals = {name: sum(stats[name] for stats in levels)
+                  for name in LevelStats.__slots__ if name not in ("level", "facts", "actions", "mutexes")}
+        totals["levels"] = len(levels)
+        totals["elapsed_seconds"] = time.perf_counter() - self.started
+        return {"levels": levels, "totals": totals}
+
+    def format(self):
+        """
+        :return: printable table of the per level stats
+        """
+        lines = [f"{'lvl':>3}{'facts':>7}{'acts':>6}{'mutex':>7}{'exp ms':>8}{'calls':>7}{'back':>6}{'nogood':>7}"]
+        for stats in self.levels:
+            lines.append(f"{stats.level:>3}{stats.facts:>7}{stats.actions:>6}{stats.mutexes:>7}"
+                         f"{stats.expansion_seconds * 1000:>8.2f}{stats.extraction_calls:>7}"
+                         f"{stats.backtracks:>6}{stats.nogood_hits:>7}")
+        return "\n".join(lines)
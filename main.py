@@ -6,7 +6,7 @@ gp.create_problem("examples/block-world/domain.pddl",
 # gp.expand_level()
 
 # gp.expand_level()
-print(gp.solve())
+print(gp.solve().solution)
 fig = gp.visualize()
 fig.show()
 print(len(gp.graphplan.graph.levels))
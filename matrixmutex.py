@@ -0,0 +1,185 @@
+"""
+Mutexes of a BitLevel's action layer computed with numpy matrix operations.
+The layer is turned into boolean action x fact incidence matrices of what every action
+gives (adds or needs) and takes (deletes or needs absent). They are sparse, so they are
+kept as coordinates and as bit packed fact x action matrices, and a boolean matrix
+product is an or of packed rows. The result is converted back to BitLevel's bitsets,
+so the rest of the engine can't tell which way the mutexes were found.
+"""
+import numpy as np
+
+# packed rows are 64 bit words, little endian like python's int.from_bytes below
+WORD = np.dtype("<u8")
+
+
+class IncidenceTable:
+    """
+    What every ground action of a graph gives and takes, as compressed sparse rows
+    indexed by action id. The graph creates no-ops as it goes, new actions are added
+    on the next update.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self._gives = ([0], [])
+        self._takes = ([0], [])
+        self._single_effect = []
+        self.gives = self.takes = self.single_effect = None
+
+    def update(self, actions):
+        """
+        :param actions: the graph's list of GroundActions
+        """
+        if len(actions) == self.size:
+            return
+        for action in actions[self.size:]:
+            for (indptr, indices), facts in ((self._gives, action.add + action.pre_pos),
+                                             (self._takes, action.delete + action.pre_neg)):
+                indices.extend(facts)
+                indptr.append(len(indices))
+            effects = action.effects
+            self._single_effect.append(effects[0] if len(effects) == 1 else -1)
+        self.size = len(actions)
+        self.gives = tuple(np.array(part, dtype=np.intp) for part in self._gives)
+        self.takes = tuple(np.array(part, dtype=np.intp) for part in self._takes)
+        self.single_effect = np.array(self._single_effect, dtype=np.intp)
+
+
+def _rows(table, action_ids):
+    """
+    :param table: (indptr, indices) of an IncidenceTable
+    :return: (row index, fact id) arrays of the True entries of the layer's incidence
+             matrix, ordered by row
+    """
+    indptr, indices = table
+    starts = indptr[action_ids]
+    lengths = indptr[action_ids + 1] - starts
+    row_index = np.repeat(np.arange(len(action_ids)), lengths)
+    offsets = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return row_index, indices[np.repeat(starts, lengths) + offsets]
+
+
+def _pack(row_index, column_index, shape):
+    """
+    :return: the boolean matrix of the True entries, bit packed along its rows into words
+    """
+    rows, bits = shape
+    words = -(-bits // 64)
+    matrix = np.zeros((rows, words * 64), dtype=bool)
+    matrix[row_index, column_index] = True
+    return np.packbits(matrix, axis=1, bitorder="little").view(WORD)
+
+
+def _to_ints(packed):
+    return [int.from_bytes(row.tobytes(), "little") for row in packed]
+
+
+def _bits(bitset):
+    """
+    :return: array of the positions of the set bits of a python int
+    """
+    packed = np.frombuffer(bitset.to_bytes(-(-bitset.bit_length() // 8), "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(packed, bitorder="little"))
+
+
+def _or_product(row_index, column_index, second, rows):
+    """
+    boolean product of a sparse matrix with a packed one, every row ors together the
+    packed rows of second it has a True in
+    :param row_index, column_index: True entries of the first matrix, ordered by row
+    :param second: packed matrix, its rows are the first matrix's columns
+    :param rows: number of rows of the first matrix
+    :return: the product, packed
+    """
+    product = np.zeros((rows, second.shape[1]), dtype=WORD)
+    if len(row_index):
+        starts = np.flatnonzero(np.r_[True, row_index[1:] != row_index[:-1]])
+        product[row_index[starts]] = np.bitwise_or.reduceat(second[column_index], starts, axis=0)
+    return product
+
+
+def _nonzero(packed):
+    """
+    :return: (row, bit) arrays of the set bits of a packed matrix, only its nonzero words
+             are unpacked
+    """
+    rows, words = np.nonzero(packed)
+    bits = np.unpackbits(packed[rows, words].view(np.uint8), bitorder="little").reshape(-1, 64)
+    found, offsets = np.nonzero(bits)
+    return rows[found], words[found] * 64 + offsets
+
+
+def mutex_product(gives, takes, givers, takers, actions):
+    """
+    :param gives, takes: (row index, fact id) of the layer's incidence matrices
+    :param givers, takers: the incidence matrices transposed and packed
+    :param actions: number of actions of the layer
+    :return: the packed action x action mutex matrix
+    """
+    return _or_product(*gives, takers, actions) | _or_product(*takes, givers, actions)
+
+
+def find_mutex(graph, action_ids, state_pos, state_neg, product=mutex_product):
+    """
+    same rules and results as BitLevel.find_mutex
+    :param graph: bitgraph.BitGraph, its incidence table is created or updated
+    :param action_ids: array of the action ids of the action layer
+    :param state_pos: bitset of the level's positive facts
+    :param state_neg: bitset of the level's negative facts
+    :param product: function computing the mutex product, with mutex_product's arguments
+    :return: (action_mutex, noop_mutex_pos, noop_mutex_neg, fact_mutex) as BitLevel keeps them
+    """
+    if graph.incidence is None:
+        graph.incidence = IncidenceTable()
+    table = graph.incidence
+    table.update(graph.actions)
+    action_ids = np.asarray(action_ids, dtype=np.intp)
+    actions = len(action_ids)
+    facts = len(graph.facts)
+
+    # an action is mutex with another when one needs or adds what the other
+    # deletes or needs absent: inconsistent effects, interference and competing needs
+    gives = _rows(table.gives, action_ids)
+    takes = _rows(table.takes, action_ids)
+    # facts x actions, bit i of row f is set when action i gives or takes fact f
+    givers = _pack(gives[1], gives[0], (facts, actions))
+    takers = _pack(takes[1], takes[0], (facts, actions))
+    mutex = product(gives, takes, givers, takers, actions)
+    action_mutex = _to_ints(mutex)
+
+    noop_mutex_pos, noop_mutex_neg = {}, {}
+    noops = []
+    if graph.implicit_noops:
+        # a no-op needs and adds its fact or needs and deletes its absence
+        for state, against, noop_mutex in ((state_pos, takers, noop_mutex_pos),
+                                           (state_neg, givers, noop_mutex_neg)):
+            noop_facts = _bits(state)
+            noop_mutex_rows = against[noop_facts]
+            noops.append((noop_facts, noop_mutex_rows))
+            used = np.flatnonzero(noop_mutex_rows.any(axis=1))
+            noop_mutex.update(zip(noop_facts[used].tolist(), _to_ints(noop_mutex_rows[used])))
+
+    # Inconsistent support, between the single effects of two mutex actions or no-ops
+    effect = table.single_effect[action_ids]
+    single = np.flatnonzero(effect >= 0)
+    single_mask = _pack(np.zeros(len(single), dtype=np.intp), single, (1, actions))
+    rows, others = _nonzero(mutex[single] & single_mask)
+    firsts = [effect[single[rows]]]
+    seconds = [effect[others]]
+    for noop_facts, noop_mutex_rows in noops:
+        rows, others = _nonzero(noop_mutex_rows & single_mask)
+        firsts.append(noop_facts[rows])
+        seconds.append(effect[others])
+    if graph.implicit_noops:
+        # the two no-ops of a fact that is both true and false
+        both = _bits(state_pos & state_neg)
+        firsts.append(both)
+        seconds.append(both)
+    firsts, seconds = np.concatenate(firsts + seconds), np.concatenate(seconds + firsts)
+
+    fact_mutex = {}
+    if len(firsts):
+        mutex_facts, row_index = np.unique(firsts, return_inverse=True)
+        packed = _pack(row_index, seconds, (len(mutex_facts), facts))
+        fact_mutex = dict(zip(mutex_facts.tolist(), _to_ints(packed)))
+    return action_mutex, noop_mutex_pos, noop_mutex_neg, fact_mutex
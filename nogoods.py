@@ -0,0 +1,80 @@
+def canonical_goals(goals_pos, goals_neg):
+    """
+    order independent key of a goal set, negative goals are tagged with "not"
+    :param goals_pos: list of positive goals
+    :param goals_neg: list of negative goals
+    :return: frozenset of the goals
+    """
+    return frozenset(goals_pos) | frozenset(("not", goal) for goal in goals_neg)
+
+
+class NogoodTable:
+    """
+    Memo of goal sets that are known to fail at a level of the planning graph.
+    Lookups of an exact goal set are O(1). With subsumption enabled any superset of
+    a failing goal set is reported as failing as well.
+    """
+
+    def __init__(self, subsumption=True):
+        self.subsumption = subsumption
+        # level number -> set of failing goal sets
+        self.exact = {}
+        # level number -> goal -> failing goal sets indexed by one of their goals
+        self.by_goal = {}
+        self.lookups = 0
+        self.exact_hits = 0
+        self.subsumed_hits = 0
+
+    def __len__(self):
+        return sum(len(goal_sets) for goal_sets in self.exact.values())
+
+    def add(self, level_num, goals_pos, goals_neg):
+        """
+        record that the goals can't be achieved at the level
+        :param level_num: index of the level counted from the first level
+        """
+        self._add(level_num, canonical_goals(goals_pos, goals_neg))
+
+    def update(self, other):
+        """
+        add the failing goal sets another table learned on the same planning graph
+        :param other: NogoodTable
+        """
+        for level_num, goal_sets in other.exact.items():
+            for goals in goal_sets:
+                self._add(level_num, goals)
+
+    def _add(self, level_num, goals):
+        level_nogoods = self.exact.setdefault(level_num, set())
+        if goals in level_nogoods:
+            return
+        level_nogoods.add(goals)
+        if goals:
+            self.by_goal.setdefault(level_num, {}).setdefault(next(iter(goals)), []).append(goals)
+
+    def is_nogood(self, level_num, goals_pos, goals_neg):
+        """
+        :return: True if the goals, or a subset of them, are known to fail at the level
+        """
+        self.lookups += 1
+        goals = canonical_goals(goals_pos, goals_neg)
+        if goals in self.exact.get(level_num, ()):
+            self.exact_hits += 1
+            return True
+
+        if self.subsumption:
+            level_index = self.by_goal.get(level_num, {})
+            for goal in goals:
+                for nogood in level_index.get(goal, ()):
+                    if nogood <= goals:
+                        self.subsumed_hits += 1
+                        return True
+        return False
+
+    def stats(self):
+        hits = self.exact_hits + self.subsumed_hits
+        return {"size": len(self),
+                "lookups": self.lookups,
+                "exact_hits": self.exact_hits,
+                "subsumed_hits": self.subsumed_hits,
+                "hit_rate": hits / self.lookups if self.lookups else 0.0}
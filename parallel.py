@@ -0,0 +1,199 @@
+"""
+Parallel expansion of the bitset planning graphs.
+Finding the applicable actions of a level and the rows of its mutex product are split
+into contiguous ranges over a process pool. The level data the workers read lives in
+shared memory, the tasks only carry the names of the blocks and their range, and every
+worker writes its rows into a shared output. The ranges are put together in order, so
+the graph is the same as the serial one bit for bit.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import matrixmutex
+
+# levels with fewer actions are expanded serially, the pool round trip costs more
+MIN_PARALLEL_ACTIONS = 2000
+
+# shared memory blocks a worker has open, name -> SharedMemory
+_attached = {}
+
+
+class SharedArray:
+    """
+    numpy array in a shared memory block, the owner unlinks it with close
+    """
+
+    def __init__(self, array):
+        array = np.ascontiguousarray(array)
+        self.shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self.spec = (self.shm.name, array.shape, array.dtype.str)
+        self.array = np.ndarray(array.shape, dtype=array.dtype, buffer=self.shm.buf)
+        self.array[...] = array
+
+    @classmethod
+    def empty(cls, shape, dtype):
+        return cls(np.zeros(shape, dtype=dtype))
+
+    def close(self):
+        self.array = None
+        self.shm.close()
+        self.shm.unlink()
+
+
+def _open(spec, keep=False):
+    """
+    :param spec: (name, shape, dtype) of a SharedArray
+    :param keep: leave the block open for the next tasks
+    :return: the SharedMemory block, to close once its arrays are gone unless it's kept
+    """
+    name = spec[0]
+    shm = _attached.get(name)
+    if shm is None:
+        # the pool's workers share the owner's resource tracker, which unlinks the block only
+        # if the owner didn't
+        shm = shared_memory.SharedMemory(name=name)
+        if keep:
+            _attached[name] = shm
+    return shm
+
+
+def _view(shm, spec):
+    _, shape, dtype = spec
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _keep_only(specs):
+    # the ground action masks of a graph that is not expanded any more
+    names = set(spec[0] for spec in specs)
+    for name in list(_attached):
+        if name not in names:
+            _attached.pop(name).close()
+
+
+def _applicable_rows(pre_pos, pre_neg, state, out, start, stop):
+    out[start:stop] = ~((pre_pos[start:stop] & ~state).any(axis=1) |
+                        (pre_neg[start:stop] & state).any(axis=1))
+
+
+def _applicable_task(pre_pos_spec, pre_neg_spec, state, out_spec, start, stop):
+    _keep_only((pre_pos_spec, pre_neg_spec))
+    pre_pos = _open(pre_pos_spec, keep=True)
+    pre_neg = _open(pre_neg_spec, keep=True)
+    out = _open(out_spec)
+    try:
+        _applicable_rows(_view(pre_pos, pre_pos_spec), _view(pre_neg, pre_neg_spec), state,
+                         _view(out, out_spec), start, stop)
+    finally:
+        out.close()
+
+
+def _mutex_rows(gives, takes, givers, takers, out, start, stop):
+    product = None
+    for (row_index, column_index), packed in ((gives, takers), (takes, givers)):
+        first, last = np.searchsorted(row_index, (start, stop))
+        rows = matrixmutex._or_product(row_index[first:last] - start, column_index[first:last],
+                                       packed, stop - start)
+        product = rows if product is None else product | rows
+    out[start:stop] = product
+
+
+def _mutex_task(gives_spec, takes_spec, givers_spec, takers_spec, out_spec, start, stop):
+    specs = (gives_spec, takes_spec, givers_spec, takers_spec, out_spec)
+    blocks = [_open(spec) for spec in specs]
+    try:
+        _mutex_rows(*[_view(shm, spec) for shm, spec in zip(blocks, specs)], start, stop)
+    finally:
+        for shm in blocks:
+            shm.close()
+
+
+def _ranges(size, parts):
+    """
+    :return: list of (start, stop) splitting range(size) into at most parts contiguous ranges
+    """
+    parts = max(1, min(parts, size))
+    bounds = [size * i // parts for i in range(parts + 1)]
+    return [(start, stop) for start, stop in zip(bounds, bounds[1:]) if start < stop]
+
+
+def _words(bitset, words):
+    return np.frombuffer(bitset.to_bytes(words * 8, "little"), dtype=matrixmutex.WORD)
+
+
+class ParallelExpander:
+    """
+    Process pool a BitGraph expands its levels with, set as the graph's parallel attribute.
+    """
+
+    def __init__(self, workers, min_actions=MIN_PARALLEL_ACTIONS):
+        """
+        :param workers: number of worker processes
+        :param min_actions: smallest action layer, or ground action table, split over the workers
+        """
+        self.workers = workers
+        self.min_actions = min_actions
+        self.pool = ProcessPoolExecutor(workers)
+        # (graph, number of facts, pre_pos SharedArray, pre_neg SharedArray) of the ground actions
+        self._masks = None
+
+    def close(self):
+        self.pool.shutdown()
+        self._drop_masks()
+
+    def _drop_masks(self):
+        if self._masks is not None:
+            for shared in self._masks[2:]:
+                shared.close()
+            self._masks = None
+
+    def _ground_masks(self, graph):
+        facts = len(graph.facts)
+        if self._masks is not None and self._masks[0] is graph and self._masks[1] == facts:
+            return self._masks
+        self._drop_masks()
+        words = -(-facts // 64)
+        ground = [graph.actions[action_id] for action_id in graph.ground_action_ids]
+        pre_pos = np.array([_words(action.pre_pos_mask, words) for action in ground],
+                           dtype=matrixmutex.WORD).reshape(len(ground), words)
+        pre_neg = np.array([_words(action.pre_neg_mask, words) for action in ground],
+                           dtype=matrixmutex.WORD).reshape(len(ground), words)
+        self._masks = (graph, facts, SharedArray(pre_pos), SharedArray(pre_neg))
+        return self._masks
+
+    def applicable(self, graph, state_pos):
+        """
+        :return: list of the ground action ids whose preconditions hold in the state,
+                 in the order of graph.ground_action_ids
+        """
+        _, facts, pre_pos, pre_neg = self._ground_masks(graph)
+        state = _words(state_pos, -(-facts // 64))
+        ground_action_ids = graph.ground_action_ids
+        out = SharedArray.empty(len(ground_action_ids), bool)
+        try:
+            futures = [self.pool.submit(_applicable_task, pre_pos.spec, pre_neg.spec, state, out.spec,
+                                        start, stop)
+                       for start, stop in _ranges(len(ground_action_ids), self.workers)]
+            for future in futures:
+                future.result()
+            return [ground_action_ids[i] for i in np.flatnonzero(out.array).tolist()]
+        finally:
+            out.close()
+
+    def mutex_product(self, gives, takes, givers, takers, actions):
+        """
+        matrixmutex's mutex product with its rows split over the workers
+        """
+        shared = [SharedArray(array) for array in (np.stack(gives), np.stack(takes), givers, takers)]
+        out = SharedArray.empty((actions, givers.shape[1]), matrixmutex.WORD)
+        try:
+            specs = [array.spec for array in shared]
+            futures = [self.pool.submit(_mutex_task, *specs, out.spec, start, stop)
+                       for start, stop in _ranges(actions, self.workers)]
+            for future in futures:
+                future.result()
+            return out.array.copy()
+        finally:
+            for array in shared + [out]:
+                array.close()
@@ -1,5 +1,52 @@
 from aima3.planning import *
 
+# (op, args) -> the Term shared by every equal atom
+_terms = {}
+# pddl word -> its aima3 name
+_names = {}
+
+
+class Term(Expr):
+    """
+    aima3 Expr of a pddl atom, symbol or action name.
+    Terms are interned by intern_term, so equal atoms are the same object, and the hash is
+    computed once. They compare and hash equal to plain Exprs of the same atom.
+    """
+
+    def __init__(self, op, *args):
+        super().__init__(op, *args)
+        self._hash = Expr.__hash__(self)
+
+    def __hash__(self):
+        return self._hash
+
+    def __reduce__(self):
+        # hashes of strings change between processes, intern again when unpickled
+        return intern_term, (self.op, self.args)
+
+
+def intern_term(op, args=()):
+    """
+    :param op: name of the predicate or symbol
+    :param args: tuple of Terms
+    :return: the shared Term of the atom
+    """
+    key = (op, args)
+    term = _terms.get(key)
+    if term is None:
+        term = _terms[key] = Term(op, *args)
+    return term
+
+
+def clear_terms():
+    """
+    forget the interned atoms, called for every new problem so the tables don't grow over
+    a session. Terms already made stay equal to the new ones but aren't the same objects.
+    """
+    _terms.clear()
+    _names.clear()
+
+
 def to_pddl_aima_obj(domprob):
     """
     create a PDDL object to insert to the GraphPlan object.
@@ -11,12 +58,33 @@ def to_pddl_aima_obj(domprob):
     for init in list(domprob.initialstate()):
         inits.append(parse_pddl2expr(init))
 
+    return PDDL(inits, parse_pddl2actions(domprob), make_goal_test(domprob))
+    # Create the actions
+
+def compile_goals(domprob):
+    """
+    parse the goals of the problem once, duplicates removed and sorted
+    :param domprob: pddlpy object outputted from DomainProblem
+    :return: (positive goals, negative goals), tuples of interned Terms
+    """
+    # pddlpy keeps the goals in a set, sorted so they are tried in the same order every run
+    goals_pos = tuple(sorted(set(parse_pddl2expr(goal) for goal in domprob.goals()), key=str))
+    # pddlpy doesn't report negative goals
+    goals_neg = ()
+    return goals_pos, goals_neg
+
+def make_goal_test(domprob):
+    """
+    :param domprob: pddlpy object outputted from DomainProblem
+    :return: function telling if a FolKB satisfies the goals of the problem
+    """
+    goals_pos, _ = compile_goals(domprob)
+
     def goal_test(kb):
-        required = [expr(i) for i in list(domprob.goals())]
-        return all([kb.ask(q) is not False for q in required])
+        clauses = set(kb.clauses)
+        return all(goal in clauses for goal in goals_pos)
 
-    return PDDL(inits, parse_pddl2actions(domprob), goal_test)
-    # Create the actions
+    return goal_test
 
 def parse_pddl2actions(domprob):
     """
@@ -40,31 +108,37 @@ def parse_pddl2actions(domprob):
 
 def parse_pddl2expr(pddl_atom):
     """
-
-    :param pddl_tuple: given a tuple of the form ("name", "value","value2)
-                       will return aima3 expr() of the tuple
-    :return:
+    :param pddl_atom: pddlpy Atom or tuple of the form ("name", "value", "value2")
+    :return: interned Term of the atom
     """
-    pddl_list = list(eval(string_handler(pddl_atom)))
-    expresion = str(pddl_list.pop(0))
-    expresion += parse_list(pddl_list)
-    return expr(expresion)
-
-def parse_action_name(operator):
+    pddl_atom = getattr(pddl_atom, "predicate", pddl_atom)
+    return intern_term(symbol_name(pddl_atom[0]), parse_list(pddl_atom[1:]))
 
-
-    expresion = string_handler(operator.operator_name)
-    expresion += parse_list(list(operator.variable_list.keys()))
-    return expr(expresion)
+def parse_action_name(operator, binding=None):
+    """
+    :param operator: pddlpy Operator
+    :param binding: optional dictionary from the operator's variables to objects
+    :return: interned Term of the action, like pick-up(?x) -> pickup(x)
+    """
+    variables = list(operator.variable_list.keys())
+    if binding is not None:
+        variables = [binding[var] for var in variables]
+    return intern_term(symbol_name(operator.operator_name), parse_list(variables))
 
 def parse_list(value_list):
-    expresion = "("
-    for word in value_list:
-        expresion += string_handler(word)
-        expresion += ", " if word != value_list[-1] else ""
+    """
+    :return: tuple of the interned symbols of the words
+    """
+    return tuple(intern_term(symbol_name(word)) for word in value_list)
 
-    expresion += ")"
-    return expresion
+def symbol_name(word):
+    """
+    string_handler, cached as the same words come back in every atom
+    """
+    name = _names.get(word)
+    if name is None:
+        name = _names[word] = string_handler(word)
+    return name
 
 def string_handler(string_type_object):
     string_type_object = str(string_type_object)
@@ -72,5 +146,3 @@ def string_handler(string_type_object):
     string_type_object = string_type_object.replace("?", "")
     string_type_object = string_type_object.lower()
     return string_type_object
-
-
@@ -0,0 +1,132 @@
+"""
+Solution extraction raced between several configurations.
+How fast extraction is depends on the order the goals and their supporters are tried
+in, and no order wins everywhere. A portfolio extracts from the same expanded graph with
+every configuration at once, each in a forked process that shares the graph copy on
+write, and takes the first plan found. A configuration that exhausts its search proves
+that the level has no plan, so the others are stopped then as well.
+"""
+import multiprocessing
+from multiprocessing.connection import wait
+import time
+
+from budget import BudgetExceeded, TIME
+from nogoods import NogoodTable
+
+
+class ExtractionConfig:
+    """
+    One way to extract a solution, see MyGraphPlan.order_goals and order_supporters.
+    """
+    __slots__ = ("name", "extractor", "goal_order", "noops_first", "subsumption")
+
+    def __init__(self, name, extractor="csp", goal_order="given", noops_first=None, subsumption=True):
+        """
+        :param name: reported as the winner of a race
+        :param extractor: one of engine.EXTRACTORS
+        :param goal_order: one of engine.GOAL_ORDERS
+        :param noops_first: try no-ops first when True, last when False, None keeps the graph's order
+        :param subsumption: prune supersets of failing goal sets, not only exact matches
+        """
+        self.name = name
+        self.extractor = extractor
+        self.goal_order = goal_order
+        self.noops_first = noops_first
+        self.subsumption = subsumption
+
+    def __repr__(self):
+        return f"ExtractionConfig({self.name!r})"
+
+
+DEFAULT_PORTFOLIO = (
+    ExtractionConfig("csp"),
+    ExtractionConfig("csp-noops-first", noops_first=True),
+    ExtractionConfig("csp-reversed-actions-first", goal_order="reversed", noops_first=False),
+    ExtractionConfig("product"),
+    ExtractionConfig("product-fewest-noops-first", "product", "fewest_supporters", noops_first=True),
+    ExtractionConfig("product-most-exact-memo", "product", "most_supporters", subsumption=False),
+)
+
+
+def _nodes(graphplan):
+    # the budget counts the nodes of a search that was stopped as well
+    return graphplan.extract_nodes if graphplan.budget is None else graphplan.budget.nodes
+
+
+def _extract(graphplan, graph, config, goals_pos, goals_neg, connection):
+    graphplan.goal_order = config.goal_order
+    graphplan.noops_first = config.noops_first
+    learned = NogoodTable(config.subsumption)
+    learned.update(graphplan.nogoods)
+    graphplan.nogoods = learned
+    graphplan.solution = []
+    nodes = _nodes(graphplan)
+    try:
+        solution = graphplan.extract(goals_pos, goals_neg, -1, config.extractor, graph)
+        result = ("solved", solution) if solution else ("failed", learned)
+    except BudgetExceeded as e:
+        result = ("limit", e.limit)
+    except Exception as e:
+        result = ("error", e)
+    connection.send(result + (_nodes(graphplan) - nodes,))
+    connection.close()
+
+
+def race(graphplan, goals_pos, goals_neg, configs=DEFAULT_PORTFOLIO):
+    """
+    extract a solution of the goals at the last level with every configuration at once
+    :param graphplan: MyGraphPlan, its budget limits every configuration on its own and
+                      the whole race by time, the nogoods the losers learned are added to it
+    :param configs: ExtractionConfigs to race
+    :return: (solution, winning ExtractionConfig), (False, None) if the level has no solution
+    """
+    if "fork" not in multiprocessing.get_all_start_methods():
+        raise ValueError("portfolio extraction needs the fork start method")
+    context = multiprocessing.get_context("fork")
+    budget = graphplan.budget
+    # sliced once here, the workers share it copy on write like the graph
+    graph = graphplan.extraction_graph(goals_pos, goals_neg)
+
+    workers = {}
+    for config in configs:
+        reader, writer = context.Pipe(duplex=False)
+        process = context.Process(target=_extract, args=(graphplan, graph, config, goals_pos, goals_neg, writer),
+                                  daemon=True)
+        process.start()
+        writer.close()
+        workers[reader] = (config, process)
+
+    limits = []
+    try:
+        while workers:
+            timeout = None
+            if budget is not None and budget.deadline is not None:
+                timeout = max(0, budget.deadline - time.perf_counter())
+            ready = wait(list(workers), timeout)
+            if not ready:
+                raise BudgetExceeded(TIME)
+            for reader in ready:
+                config, process = workers.pop(reader)
+                try:
+                    status, value, nodes = reader.recv()
+                except EOFError:
+                    status, value, nodes = "error", RuntimeError(f"{config.name} extraction died"), 0
+                reader.close()
+                process.join()
+                if budget is not None:
+                    budget.nodes += nodes
+                if status == "solved":
+                    return value, config
+                if status == "failed":
+                    graphplan.nogoods.update(value)
+                    return False, None
+                if status == "limit":
+                    limits.append(value)
+                else:
+                    raise value
+        raise BudgetExceeded(limits[0])
+    finally:
+        for reader, (config, process) in workers.items():
+            process.terminate()
+            process.join()
+            reader.close()
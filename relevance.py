@@ -0,0 +1,107 @@
+"""
+Goal relevance of the planning graph.
+Going backwards from the goals, the relevant actions of a level are the supporters of
+its relevant next facts, and its relevant facts are the preconditions of those actions.
+Extraction never looks at anything else, so it can run on a slice of the graph holding
+only these nodes and the mutexes between them, and the GUI can draw only them.
+"""
+
+
+def relevant_nodes(graph, goals_pos, goals_neg, index=-1):
+    """
+    :param graph: planning graph of any engine
+    :param index: index of the level of the goals
+    :return: list of (positive facts, negative facts, actions) sets, one per level up to the
+             level of the goals, the actions of that level are empty
+    """
+    levels = graph.levels[:len(graph.levels) + index + 1]
+    facts_pos = set(goals_pos) & set(levels[-1].current_state_pos)
+    facts_neg = set(goals_neg) & set(levels[-1].current_state_neg)
+    relevant = [(facts_pos, facts_neg, set())]
+    for level in reversed(levels[:-1]):
+        actions = set()
+        for fact in facts_pos:
+            actions.update(level.next_state_links_pos.get(fact, ()))
+        for fact in facts_neg:
+            actions.update(level.next_state_links_neg.get(fact, ()))
+        facts_pos, facts_neg = set(), set()
+        for action in actions:
+            facts_pos.update(level.current_action_links_pos.get(action, ()))
+            facts_neg.update(level.current_action_links_neg.get(action, ()))
+        relevant.append((facts_pos, facts_neg, actions))
+    relevant.reverse()
+    return relevant
+
+
+class SlicedLevel:
+    """
+    Read only view of a level with only its goal relevant facts, actions and links.
+    """
+    __slots__ = ("current_state_pos", "current_state_neg", "current_action_links_pos",
+                 "current_action_links_neg", "current_state_links_pos", "current_state_links_neg",
+                 "next_action_links", "next_state_links_pos", "next_state_links_neg", "mutex")
+
+    def __init__(self, level, relevant, next_relevant):
+        """
+        :param level: aima3 Level or bitgraph.BitLevel
+        :param relevant: (positive facts, negative facts, actions) of the level
+        :param next_relevant: the same of the next level
+        """
+        facts_pos, facts_neg, actions = relevant
+        next_facts_pos, next_facts_neg, _ = next_relevant
+        # the graph's order comes from iterating sets and changes from run to run, the slice
+        # is sorted by name so extraction on it searches in the same order every time
+        self.current_state_pos = sorted(facts_pos.intersection(level.current_state_pos), key=str)
+        self.current_state_neg = sorted(facts_neg.intersection(level.current_state_neg), key=str)
+        # the links of relevant nodes only lead to relevant nodes, except from a fact to
+        # the actions that need it
+        self.current_action_links_pos = _only(level.current_action_links_pos, actions)
+        self.current_action_links_neg = _only(level.current_action_links_neg, actions)
+        self.current_state_links_pos = {fact: [action for action in links if action in actions]
+                                        for fact, links in _only(level.current_state_links_pos,
+                                                                 facts_pos).items()}
+        self.current_state_links_neg = {fact: [action for action in links if action in actions]
+                                        for fact, links in _only(level.current_state_links_neg,
+                                                                 facts_neg).items()}
+        self.next_action_links = _only(level.next_action_links, actions)
+        self.next_state_links_pos = _only(level.next_state_links_pos, next_facts_pos)
+        self.next_state_links_neg = _only(level.next_state_links_neg, next_facts_neg)
+        if isinstance(level.mutex, list):
+            # aima3 levels keep a list of action and next fact pairs that is searched through,
+            # drop the irrelevant ones
+            kept = actions | next_facts_pos | next_facts_neg
+            self.mutex = [pair for pair in level.mutex if pair <= kept]
+        else:
+            # tested in constant time already
+            self.mutex = level.mutex
+
+
+def _only(links, keys):
+    return {key: sorted(links[key], key=str) for key in sorted(keys, key=str) if key in links}
+
+
+class SlicedGraph:
+    """
+    The levels of a planning graph sliced to the nodes relevant to goals, see relevant_nodes.
+    Levels after the goals' level are left whole. Goal tests are answered by the graph.
+    """
+
+    def __init__(self, graph, goals_pos, goals_neg, index=-1):
+        """
+        :param graph: planning graph of any engine
+        :param index: index of the level of the goals
+        """
+        self.graph = graph
+        relevant = relevant_nodes(graph, goals_pos, goals_neg, index)
+        self.levels = [SlicedLevel(level, level_relevant, next_relevant)
+                       for level, level_relevant, next_relevant in zip(graph.levels, relevant, relevant[1:])]
+        self.levels += graph.levels[len(self.levels):]
+        if hasattr(graph, "mutex_index"):
+            # the graph's index of the whole levels answers for the sliced ones as well
+            self.mutex_index = graph.mutex_index
+
+    def goals_hold(self, goals_pos, index):
+        return self.graph.goals_hold(goals_pos, index)
+
+    def non_mutex_goals(self, goals, index):
+        return self.graph.non_mutex_goals(goals, index)
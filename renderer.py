@@ -0,0 +1,107 @@
+import matplotlib.pyplot as plt
+from matplotlib.collections import LineCollection
+import numpy as np
+
+# same look as the networkx defaults used before
+NODE_STYLES = {
+    "pos_state": {"c": "green", "marker": "o"},
+    "neg_state": {"c": "red", "marker": "o"},
+    "action": {"c": "#1f78b4", "marker": "s"},
+}
+NODE_SIZE = 300
+EDGE_COLOR = "black"
+MUTEX_COLOR = "red"
+LABEL_FONT_SIZE = 12
+
+
+class CollectionRenderer:
+    """
+    Draws a laid out planning graph with one scatter per node type and a single
+    LineCollection for all the edges, so the number of matplotlib artists does not grow
+    with the graph. Labels are a level of detail: they are only drawn for the nodes inside
+    the view, and only when there are at most max_labels of them, and they are updated
+    whenever the axes are zoomed or panned.
+    """
+
+    def __init__(self, max_labels=150):
+        self.max_labels = max_labels
+        self.ax = None
+        self._label_nodes = []
+        self._label_texts = []
+        self._label_xy = np.empty((0, 2))
+        self._texts = []
+        self._callbacks = []
+
+    def draw(self, ax, pos, nodes_by_type, edges, labels):
+        """
+        :param ax: matplotlib axes to draw on, None for the current axes
+        :param pos: position dictionary of the nodes
+        :param nodes_by_type: dictionary from a key of NODE_STYLES to a list of nodes
+        :param edges: list of (node, node) pairs
+        :param labels: dictionary from node to its label
+        """
+        if ax is None:
+            ax = plt.gca()
+        self._disconnect()
+        self.ax = ax
+
+        if edges:
+            segments = np.array([(pos[u], pos[v]) for u, v in edges], dtype=float)
+            ax.add_collection(LineCollection(segments, colors=EDGE_COLOR, linewidths=1.0, zorder=1))
+
+        for node_type, nodes in nodes_by_type.items():
+            if not nodes:
+                continue
+            xy = np.array([pos[node] for node in nodes], dtype=float)
+            ax.scatter(xy[:, 0], xy[:, 1], s=NODE_SIZE, zorder=2, **NODE_STYLES[node_type])
+
+        ax.tick_params(axis="both", which="both", bottom=False, left=False,
+                       labelbottom=False, labelleft=False)
+        ax.autoscale_view()
+
+        self._label_nodes = list(labels)
+        self._label_texts = [labels[node] for node in self._label_nodes]
+        self._label_xy = np.array([pos[node] for node in self._label_nodes], dtype=float).reshape(-1, 2)
+        self._texts = []
+        self.update_labels()
+        self._callbacks = [ax.callbacks.connect("xlim_changed", self.update_labels),
+                           ax.callbacks.connect("ylim_changed", self.update_labels)]
+
+    def draw_mutexes(self, ax, pos, pairs):
+        """
+        draw node pairs as dashed lines on top of the edges
+        :param pairs: list of (node, node) pairs
+        """
+        if ax is None:
+            ax = plt.gca()
+        if not pairs:
+            return
+        segments = np.array([(pos[u], pos[v]) for u, v in pairs], dtype=float)
+        ax.add_collection(LineCollection(segments, colors=MUTEX_COLOR, linestyles="dashed",
+                                         linewidths=1.0, zorder=1.5))
+
+    def update_labels(self, ax=None):
+        """
+        draw the labels of the nodes in view, or none if there are too many to read
+        """
+        for text in self._texts:
+            text.remove()
+        self._texts = []
+        if not len(self._label_xy):
+            return
+
+        (x0, x1), (y0, y1) = sorted(self.ax.get_xlim()), sorted(self.ax.get_ylim())
+        x, y = self._label_xy[:, 0], self._label_xy[:, 1]
+        in_view = np.flatnonzero((x >= x0) & (x <= x1) & (y >= y0) & (y <= y1))
+        if len(in_view) > self.max_labels:
+            return
+
+        for i in in_view:
+            self._texts.append(self.ax.text(x[i], y[i], self._label_texts[i], fontsize=LABEL_FONT_SIZE,
+                                            ha="center", va="center", zorder=3, clip_on=True))
+
+    def _disconnect(self):
+        if self.ax is not None:
+            for cid in self._callbacks:
+                self.ax.callbacks.disconnect(cid)
+        self._callbacks = []
@@ -0,0 +1,124 @@
+import math
+
+
+class GridIndex:
+    """
+    Uniform grid over 2d points for nearest and radius queries.
+    Queries take x_scale and y_scale, the data units per distance unit on each axis, so
+    the caller can measure distances in screen pixels while the points stay in data
+    coordinates.
+    """
+
+    def __init__(self, cell_width=0.5, cell_height=0.05):
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.cells = {}
+        self.points = {}
+        # bounding box of the cells ever used, (min_x, min_y, max_x, max_y)
+        self.bounds = None
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self, key):
+        return key in self.points
+
+    def _cell(self, x, y):
+        return math.floor(x / self.cell_width), math.floor(y / self.cell_height)
+
+    def insert(self, key, x, y):
+        if key in self.points:
+            self.remove(key)
+        self.points[key] = (x, y)
+        cell = self._cell(x, y)
+        self.cells.setdefault(cell, set()).add(key)
+        if self.bounds is None:
+            self.bounds = cell + cell
+        else:
+            min_x, min_y, max_x, max_y = self.bounds
+            self.bounds = (min(min_x, cell[0]), min(min_y, cell[1]), max(max_x, cell[0]), max(max_y, cell[1]))
+
+    def remove(self, key):
+        x, y = self.points.pop(key)
+        cell = self._cell(x, y)
+        keys = self.cells[cell]
+        keys.discard(key)
+        if not keys:
+            del self.cells[cell]
+
+    def clear(self):
+        self.cells.clear()
+        self.points.clear()
+        self.bounds = None
+
+    def _ring(self, center, radius):
+        """
+        :return: the cells at chebyshev distance radius from the center cell
+        """
+        cx, cy = center
+        if radius == 0:
+            yield center
+            return
+        for i in range(-radius, radius + 1):
+            yield cx + i, cy - radius
+            yield cx + i, cy + radius
+        for j in range(-radius + 1, radius):
+            yield cx - radius, cy + j
+            yield cx + radius, cy + j
+
+    def _distance(self, key, x, y, x_scale, y_scale):
+        px, py = self.points[key]
+        return math.hypot((px - x) / x_scale, (py - y) / y_scale)
+
+    def nearest(self, x, y, x_scale=1.0, y_scale=1.0, max_distance=None):
+        """
+        :param max_distance: ignore points further than this, in scaled units
+        :return: (key, distance) of the nearest point, (None, None) if there is none
+        """
+        if not self.points:
+            return None, None
+        center = self._cell(x, y)
+        # beyond this ring there are no more cells
+        min_x, min_y, max_x, max_y = self.bounds
+        last_ring = max(center[0] - min_x, max_x - center[0], center[1] - min_y, max_y - center[1], 0)
+        # scaled distance that every further ring adds at least
+        step = min(self.cell_width / x_scale, self.cell_height / y_scale)
+
+        best, best_distance = None, math.inf
+        for radius in range(last_ring + 1):
+            # points in this ring and further are at least this far away
+            bound = (radius - 1) * step
+            if bound > best_distance or (max_distance is not None and bound > max_distance):
+                break
+            for cell in self._ring(center, radius):
+                for key in self.cells.get(cell, ()):
+                    distance = self._distance(key, x, y, x_scale, y_scale)
+                    if distance < best_distance:
+                        best, best_distance = key, distance
+
+        if best is None or (max_distance is not None and best_distance > max_distance):
+            return None, None
+        return best, best_distance
+
+    def within(self, x, y, radius, x_scale=1.0, y_scale=1.0):
+        """
+        :param radius: in scaled units
+        :return: list of the keys of the points within radius, nearest first
+        """
+        x_cells = math.ceil(radius * x_scale / self.cell_width)
+        y_cells = math.ceil(radius * y_scale / self.cell_height)
+        cx, cy = self._cell(x, y)
+        found = []
+        # a huge radius covers the whole grid, scan the occupied cells instead
+        if (2 * x_cells + 1) * (2 * y_cells + 1) > len(self.cells):
+            cells = [cell for cell in self.cells
+                     if abs(cell[0] - cx) <= x_cells and abs(cell[1] - cy) <= y_cells]
+        else:
+            cells = [(cx + i, cy + j) for i in range(-x_cells, x_cells + 1)
+                     for j in range(-y_cells, y_cells + 1)]
+        for cell in cells:
+            for key in self.cells.get(cell, ()):
+                distance = self._distance(key, x, y, x_scale, y_scale)
+                if distance <= radius:
+                    found.append((distance, key))
+        return [key for _, key in sorted(found)]
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+EXAMPLES = os.path.join(ROOT, "examples", "block-world")
+DOMAIN_FILE_PATH = os.path.join(EXAMPLES, "domain.pddl")
+
+TRIVIAL_PROBLEM = """(define (problem BLOCKS-2-TRIVIAL)
+(:domain BLOCKS)
+(:objects A B - block)
+(:init (CLEAR A) (CLEAR B) (ONTABLE A) (ONTABLE B) (HANDEMPTY))
+(:goal (and (ONTABLE A) (ONTABLE B)))
+)
+"""
+
+
+def example_path(name):
+    return os.path.join(EXAMPLES, f"{name}.pddl")
+
+
+@pytest.fixture
+def trivial_problem(tmp_path):
+    """
+    path to a problem whose goals already hold in the initial state
+    """
+    path = tmp_path / "trivial.pddl"
+    path.write_text(TRIVIAL_PROBLEM)
+    return str(path)
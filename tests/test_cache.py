@@ -0,0 +1,69 @@
+import os
+
+import cache
+from cache import ProblemCache, problem_key
+from engine import GraphPlanVis
+
+from conftest import DOMAIN_FILE_PATH, example_path
+
+
+def test_problem_key_depends_on_content_and_extras(tmp_path):
+    key = problem_key(DOMAIN_FILE_PATH, example_path("p03"), "aima")
+    assert key == problem_key(DOMAIN_FILE_PATH, example_path("p03"), "aima")
+    assert key != problem_key(DOMAIN_FILE_PATH, example_path("p03"), "bitset")
+    assert key != problem_key(DOMAIN_FILE_PATH, example_path("p01"), "aima")
+
+    copy = tmp_path / "p03.pddl"
+    copy.write_bytes(open(example_path("p03"), "rb").read())
+    assert key == problem_key(DOMAIN_FILE_PATH, str(copy), "aima")
+
+
+def test_store_and_load(tmp_path):
+    problem_cache = ProblemCache(str(tmp_path))
+    assert problem_cache.load("missing") is None
+    problem_cache.store("key", {"answer": [42]})
+    assert problem_cache.load("key") == {"answer": [42]}
+    assert (problem_cache.hits, problem_cache.misses) == (1, 1)
+
+
+def test_entries_of_another_version_are_dropped(tmp_path, monkeypatch):
+    problem_cache = ProblemCache(str(tmp_path))
+    problem_cache.store("key", "old")
+    monkeypatch.setattr(cache, "CACHE_VERSION", cache.CACHE_VERSION + 1)
+    assert problem_cache.load("key") is None
+    assert not os.path.exists(problem_cache._path("key"))
+
+
+def test_corrupt_entries_are_dropped(tmp_path):
+    problem_cache = ProblemCache(str(tmp_path))
+    problem_cache.store("key", "value")
+    with open(problem_cache._path("key"), "r+b") as f:
+        f.truncate(cache.HEADER.size + 2)
+    assert problem_cache.load("key") is None
+    assert not os.path.exists(problem_cache._path("key"))
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    problem_cache = ProblemCache(str(tmp_path), max_bytes=10 ** 9)
+    payload = "x" * 1000
+    for number, key in enumerate(("first", "second", "third")):
+        problem_cache.store(key, payload)
+        os.utime(problem_cache._path(key), (number, number))
+    # loading marks an entry as recently used
+    problem_cache.load("first")
+    entry_size = os.path.getsize(problem_cache._path("first"))
+    problem_cache.max_bytes = 2 * entry_size
+    problem_cache.evict()
+    assert sorted(os.listdir(str(tmp_path))) == ["first.gpv", "third.gpv"]
+
+
+def test_cached_problem_solves_like_a_parsed_one(tmp_path):
+    problem_cache = ProblemCache(str(tmp_path))
+    solutions = []
+    for _ in range(2):
+        gp = GraphPlanVis()
+        gp.create_problem(DOMAIN_FILE_PATH, example_path("p03"), engine="bitset", cache=problem_cache)
+        solutions.append(gp.solve(extractor="csp"))
+    assert problem_cache.hits == 1
+    assert solutions[0].status == solutions[1].status == "solved"
+    assert solutions[0].levels == solutions[1].levels
@@ -0,0 +1,76 @@
+import pytest
+
+import engine
+from engine import GraphPlanVis, plan_key
+from export import is_noop
+from parser import to_pddl_aima_obj
+
+from conftest import DOMAIN_FILE_PATH, example_path
+
+EXAMPLES = ("p01", "p02", "p03")
+
+
+def solve(problem_file_path, engine_name, extractor):
+    gp = GraphPlanVis()
+    gp.create_problem(DOMAIN_FILE_PATH, problem_file_path, engine=engine_name)
+    return gp, gp.solve(extractor=extractor)
+
+
+def assert_valid_plan(gp, plan):
+    """
+    replay the actions of the plan level by level from the initial state
+    """
+    pddl = to_pddl_aima_obj(gp.domprob)
+    for actions in plan:
+        for action in actions:
+            if not is_noop(action):
+                pddl.act(action)
+    assert pddl.goal_test()
+
+
+@pytest.mark.parametrize("extractor", engine.EXTRACTORS)
+@pytest.mark.parametrize("name", EXAMPLES)
+def test_engines_agree_on_examples(name, extractor):
+    results = {engine_name: solve(example_path(name), engine_name, extractor)
+               for engine_name in engine.GRAPH_ENGINES}
+    assert len({result.status for _, result in results.values()}) == 1
+    assert len({result.levels for _, result in results.values()}) == 1
+
+    plans = set()
+    for gp, result in results.values():
+        if result.solved:
+            assert_valid_plan(gp, result.solution[0])
+            plans.add(plan_key(result.solution[0]))
+    # extraction runs on the goal slice, sorted the same way for every engine
+    assert len(plans) <= 1
+
+
+@pytest.mark.parametrize("extractor", engine.EXTRACTORS)
+@pytest.mark.parametrize("engine_name", list(engine.GRAPH_ENGINES))
+def test_goals_holding_initially_give_an_empty_plan(trivial_problem, engine_name, extractor):
+    gp, result = solve(trivial_problem, engine_name, extractor)
+    assert result.status == "solved"
+    assert result.levels == 1
+    assert result.solution == [[]]
+
+
+def test_p03_is_solved():
+    gp, result = solve(example_path("p03"), "aima", "csp")
+    assert result.solved
+    assert sum(not is_noop(action) for actions in result.solution[0] for action in actions) == 6
+
+
+def test_iter_solutions_yields_distinct_valid_plans():
+    gp = GraphPlanVis()
+    gp.create_problem(DOMAIN_FILE_PATH, example_path("p03"), engine="bitset")
+    plans = list(gp.iter_solutions(max_plans=3))
+    assert plans
+    assert len({plan_key(plan) for plan in plans}) == len(plans)
+    for plan in plans:
+        assert_valid_plan(gp, plan)
+
+
+def test_unknown_engine():
+    gp = GraphPlanVis()
+    with pytest.raises(ValueError):
+        gp.create_problem(DOMAIN_FILE_PATH, example_path("p03"), engine="nope")
@@ -0,0 +1,66 @@
+import itertools
+
+import pytest
+
+from engine import GraphPlanVis
+from extraction import BackjumpingExtractor
+from export import is_noop
+
+from conftest import DOMAIN_FILE_PATH, example_path
+
+
+def expanded(engine_name, levels):
+    gp = GraphPlanVis()
+    gp.create_problem(DOMAIN_FILE_PATH, example_path("p03"), engine=engine_name)
+    while len(gp.graphplan.graph.levels) < levels:
+        gp.expand_level()
+    return gp
+
+
+@pytest.mark.parametrize("engine_name", ["aima", "bitset"])
+def test_extract_fails_below_the_plan_level_and_learns_nogoods(engine_name):
+    gp = expanded(engine_name, 7)
+    goals_pos, goals_neg = gp._goals()
+    extractor = BackjumpingExtractor(gp.graphplan)
+    assert extractor.extract(goals_pos, goals_neg, 5) is None
+    assert gp.graphplan.nogoods.is_nogood(5, goals_pos, goals_neg)
+    assert extractor.stats()["nodes"] > 0
+
+    plan = BackjumpingExtractor(gp.graphplan).extract(goals_pos, goals_neg, 6)
+    assert len(plan) == 6
+    # one real action per level, the rest are no-ops
+    assert all(sum(not is_noop(action) for action in actions) == 1 for actions in plan)
+
+
+@pytest.mark.parametrize("engine_name", ["aima", "compact", "bitset"])
+def test_plan_levels_hold_no_mutex_pair(engine_name):
+    gp = expanded(engine_name, 7)
+    goals_pos, goals_neg = gp._goals()
+    extractor = BackjumpingExtractor(gp.graphplan)
+    plan = extractor.extract(goals_pos, goals_neg, 6)
+    levels = gp.graphplan.graph.levels
+    for level_num, actions in enumerate(plan, 1):
+        is_mutex = extractor._mutex_test(level_num)
+        for first, second in itertools.combinations(actions, 2):
+            assert not is_mutex(first, second)
+            assert {first, second} not in levels[level_num - 1].mutex
+
+
+def test_mutex_test_matches_level_mutexes():
+    gp = expanded("aima", 4)
+    extractor = BackjumpingExtractor(gp.graphplan)
+    level = gp.graphplan.graph.levels[2]
+    pairs = [tuple(pair) for pair in level.mutex if len(pair) == 2]
+    assert pairs
+    is_mutex = extractor._mutex_test(3)
+    for first, second in pairs:
+        assert is_mutex(first, second) and is_mutex(second, first)
+    actions = list(level.next_action_links)
+    for first, second in itertools.combinations(actions, 2):
+        assert is_mutex(first, second) == ({first, second} in level.mutex)
+
+
+def test_goals_not_in_the_initial_state_fail_at_level_0():
+    gp = expanded("aima", 1)
+    goals_pos, goals_neg = gp._goals()
+    assert BackjumpingExtractor(gp.graphplan).extract(goals_pos, goals_neg, 0) is None
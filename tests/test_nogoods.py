@@ -0,0 +1,47 @@
+from nogoods import NogoodTable, canonical_goals
+
+
+def test_canonical_goals_ignore_order_and_tag_negatives():
+    assert canonical_goals(["a", "b"], ["c"]) == canonical_goals(["b", "a"], ["c"])
+    assert canonical_goals(["c"], []) != canonical_goals([], ["c"])
+
+
+def test_exact_nogood_is_per_level():
+    table = NogoodTable(subsumption=False)
+    table.add(2, ["a", "b"], [])
+    assert table.is_nogood(2, ["b", "a"], [])
+    assert not table.is_nogood(1, ["a", "b"], [])
+    assert table.exact_hits == 1
+
+
+def test_supersets_fail_only_with_subsumption():
+    exact, subsuming = NogoodTable(subsumption=False), NogoodTable()
+    for table in (exact, subsuming):
+        table.add(1, ["a", "b"], ["c"])
+    assert not exact.is_nogood(1, ["a", "b", "d"], ["c"])
+    assert subsuming.is_nogood(1, ["a", "b", "d"], ["c"])
+    assert subsuming.subsumed_hits == 1
+    # a subset or a set missing the negative goal is not known to fail
+    assert not subsuming.is_nogood(1, ["a"], [])
+    assert not subsuming.is_nogood(1, ["a", "b", "d"], [])
+
+
+def test_update_merges_without_duplicates():
+    table, other = NogoodTable(), NogoodTable()
+    table.add(1, ["a"], [])
+    other.add(1, ["a"], [])
+    other.add(3, ["b", "c"], [])
+    table.update(other)
+    assert len(table) == 2
+    assert table.is_nogood(3, ["c", "b", "d"], [])
+
+
+def test_stats():
+    table = NogoodTable()
+    table.add(0, ["a"], [])
+    table.is_nogood(0, ["a"], [])
+    table.is_nogood(0, ["b"], [])
+    stats = table.stats()
+    assert stats["size"] == 1
+    assert stats["lookups"] == 2
+    assert stats["hit_rate"] == 0.5
@@ -0,0 +1,62 @@
+import pickle
+import subprocess
+import sys
+
+from aima3.planning import expr
+
+import parser
+from parser import Term, clear_terms, intern_term, parse_pddl2expr
+
+from conftest import ROOT
+
+
+def test_equal_atoms_are_interned_once():
+    first = parse_pddl2expr(("ON", "A", "B-1"))
+    second = parse_pddl2expr(("ON", "A", "B-1"))
+    assert first is second
+    assert isinstance(first, Term)
+    assert str(first) == "on(a, b1)"
+    assert first.args[0] is intern_term("a")
+
+
+def test_terms_equal_and_hash_like_plain_exprs():
+    term = parse_pddl2expr(("ON", "A", "B"))
+    plain = expr("on(a, b)")
+    assert term == plain and plain == term
+    assert hash(term) == hash(plain)
+    assert plain in {term} and term in {plain}
+
+
+def test_clear_terms_empties_the_tables_but_keeps_terms_equal():
+    before = parse_pddl2expr(("CLEAR", "A"))
+    clear_terms()
+    assert not parser._terms and not parser._names
+    after = parse_pddl2expr(("CLEAR", "A"))
+    assert after is not before
+    assert after == before and hash(after) == hash(before)
+
+
+def test_unpickled_terms_are_interned_again():
+    term = parse_pddl2expr(("ON", "A", "B"))
+    assert pickle.loads(pickle.dumps(term)) is term
+
+
+def test_unpickled_terms_hash_in_another_process():
+    # string hashes change between processes, a stored hash would be wrong there
+    data = pickle.dumps(parse_pddl2expr(("ON", "A", "B")))
+    code = ("import pickle, sys\n"
+            "from aima3.planning import expr\n"
+            "term = pickle.loads(sys.stdin.buffer.read())\n"
+            "assert hash(term) == hash(expr('on(a, b)'))\n"
+            "assert term in {expr('on(a, b)')}\n")
+    subprocess.run([sys.executable, "-c", code], input=data, cwd=ROOT, check=True)
+
+
+def test_goals_are_compiled_sorted_and_unique():
+    class DomainProblem:
+        def goals(self):
+            return [("ON", "C", "D"), ("ON", "A", "B"), ("ON", "C", "D")]
+
+    goals_pos, goals_neg = parser.compile_goals(DomainProblem())
+    assert [str(goal) for goal in goals_pos] == ["on(a, b)", "on(c, d)"]
+    assert goals_neg == ()
@@ -0,0 +1,87 @@
+import pytest
+
+from engine import GraphPlanVis
+from relevance import SlicedGraph, relevant_nodes
+
+from conftest import DOMAIN_FILE_PATH, example_path
+
+
+def expanded(engine_name, levels=7):
+    gp = GraphPlanVis()
+    gp.create_problem(DOMAIN_FILE_PATH, example_path("p03"), engine=engine_name)
+    while len(gp.graphplan.graph.levels) < levels:
+        gp.expand_level()
+    return gp
+
+
+@pytest.mark.parametrize("engine_name", ["aima", "compact", "bitset"])
+def test_relevant_nodes_are_closed_under_support(engine_name):
+    gp = expanded(engine_name)
+    graph = gp.graphplan.graph
+    goals_pos, goals_neg = gp._goals()
+    relevant = relevant_nodes(graph, goals_pos, goals_neg)
+    assert len(relevant) == len(graph.levels)
+    assert relevant[-1] == (set(goals_pos), set(goals_neg), set())
+
+    for level, (facts_pos, facts_neg, actions), (next_pos, next_neg, _) in zip(
+            graph.levels, relevant, relevant[1:]):
+        assert facts_pos <= set(level.current_state_pos)
+        # every supporter of a relevant fact is relevant, and so are its preconditions
+        for fact in next_pos:
+            assert set(level.next_state_links_pos[fact]) <= actions
+        for action in actions:
+            assert set(level.current_action_links_pos.get(action, ())) <= facts_pos
+            assert set(level.current_action_links_neg.get(action, ())) <= facts_neg
+
+
+@pytest.mark.parametrize("engine_name", ["aima", "bitset"])
+def test_sliced_levels_hold_only_relevant_nodes(engine_name):
+    gp = expanded(engine_name)
+    graph = gp.graphplan.graph
+    goals_pos, goals_neg = gp._goals()
+    sliced = SlicedGraph(graph, goals_pos, goals_neg)
+    relevant = relevant_nodes(graph, goals_pos, goals_neg)
+    assert len(sliced.levels) == len(graph.levels)
+    assert sliced.levels[-1] is graph.levels[-1]
+
+    for level, (facts_pos, _, actions) in zip(sliced.levels[:-1], relevant):
+        assert set(level.current_state_pos) == facts_pos
+        assert set(level.current_action_links_pos) <= actions
+        assert level.current_state_pos == sorted(level.current_state_pos, key=str)
+        for links in level.current_state_links_pos.values():
+            assert set(links) <= actions
+
+
+def test_slice_of_an_earlier_level_leaves_the_later_ones_whole():
+    gp = expanded("aima")
+    graph = gp.graphplan.graph
+    goals_pos, goals_neg = gp._goals()
+    sliced = SlicedGraph(graph, goals_pos, goals_neg, index=-2)
+    assert sliced.levels[-2:] == graph.levels[-2:]
+
+
+def test_extraction_leaves_the_graph_alone_and_slices_the_same_way():
+    results = []
+    for slice_relevant in (True, False):
+        gp = GraphPlanVis()
+        gp.create_problem(DOMAIN_FILE_PATH, example_path("p03"))
+        gp.graphplan.slice_relevant = slice_relevant
+        graph = gp.graphplan.graph
+        results.append(gp.solve(extractor="csp"))
+        assert gp.graphplan.graph is graph
+    assert results[0].status == results[1].status == "solved"
+    assert results[0].levels == results[1].levels
+
+
+def test_slice_delegates_goal_tests_and_mutex_index():
+    gp = expanded("aima")
+    graph = gp.graphplan.graph
+    goals_pos, goals_neg = gp._goals()
+    sliced = gp.graphplan.extraction_graph(goals_pos, goals_neg)
+    assert isinstance(sliced, SlicedGraph)
+    assert sliced.goals_hold(goals_pos, -1) == graph.goals_hold(goals_pos, -1)
+    assert sliced.non_mutex_goals(goals_pos, -1) == graph.non_mutex_goals(goals_pos, -1)
+    assert sliced.mutex_index(2)[0] is graph.mutex_index(2)[0]
+
+    gp.graphplan.slice_relevant = False
+    assert gp.graphplan.extraction_graph(goals_pos, goals_neg) is graph